@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+""":Mod: eval_timings
+
+:Synopsis:
+    Evaluates a user's document as Check Metadata would, and prints how long each stage of the evaluation took.
+    The memoized results aren't used or changed, so every section is evaluated. See webapp/home/utils/eval_timing.py.
+
+    python eval_timings.py <owner login> <document name> [--runs N] [--by-table]
+
+:Created:
+    10/17/26
+"""
+import os
+
+import click
+from flask import g
+from metapype.model.node import Node
+
+from webapp import app
+from webapp.config import Config
+
+
+@click.command()
+@click.argument('owner_login')
+@click.argument('document_name')
+@click.option('--runs', default=1, help='Number of times to evaluate the document. The fastest run is reported.')
+@click.option('--by-table', is_flag=True, default=False,
+              help='Show each data table and other entity separately rather than adding them together.')
+def main(owner_login: str, document_name: str, runs: int, by_table: bool):
+    import webapp.home.check_metadata as check_metadata
+    import webapp.home.utils.eval_timing as eval_timing
+    import webapp.home.utils.load_and_save as load_and_save
+    import webapp.home.views as views
+
+    user_folder = os.path.join(Config.USER_DATA_DIR, owner_login)
+    json_filename = os.path.join(user_folder, f'{document_name}.json')
+    if not os.path.isfile(json_filename):
+        raise click.ClickException(f'{json_filename} not found')
+
+    best = None
+    with app.test_request_context('/'):
+        views.load_eval_entries()
+        g.uploads_folder = os.path.join(user_folder, 'uploads', document_name)
+        for _ in range(runs):
+            with Node.store_scope({}, clear_on_exit=True):
+                eml_node = load_and_save.load_model_file(json_filename)
+                evaluation, parse_errs, _, _ = check_metadata.evaluate_document(
+                    eml_node, document_name, json_filename, use_memo=False)
+            timings = g.evaluation_timings
+            if best is None or timings[eval_timing.TOTAL_TIMING_KEY] < best[eval_timing.TOTAL_TIMING_KEY]:
+                best = timings
+
+    if not by_table:
+        best = eval_timing.grouped_timings(best)
+    total = best.pop(eval_timing.TOTAL_TIMING_KEY)
+    errors, warnings = check_metadata.count_errors_and_warnings(evaluation, parse_errs)
+    click.echo(f'{json_filename}: {errors} errors, {warnings} warnings')
+    for name, seconds in sorted(best.items(), key=lambda item: item[1], reverse=True):
+        click.echo(f'{name:<60} {seconds * 1000:10.1f} ms {seconds / total * 100:6.1f}%')
+    click.echo(f'{"total":<60} {total * 1000:10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
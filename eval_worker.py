@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+""":Mod: eval_worker
+
+:Synopsis:
+    Runs the Check Metadata evaluation and Check All Data Tables worker. See webapp/home/eval_worker.py.
+
+:Created:
+    10/17/26
+"""
+from webapp import app
+from webapp.home.eval_worker import run
+
+if __name__ == '__main__':
+    run(app)
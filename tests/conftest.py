@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: conftest
+
+:Synopsis:
+    Fixtures shared by the tests.
+
+:Created:
+    10/17/26
+"""
+import pytest
+
+from webapp.config import Config
+import webapp.home.utils.eval_queue as eval_queue
+import webapp.home.utils.eval_store as eval_store
+import webapp.home.utils.table_check_queue as table_check_queue
+
+
+@pytest.fixture
+def user_data_dir(tmp_path, monkeypatch):
+    """
+    Point Config.USER_DATA_DIR at an empty temp directory, so the test gets an evaluation store and queues of its own.
+    The SQLite connections are kept per thread, so they're closed and forgotten before and after the test.
+    """
+    def forget_connections():
+        for module in (eval_queue, eval_store, table_check_queue):
+            conn = getattr(module._local, 'conn', None)
+            if conn is not None:
+                conn.close()
+            module._local.conn = None
+
+    forget_connections()
+    monkeypatch.setattr(Config, 'USER_DATA_DIR', str(tmp_path))
+    yield str(tmp_path)
+    forget_connections()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_check_data_table_columns
+
+:Synopsis:
+    Tests that checking a data table's columns in a pool of processes gives the same results as checking them in the
+    request's process, chunk by chunk, with and without a limit on the number of errors in the table. See
+    check_columns() in webapp/home/check_data_table_contents.py.
+
+:Created:
+    10/17/26
+"""
+import json
+
+import pytest
+from metapype.eml import names
+from metapype.model import metapype_io
+
+from webapp import app
+from webapp.config import Config
+import webapp.home.check_data_table_contents as check_data_table_contents
+
+
+ATTRIBUTE_XML = {
+    'id': '''
+        <measurementScale><ratio><unit><standardUnit>number</standardUnit></unit>
+          <numericDomain><numberType>whole</numberType></numericDomain></ratio></measurementScale>''',
+    'count': '''
+        <measurementScale><ratio><unit><standardUnit>number</standardUnit></unit>
+          <numericDomain><numberType>real</numberType></numericDomain></ratio></measurementScale>
+        <missingValueCode><code>NA</code><codeExplanation>Not counted</codeExplanation></missingValueCode>''',
+    'site': '''
+        <measurementScale><nominal><nonNumericDomain><enumeratedDomain>
+          <codeDefinition><code>A</code><definition>Site A</definition></codeDefinition>
+          <codeDefinition><code>B</code><definition>Site B</definition></codeDefinition>
+        </enumeratedDomain></nonNumericDomain></nominal></measurementScale>''',
+    'date': '''
+        <measurementScale><dateTime><formatString>YYYY-MM-DD</formatString></dateTime></measurementScale>''',
+    'time': '''
+        <measurementScale><dateTime><formatString>hh:mm</formatString></dateTime></measurementScale>''',
+    'notes': '''
+        <measurementScale><nominal><nonNumericDomain><textDomain><definition>Notes</definition></textDomain>
+        </nonNumericDomain></nominal></measurementScale>''',
+}
+
+
+def eml_xml():
+    attributes = ''.join(f'<attribute><attributeName>{name}</attributeName>'
+                         f'<attributeDefinition>{name}</attributeDefinition>{scale}</attribute>'
+                         for name, scale in ATTRIBUTE_XML.items())
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<eml:eml xmlns:eml="https://eml.ecoinformatics.org/eml-2.2.0" packageId="edi.1.1" system="https://pasta.edirepository.org">
+  <dataset>
+    <title>Columns</title>
+    <dataTable>
+      <entityName>table.csv</entityName>
+      <physical>
+        <objectName>table.csv</objectName>
+        <dataFormat><textFormat><numHeaderLines>1</numHeaderLines>
+          <simpleDelimited><fieldDelimiter>,</fieldDelimiter></simpleDelimited></textFormat></dataFormat>
+      </physical>
+      <attributeList>{attributes}</attributeList>
+    </dataTable>
+  </dataset>
+</eml:eml>'''
+
+
+def row(i):
+    """ Return a row of the table. Some rows have errors in some of their columns. """
+    return ','.join([
+        str(i) if i % 17 else f'{i}.5',
+        'NA' if i % 5 == 0 else ('x' if i % 23 == 0 else f'{i / 4}'),
+        'AB'[i % 2] if i % 11 else 'Z',
+        f'2020-{1 + i % 12:02}-{1 + i % 28:02}' if i % 13 else '2020-13-01',
+        f'{i % 24:02}:{i % 60:02}' if i % 19 else '9:00',
+        f'note {i}',
+    ])
+
+
+@pytest.fixture
+def table(tmp_path, user_data_dir, monkeypatch):
+    csv_pathname = tmp_path / 'table.csv'
+    csv_pathname.write_text('\n'.join([','.join(ATTRIBUTE_XML), *[row(i) for i in range(1, 301)]]) + '\n')
+    eml_node = metapype_io.from_xml(eml_xml(), clean=True, collapse=False, literals=['attributeName', 'code'])
+    data_table_node = eml_node.find_single_node_by_path([names.DATASET, names.DATATABLE])
+    # Local files must be under BASE_DIR.
+    monkeypatch.setattr(Config, 'BASE_DIR', str(tmp_path))
+    # Chunks of 50 rows
+    monkeypatch.setattr(Config, 'DATA_TABLE_CHUNK_CELLS', 50 * len(ATTRIBUTE_XML), raising=False)
+    monkeypatch.setattr(Config, 'DATA_TABLE_CHECK_PROCESSES', 3, raising=False)
+    return data_table_node, f'file://{csv_pathname}'
+
+
+def check(table, processes, **kwargs):
+    data_table_node, csv_file_url = table
+    with app.test_request_context('/'):
+        results = check_data_table_contents.check_data_table(
+            'table.xml', csv_file_url, 'table.csv', column_check_processes=processes, data_table_node=data_table_node,
+            **kwargs)
+    return json.loads(results)
+
+
+def test_pool_matches_serial(table):
+    serial = check(table, 1)
+    assert serial['errors']
+    assert {error['location']['column'] for error in serial['errors']} == {'id', 'count', 'site', 'date', 'time'}
+    pool = check_data_table_contents.create_column_check_pool(len(ATTRIBUTE_XML), 3)
+    assert pool is not None
+    pool.shutdown()
+    assert check(table, 3) == serial
+
+
+def test_pool_matches_serial_with_error_limits(table, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_ERRS_PER_TABLE', 12, raising=False)
+    serial = check(table, 1, max_errs_per_column=4)
+    # One more than the limit is kept, to show that the results were truncated.
+    assert len(serial['errors']) == 13
+    assert check(table, 3, max_errs_per_column=4) == serial
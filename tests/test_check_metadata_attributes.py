@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_check_metadata_attributes
+
+:Synopsis:
+    Golden-output test of Check Metadata's attribute (data table column) rules.
+
+    data/check_metadata_attributes.xml is a document with a data table whose columns exercise each of the attribute
+    rules. The evaluation of the data table must match data/check_metadata_attributes.golden.json, which records what
+    the rules reported when they were evaluated column by column. Node ids are random, so in the links they're
+    replaced by the paths of the nodes.
+
+    To regenerate the golden output after an intended change to the rules:
+        python -m tests.test_check_metadata_attributes
+
+:Created:
+    10/17/26
+"""
+import json
+import os
+import tempfile
+
+from flask import g
+from metapype.eml import names, validate
+from metapype.model import metapype_io
+from metapype.model.node import Node
+
+from webapp import app
+import webapp.home.check_metadata as check_metadata
+from webapp.home.standard_units import init_standard_units
+import webapp.home.views as views
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+XML_FILENAME = os.path.join(DATA_DIR, 'check_metadata_attributes.xml')
+GOLDEN_FILENAME = os.path.join(DATA_DIR, 'check_metadata_attributes.golden.json')
+
+
+def load_model():
+    with open(XML_FILENAME, 'r') as f:
+        return metapype_io.from_xml(f.read(), clean=True, collapse=False,
+                                    literals=['literalLayout', 'markdown', 'attributeName', 'code'])
+
+
+def node_paths(node, path=None, paths=None):
+    """ Map the ids of the nodes to their paths, e.g., eml/dataset/dataTable[0]/attributeList[0]/attribute[3]. """
+    if paths is None:
+        paths = {}
+    path = path or node.name
+    paths[node.id] = path
+    counts = {}
+    for child in node.children:
+        i = counts.get(child.name, 0)
+        counts[child.name] = i + 1
+        node_paths(child, f'{path}/{child.name}[{i}]', paths)
+    return paths
+
+
+def evaluate_data_table():
+    """ Evaluate the fixture's data table and return the results in a form that doesn't depend on node ids. """
+    eml_node = load_model()
+    paths = node_paths(eml_node)
+    data_table_node = eml_node.find_single_node_by_path([names.DATASET, names.DATATABLE])
+    with app.test_request_context('/'):
+        views.load_eval_entries()
+        init_standard_units()
+        g.uploads_folder = tempfile.gettempdir()
+        g.evaluation = []
+        check_metadata.check_data_table(eml_node, 'attributes', data_table_node)
+        entries = []
+        for entry in g.evaluation:
+            link = entry.link
+            for node_id, path in paths.items():
+                link = link.replace(node_id, path)
+            entries.append({'section': entry.section, 'item': entry.item, 'severity': entry.severity.name,
+                            'explanation': entry.explanation, 'data_table_name': entry.data_table_name,
+                            'link': link})
+    return entries
+
+
+def test_attribute_evaluation_matches_golden_output():
+    with open(GOLDEN_FILENAME, 'r') as f:
+        golden = json.load(f)
+    assert evaluate_data_table() == golden
+
+
+def validation_outcome(validate_tree, node):
+    """ Return the errors found and the exception raised, if any. Metapype raises on a non-numeric precision. """
+    errs = []
+    try:
+        validate_tree(node, errs)
+        exception = None
+    except Exception as e:
+        exception = repr(e)
+    return [(code, msg, node.id, *args) for code, msg, node, *args in errs], exception
+
+
+def test_validate_tree_matches_metapype():
+    eml_node = load_model()
+    data_table_node = eml_node.find_single_node_by_path([names.DATASET, names.DATATABLE])
+    for node in [eml_node, data_table_node, *data_table_node.find_single_node_by_path([names.ATTRIBUTELIST]).children]:
+        assert validation_outcome(check_metadata.validate_tree, node) == validation_outcome(validate.tree, node)
+
+
+if __name__ == '__main__':
+    entries = evaluate_data_table()
+    with open(GOLDEN_FILENAME, 'w') as f:
+        json.dump(entries, f, indent=2)
+        f.write('\n')
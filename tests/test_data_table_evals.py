@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_data_table_evals
+
+:Synopsis:
+    Tests of the index of Check Data Tables' results kept in each uploads folder. See
+    webapp/home/utils/data_table_evals.py.
+
+:Created:
+    10/17/26
+"""
+import json
+import os
+import shutil
+
+import pytest
+
+import webapp.home.utils.data_table_evals as data_table_evals
+
+
+HASH = '0123456789'
+OTHER_HASH = '9876543210'
+RESULTS = json.dumps({'errors': []})
+
+
+@pytest.fixture
+def uploads_folder(tmp_path, user_data_dir):
+    folder = tmp_path / 'uploads' / 'doc'
+    folder.mkdir(parents=True)
+    (folder / 'a.csv').write_text('x,y\n1,2\n')
+    return str(folder)
+
+
+def status(uploads_folder, metadata_hash=HASH, csv_filename='a.csv'):
+    return data_table_evals.get_status(uploads_folder, csv_filename, metadata_hash)
+
+
+def test_status(uploads_folder):
+    assert status(uploads_folder) == 'yellow'
+    assert status(uploads_folder, csv_filename='missing.csv') == 'black'
+    data_table_evals.save_results(uploads_folder, 'a.csv', HASH, RESULTS, ok=True)
+    assert status(uploads_folder) == 'green'
+    assert data_table_evals.get_results(uploads_folder, 'a.csv', HASH) == RESULTS
+    assert status(uploads_folder, OTHER_HASH) == 'yellow'
+    data_table_evals.save_results(uploads_folder, 'a.csv', OTHER_HASH, RESULTS, ok=False)
+    assert status(uploads_folder, OTHER_HASH) == 'red'
+    # The earlier results are replaced.
+    assert not os.path.exists(data_table_evals.results_pathname(uploads_folder, 'a.csv', HASH))
+
+
+def test_changed_file_needs_checking(uploads_folder):
+    data_table_evals.save_results(uploads_folder, 'a.csv', HASH, RESULTS, ok=True)
+    with open(os.path.join(uploads_folder, 'a.csv'), 'a') as f:
+        f.write('3,4\n')
+    assert status(uploads_folder) == 'yellow'
+    assert data_table_evals.get_results(uploads_folder, 'a.csv', HASH) is None
+
+
+def test_reset(uploads_folder):
+    data_table_evals.save_results(uploads_folder, 'a.csv', HASH, RESULTS, ok=True)
+    data_table_evals.reset(uploads_folder, 'a.csv')
+    assert status(uploads_folder) == 'yellow'
+    assert 'a.csv' not in data_table_evals.read_index(uploads_folder)
+    assert not os.path.exists(data_table_evals.results_pathname(uploads_folder, 'a.csv', HASH))
+
+
+def test_copied_file_is_recognized_by_its_md5(uploads_folder, tmp_path):
+    data_table_evals.save_results(uploads_folder, 'a.csv', HASH, RESULTS, ok=False)
+    # A copy of the uploads folder has files with new identities but the same contents.
+    copy = str(tmp_path / 'copy')
+    shutil.copytree(uploads_folder, copy)
+    os.utime(os.path.join(copy, 'a.csv'), ns=(1, 1))
+    assert status(copy) == 'red'
+    # The index is updated with the file's new identity, so it needn't be hashed again.
+    stat = os.stat(os.path.join(copy, 'a.csv'))
+    assert data_table_evals.read_index(copy)['a.csv']['identity'] == [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+    # A file with the same size but other contents isn't taken for the file that was checked.
+    with open(os.path.join(copy, 'a.csv'), 'w') as f:
+        f.write('x,y\n5,6\n')
+    assert status(copy) == 'yellow'
+
+
+def test_legacy_results_are_adopted(uploads_folder):
+    with open(os.path.join(uploads_folder, f'a.csv_eval_{HASH}_ok'), 'w') as f:
+        f.write(RESULTS)
+    with open(os.path.join(uploads_folder, 'b.csv'), 'w') as f:
+        f.write('x\n1\n')
+    with open(os.path.join(uploads_folder, f'b.csv_eval_{OTHER_HASH}'), 'w') as f:
+        f.write(json.dumps({'errors': ['error']}))
+    # Results for a file that no longer exists are ignored.
+    with open(os.path.join(uploads_folder, f'c.csv_eval_{HASH}'), 'w') as f:
+        f.write(RESULTS)
+
+    assert status(uploads_folder) == 'green'
+    assert status(uploads_folder, OTHER_HASH, 'b.csv') == 'red'
+    assert sorted(data_table_evals.read_index(uploads_folder)) == ['a.csv', 'b.csv']
+    # The _ok suffix is dropped, since the index records whether there were errors.
+    assert data_table_evals.get_results(uploads_folder, 'a.csv', HASH) == RESULTS
+    assert not os.path.exists(os.path.join(uploads_folder, f'a.csv_eval_{HASH}_ok'))
+
+
+def test_bookkeeping_files():
+    assert data_table_evals.is_bookkeeping_file(data_table_evals.INDEX_FILENAME)
+    assert data_table_evals.is_bookkeeping_file(data_table_evals.LOCK_FILENAME)
+    assert data_table_evals.is_bookkeeping_file(f'a.csv_eval_{HASH}')
+    assert data_table_evals.is_bookkeeping_file(f'a.csv_eval_{HASH}_ok')
+    assert not data_table_evals.is_bookkeeping_file('a.csv')
+    assert not data_table_evals.is_bookkeeping_file('my_eval_data.csv')
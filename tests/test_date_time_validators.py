@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_date_time_validators
+
+:Synopsis:
+    Tests of the datetime format validators used by Check Data Tables. The regexes compiled from format strings must
+    accept the same values as the regexes in webapp/static/dateTimeFormatString_regex.csv, and a validator must match
+    a column's values as pandas would with the format's regex. See webapp/home/utils/date_time_validators.py.
+
+:Created:
+    10/17/26
+"""
+import csv
+import os
+import re
+
+import pandas as pd
+import pytest
+
+import webapp.home.utils.date_time_validators as date_time_validators
+
+
+REGEX_FILENAME = os.path.join(os.path.dirname(__file__), '..', 'webapp', 'static', 'dateTimeFormatString_regex.csv')
+
+
+def load_formats():
+    with open(REGEX_FILENAME, 'r', encoding='utf-8-sig') as f:
+        return [(line['Format'], line['Example'], line['Regex']) for line in csv.DictReader(f)]
+
+
+def variants(example):
+    """ Return the example along with values that differ from it in a digit, or in length. """
+    values = {example, example + '0', example[:-1]}
+    for i, c in enumerate(example):
+        if c.isdigit():
+            values.update(example[:i] + digit + example[i + 1:] for digit in '0123459')
+    return values
+
+
+def test_compiled_regexes_agree_with_csv():
+    for format_string, example, regex in load_formats():
+        compiled = date_time_validators.compile_format_string(format_string)
+        assert compiled, format_string
+        expected, actual = re.compile(regex), re.compile(compiled)
+        assert actual.fullmatch(example), format_string
+        for value in variants(example):
+            assert bool(actual.fullmatch(value)) == bool(expected.fullmatch(value)), (format_string, value)
+
+
+def test_unsupported_format_string():
+    assert date_time_validators.compile_format_string('DD-MON-YYYY') is None
+    assert date_time_validators.get_validator('DD-MON-YYYY') is None
+
+
+def test_validators_are_registered():
+    format_string, _, regex = load_formats()[0]
+    assert date_time_validators.get_validator(format_string, regex) is \
+           date_time_validators.get_validator(format_string, regex)
+
+
+@pytest.mark.parametrize('num_values', [10, date_time_validators.MEMO_MIN_VALUES + 10])
+@pytest.mark.parametrize('repeated', [False, True])
+def test_match_agrees_with_pandas(user_data_dir, num_values, repeated):
+    format_string, example, regex = next(f for f in load_formats() if f[0] == 'YYYY-MM-DD')
+    values = sorted(variants(example)) + ['', 'x', '1976-9-23']
+    if repeated:
+        column = pd.Series([values[i % len(values)] for i in range(num_values)])
+    else:
+        column = pd.Series([f'{1000 + i % 9000}-{1 + i % 13:02}-{i % 33:02}' for i in range(num_values)])
+    expected = column.str.fullmatch(regex).astype(bool)
+    validator = date_time_validators.get_validator(format_string, regex)
+    pd.testing.assert_series_equal(validator.match(column), expected, check_names=False)
+    # Again, in case the matches were memoized.
+    pd.testing.assert_series_equal(validator.match(column), expected, check_names=False)
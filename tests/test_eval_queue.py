@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_eval_queue
+
+:Synopsis:
+    Tests of the evaluation worker's SQLite job queue. See webapp/home/utils/eval_queue.py.
+
+:Created:
+    10/17/26
+"""
+import time
+
+import pytest
+
+import webapp.home.utils.eval_queue as eval_queue
+
+
+@pytest.fixture(autouse=True)
+def queue(user_data_dir):
+    """ Give each test a queue of its own. """
+    yield
+
+
+def enqueue(fingerprint, json_filename='a.json'):
+    return eval_queue.enqueue(json_filename, 'a', '/uploads/a', fingerprint)
+
+
+def test_claim_and_complete():
+    assert enqueue('f1')
+    assert eval_queue.is_pending('a.json', 'f1')
+    job = eval_queue.claim()
+    assert job == eval_queue.EvaluationJob('a.json', 'a', '/uploads/a', 'f1', 1)
+    assert eval_queue.claim() is None
+    eval_queue.complete(job)
+    assert not eval_queue.is_pending('a.json', 'f1')
+    assert eval_queue.queue_length() == 0
+
+
+def test_jobs_are_claimed_oldest_first():
+    enqueue('f1', 'a.json')
+    enqueue('f2', 'b.json')
+    assert eval_queue.claim().json_filename == 'a.json'
+    assert eval_queue.claim().json_filename == 'b.json'
+
+
+def test_enqueuing_same_content_leaves_claimed_job_alone():
+    enqueue('f1')
+    job = eval_queue.claim()
+    assert enqueue('f1')
+    # Still claimed, so it isn't handed to another worker.
+    assert eval_queue.claim() is None
+    eval_queue.release(job)
+    assert eval_queue.claim().attempts == 2
+
+
+def test_enqueuing_new_content_replaces_job():
+    enqueue('f1')
+    job = eval_queue.claim()
+    enqueue('f2')
+    # The worker finishes the old content, but the job for the new content stays.
+    eval_queue.complete(job)
+    assert eval_queue.is_pending('a.json', 'f2')
+    assert eval_queue.claim() == eval_queue.EvaluationJob('a.json', 'a', '/uploads/a', 'f2', 1)
+
+
+def test_abandoned_job_is_claimed_again(monkeypatch):
+    enqueue('f1')
+    eval_queue.claim()
+    assert eval_queue.claim() is None
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + eval_queue.CLAIM_TIMEOUT + 1)
+    assert eval_queue.claim().attempts == 2
+
+
+def test_exhausted_job_is_kept_but_not_claimed():
+    enqueue('f1')
+    for _ in range(eval_queue.MAX_ATTEMPTS):
+        job = eval_queue.claim()
+        eval_queue.release(job)
+    assert eval_queue.claim() is None
+    assert not eval_queue.is_pending('a.json', 'f1')
+    assert eval_queue.queue_length() == 0
+    # Asking again for the same content doesn't start it over, but new content does.
+    enqueue('f1')
+    assert eval_queue.claim() is None
+    enqueue('f2')
+    assert eval_queue.claim().attempts == 1
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_load_data_table_chunks
+
+:Synopsis:
+    Tests of Check Data Tables' chunked reading of a data table, which must give the rows pandas' python parser gives
+    with skipfooter, a chunk at a time. See load_data_table_chunks() in webapp/home/check_data_table_contents.py.
+
+:Created:
+    10/17/26
+"""
+import pandas as pd
+import pytest
+from metapype.eml import names
+from metapype.model.node import Node
+
+from webapp.config import Config
+from webapp.home.check_data_table_contents import load_data_table_chunks
+
+
+def add_child(parent, name, content=None):
+    child = Node(name, parent=parent, content=content)
+    parent.add_child(child)
+    return child
+
+
+def data_table_node(delimiter=',', num_header_lines=1, num_footer_lines=0):
+    data_table = Node(names.DATATABLE)
+    text_format = add_child(add_child(add_child(data_table, names.PHYSICAL), names.DATAFORMAT), names.TEXTFORMAT)
+    add_child(text_format, names.NUMHEADERLINES, str(num_header_lines))
+    add_child(text_format, names.NUMFOOTERLINES, str(num_footer_lines))
+    simple_delimited = add_child(text_format, names.SIMPLEDELIMITED)
+    add_child(simple_delimited, names.FIELDDELIMITER, delimiter)
+    return data_table
+
+
+def write_csv(tmp_path, lines):
+    pathname = tmp_path / 'table.csv'
+    pathname.write_text(''.join(f'{line}\n' for line in lines))
+    return str(pathname)
+
+
+def read_table(node, csv_pathname, max_rows=None):
+    chunks, truncated = load_data_table_chunks(node, csv_pathname, max_rows=max_rows)
+    return list(chunks), truncated
+
+
+ROWS = [f'{i},"value {i}, quoted"' for i in range(7)]
+
+
+@pytest.fixture(autouse=True)
+def chunk_cells(user_data_dir, monkeypatch):
+    # Two columns, so chunks of two rows.
+    monkeypatch.setattr(Config, 'DATA_TABLE_CHUNK_CELLS', 4, raising=False)
+
+
+def test_chunks_match_pandas(tmp_path):
+    csv_pathname = write_csv(tmp_path, ['id,value', *ROWS])
+    chunks, truncated = read_table(data_table_node(), csv_pathname)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 1]
+    expected = pd.read_csv(csv_pathname, dtype=str, keep_default_na=False)
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    assert not truncated
+
+
+def test_footer_and_extra_header_lines_are_excluded(tmp_path):
+    csv_pathname = write_csv(tmp_path, ['id,value', 'units,text', *ROWS, 'total,7', 'end,'])
+    chunks, truncated = read_table(data_table_node(num_header_lines=2, num_footer_lines=2), csv_pathname)
+    expected = pd.read_csv(csv_pathname, dtype=str, keep_default_na=False, skiprows=[1], skipfooter=2,
+                           engine='python')
+    table = pd.concat(chunks)
+    pd.testing.assert_frame_equal(table, expected)
+    assert table['id'].tolist() == [str(i) for i in range(7)]
+    assert not truncated
+
+
+def test_max_rows_truncates(tmp_path):
+    csv_pathname = write_csv(tmp_path, ['id,value', *ROWS, 'total,7'])
+    chunks, truncated = read_table(data_table_node(num_footer_lines=1), csv_pathname, max_rows=3)
+    assert pd.concat(chunks)['id'].tolist() == ['0', '1', '2']
+    assert truncated
+
+
+def test_table_without_rows_has_columns(tmp_path):
+    csv_pathname = write_csv(tmp_path, ['id\tvalue', 'total\t0'])
+    chunks, truncated = read_table(data_table_node(delimiter='\\t', num_footer_lines=1), csv_pathname)
+    assert len(chunks) == 1
+    assert chunks[0].columns.tolist() == ['id', 'value']
+    assert chunks[0].empty
+    assert not truncated
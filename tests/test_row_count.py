@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_row_count
+
+:Synopsis:
+    Tests that the mmap row counter gets the count pandas gets, for the files it counts itself and for the ones it
+    leaves to pandas. See webapp/home/utils/row_count.py.
+
+:Created:
+    10/17/26
+"""
+import hashlib
+
+import pytest
+
+import webapp.home.utils.row_count as row_count
+
+
+CASES = {
+    'simple': (b'a,b\n1,2\n3,4\n', ',', '"'),
+    'no final line break': (b'a,b\n1,2\n3,4', ',', '"'),
+    'crlf': (b'a,b\r\n1,2\r\n3,4\r\n', ',', '"'),
+    'blank lines': (b'a,b\n1,2\n\n   \n\t\n3,4\n\n', ',', '"'),
+    'whitespace before a line break': (b'a,b\n1,2  \n3,4\t\r\n', ',', '"'),
+    'quoted line breaks': (b'a,b\n1,"two\nlines"\n"x\r\ny",4\n', ',', '"'),
+    'escaped quotes': (b'a,b\n1,"say ""hi""\nthere"\n3,""\n', ',', '"'),
+    'tab delimited': (b'a\tb\n1\t2\n\t\n3\t4\n', '\t', '"'),
+    'single quotes': (b"a;b\n1;'x\ny'\n3;4\n", ';', "'"),
+    'only a header': (b'a,b\n', ',', '"'),
+    # Files that don't follow the conventions the scan assumes, which are left to pandas
+    'lone cr': (b'a,b\r1,2\r3,4\r', ',', '"'),
+    'quote within a field': (b'a,b\n1,x"y\n3,4\n', ',', '"'),
+}
+
+
+@pytest.fixture(autouse=True)
+def store(user_data_dir):
+    yield
+
+
+def write(tmp_path, content):
+    pathname = tmp_path / 'table.csv'
+    pathname.write_bytes(content)
+    return str(pathname)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_count_matches_pandas(tmp_path, name):
+    content, delimiter, quote_char = CASES[name]
+    pathname = write(tmp_path, content)
+    expected = row_count.count_rows_with_pandas(pathname, delimiter=delimiter, quote_char=quote_char)
+    assert row_count.count_rows(pathname, delimiter=delimiter, quote_char=quote_char) == expected
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_scan_gives_md5(tmp_path, name):
+    content, delimiter, quote_char = CASES[name]
+    md5, _ = row_count.scan_file(write(tmp_path, content), delimiter=delimiter, quote_char=quote_char)
+    assert md5 == hashlib.md5(content).hexdigest()
+
+
+def test_quotes_and_line_breaks_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(row_count, 'BLOCK_SIZE', 7)
+    content = b'a,b\r\n' + b''.join(b'%d,"v\r\n%d ""q"""\r\n\r\n' % (i, i) for i in range(20))
+    pathname = write(tmp_path, content)
+    md5, num_rows = row_count.scan_file(pathname)
+    assert num_rows == row_count.count_rows_with_pandas(pathname) == 20
+    assert md5 == hashlib.md5(content).hexdigest()
+
+
+def test_count_is_cached(tmp_path, monkeypatch):
+    pathname = write(tmp_path, CASES['simple'][0])
+    assert row_count.count_rows(pathname) == 2
+    monkeypatch.setattr(row_count, 'scan_file', lambda *args, **kwargs: pytest.fail('file scanned again'))
+    assert row_count.count_rows(pathname) == 2
+    assert row_count.count_rows(f'file://{pathname}') == 2
+
+
+@pytest.mark.parametrize('name', ['lone cr', 'quote within a field'])
+def test_unconventional_files_are_left_to_pandas(tmp_path, name):
+    content, delimiter, quote_char = CASES[name]
+    _, num_rows = row_count.scan_file(write(tmp_path, content), delimiter=delimiter, quote_char=quote_char)
+    assert num_rows is None
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_save_fixups
+
+:Synopsis:
+    Tests that applying save_both_formats()'s fixups in a single walk of the model gives the same model as applying
+    them one after another, each with a walk of its own, as clean_model(), enforce_dataset_sequence(), etc., do. See
+    webapp/home/utils/fixups.py.
+
+    data/save_fixups.xml is a document with the glitches the fixups repair: dataset children out of sequence, empty
+    and duplicated keyword sets, a Categorical column with no codes, a Numerical column with no numericDomain, a
+    duplicated attribute id, an unused custom unit, an old emlEditor node, and so on. Node ids are random, as are the
+    ids given to attributes that lack them, so they're left out of the comparison.
+
+:Created:
+    10/17/26
+"""
+import json
+import os
+import re
+
+import pytest
+from metapype.eml import names
+from metapype.model import metapype_io
+
+from webapp import app
+import webapp.auth.user_data as user_data
+import webapp.home.log_usage as log_usage
+import webapp.home.utils.create_nodes as create_nodes
+import webapp.home.utils.fixups as fixups
+import webapp.home.utils.load_and_save as load_and_save
+import webapp.home.utils.qudt_annotations as qudt_annotations
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+XML_FILENAME = os.path.join(DATA_DIR, 'save_fixups.xml')
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def load_model():
+    with open(XML_FILENAME, 'r') as f:
+        eml_node = metapype_io.from_xml(f.read(), clean=True, collapse=False,
+                                        literals=['literalLayout', 'markdown', 'attributeName', 'code'])
+    # A tab delimiter saved by an earlier bug, which the XML parser would strip as whitespace
+    eml_node.find_descendant(names.FIELDDELIMITER).content = '\t'
+    return eml_node
+
+
+def apply_separately(eml_node):
+    load_and_save.clean_model(eml_node)
+    load_and_save.enforce_dataset_sequence(eml_node)
+    load_and_save.fix_up_custom_units(eml_node)
+    load_and_save.fixup_categorical_variables(eml_node)
+    load_and_save.fixup_numerical_variables(eml_node)
+    load_and_save.fixup_field_delimiters(eml_node)
+    create_nodes.add_eml_editor_metadata(eml_node)
+    qudt_annotations.add_attribute_ids(eml_node)
+    qudt_annotations.add_qudt_annotations(eml_node)
+
+
+def without_ids(eml_node):
+    """ Return the model's JSON, with node ids left out and generated attribute ids masked. """
+    def strip(json_dict):
+        (name, properties), = json_dict.items()
+        stripped = []
+        for prop in properties:
+            if 'id' in prop:
+                continue
+            if 'children' in prop:
+                prop = {'children': [strip(child) for child in prop['children']]}
+            stripped.append(prop)
+        return {name: stripped}
+
+    return UUID_PATTERN.sub('UUID', json.dumps(strip(json.loads(metapype_io.to_json(eml_node)))))
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """
+    Stand in for the user's session: the document's uploads folder and the user's QUDT settings. The QUDT units file
+    is downloaded when the app starts, so we supply one of our own.
+    """
+    (tmp_path / 'table.csv').write_text('depth\tmass\tsite\tnotes\n1\t2\tA\tx\n3\t4\tB\ty\n5\t6\tA\tz\n')
+    (tmp_path / 'webapp' / 'static').mkdir(parents=True)
+    (tmp_path / 'webapp' / 'static' / 'unitsWithQUDTInfo.csv').write_text(
+        'unit,qudtUri,qudtLabel\nmeter,http://qudt.org/vocab/unit/M,Meter\n')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(user_data, 'get_document_uploads_folder_name', lambda *args, **kwargs: str(tmp_path))
+    monkeypatch.setattr(user_data, 'get_qudt_annotations_settings', lambda: (True, False))
+    monkeypatch.setattr(qudt_annotations, 'load_annotations_actions', lambda: (set(), set()))
+    monkeypatch.setattr(log_usage, 'log_qudt_annotations_usage', lambda *args: None)
+    with app.test_request_context('/'):
+        yield
+
+
+def test_single_walk_matches_separate_walks(session):
+    expected = load_model()
+    apply_separately(expected)
+    actual = load_model()
+    fixups.run_fixups(actual, load_and_save.save_fixups())
+    assert without_ids(actual) == without_ids(expected)
+
+
+def test_fixups_repair_the_document(session):
+    eml_node = load_model()
+    fixups.run_fixups(eml_node, load_and_save.save_fixups())
+    dataset_node = eml_node.find_child(names.DATASET)
+    assert [child.name for child in dataset_node.children] == [
+        names.TITLE, names.CREATOR, names.KEYWORDSET, names.KEYWORDSET, names.CONTACT, names.METHODS, names.PROJECT,
+        names.DATATABLE]
+    # Keywords are consolidated by thesaurus, and the new keywordSet nodes get the document's namespaces.
+    keyword_sets = dataset_node.find_all_children(names.KEYWORDSET)
+    assert [[keyword.content for keyword in keyword_set.find_all_children(names.KEYWORD)]
+            for keyword_set in keyword_sets] == [['lakes'], ['water', 'depth']]
+    assert all(keyword_set.nsmap == eml_node.nsmap for keyword_set in keyword_sets)
+    attribute_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE, names.ATTRIBUTELIST,
+                                                       names.ATTRIBUTE])
+    attribute_ids = [node.attribute_value('id') for node in attribute_nodes]
+    assert len(set(attribute_ids)) == len(attribute_ids) and None not in attribute_ids
+    depth, mass, site, _ = attribute_nodes
+    assert depth.find_descendant(names.NUMBERTYPE).content == 'real'
+    assert depth.find_descendant(names.VALUEURI) is not None
+    code_nodes = []
+    site.find_all_descendants(names.CODE, code_nodes)
+    assert sorted(code.content for code in code_nodes) == ['A', 'B']
+    assert eml_node.find_descendant(names.FIELDDELIMITER).content == '\\t'
+    units = [unit.attribute_value('name') for unit in eml_node.find_descendant(names.UNITLIST).children]
+    assert units == ['gramsPerSample']
+    eml_editor_nodes = []
+    eml_node.find_all_descendants('emlEditor', eml_editor_nodes)
+    assert len(eml_editor_nodes) == 1 and eml_editor_nodes[0].attribute_value('release') != '2020.01.01'
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+:Mod: test_table_check_scheduler
+
+:Synopsis:
+    Tests of Check All Data Tables' scheduling: the flock() slots that limit the checks per user and for the app, the
+    pool that runs the checks, the progress that the Check Data Tables page polls, and the background worker's queue.
+    See webapp/home/utils/table_check_scheduler.py and webapp/home/utils/table_check_queue.py.
+
+:Created:
+    10/17/26
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from webapp.config import Config
+import webapp.home.utils.table_check_queue as table_check_queue
+import webapp.home.utils.table_check_scheduler as table_check_scheduler
+from webapp.home.utils.table_check_scheduler import TableCheckProgress
+
+
+@pytest.fixture(autouse=True)
+def scheduler(user_data_dir, monkeypatch):
+    monkeypatch.setattr(table_check_scheduler, 'SLOT_POLL_SECONDS', 0.01)
+
+
+def test_slots_limit_concurrent_holders():
+    holders = []
+    max_holders = []
+    lock = threading.Lock()
+
+    def hold():
+        with table_check_scheduler.slot('test', 2):
+            with lock:
+                holders.append(1)
+                max_holders.append(len(holders))
+            time.sleep(0.05)
+            with lock:
+                holders.pop()
+
+    threads = [threading.Thread(target=hold) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(max_holders) == 2
+    assert len(max_holders) == 5
+
+
+def test_slot_is_released_on_exception():
+    with pytest.raises(RuntimeError):
+        with table_check_scheduler.slot('test', 1):
+            raise RuntimeError
+    with table_check_scheduler.slot('test', 1):
+        pass
+
+
+def square(x):
+    if x < 0:
+        raise ValueError(x)
+    return x * x
+
+
+def test_run_table_checks(monkeypatch):
+    monkeypatch.setattr(Config, 'CHECK_DATA_TABLES_PROCESSES_PER_USER', 2, raising=False)
+    results = dict(table_check_scheduler.run_table_checks(square, [(i,) for i in range(5)], 'user-1'))
+    assert results == {i: i * i for i in range(5)}
+    with pytest.raises(ValueError):
+        list(table_check_scheduler.run_table_checks(square, [(1,), (-1,)], 'user-1'))
+
+
+def test_progress(tmp_path):
+    user_folder = str(tmp_path)
+    assert TableCheckProgress.load(user_folder, 'site.v2') is None
+    progress = TableCheckProgress(user_folder, 'site.v2')
+    progress.start(['a', 'b', 'c'])
+    # The progress file isn't taken for a document.
+    assert os.path.basename(progress.pathname) == '.site.v2.progress'
+    assert not [filename for filename in os.listdir(user_folder) if filename.endswith('.json')]
+
+    progress.table_checked('a', [('warning', 'Only partial results')])
+    progress.table_failed('b')
+    loaded = TableCheckProgress.load(user_folder, 'site.v2')
+    assert loaded == {'total': 3, 'checked': ['a'], 'failed': ['b'], 'messages': [['warning', 'Only partial results']],
+                      'done': False}
+    assert TableCheckProgress.load(user_folder, 'site') is None
+    TableCheckProgress(user_folder, 'site.v2').table_checked('c')
+    assert TableCheckProgress.load(user_folder, 'site.v2')['done']
+
+    progress.finish()
+    assert TableCheckProgress.load(user_folder, 'site.v2') is None
+
+
+def test_stale_progress_is_ignored(tmp_path):
+    progress = TableCheckProgress(str(tmp_path), 'doc')
+    progress.start(['a'])
+    stale = time.time() - table_check_scheduler.PROGRESS_STALE_SECONDS - 1
+    os.utime(progress.pathname, (stale, stale))
+    assert TableCheckProgress.load(str(tmp_path), 'doc') is None
+    # Nor is it updated.
+    progress.table_checked('a')
+    assert TableCheckProgress.load(str(tmp_path), 'doc') is None
+
+
+def job(csv_filename='a.csv', metadata_hash='0123456789'):
+    return table_check_queue.TableCheckJob('/uploads/doc', csv_filename, '/user', 'doc', 'user', csv_filename,
+                                           metadata_hash, 'eml', 'csv', '{}', 0)
+
+
+def test_queue_claim_and_complete():
+    assert table_check_queue.enqueue(job('a.csv'))
+    assert table_check_queue.enqueue(job('b.csv'))
+    claimed = table_check_queue.claim()
+    assert claimed == job('a.csv')._replace(attempts=1)
+    # Enqueuing the same check again leaves the claimed job alone.
+    assert table_check_queue.enqueue(job('a.csv'))
+    assert table_check_queue.claim().csv_filename == 'b.csv'
+    assert table_check_queue.claim() is None
+    table_check_queue.complete(claimed)
+    assert table_check_queue.claim() is None
+
+
+def test_queue_replaces_job_for_new_metadata():
+    table_check_queue.enqueue(job())
+    claimed = table_check_queue.claim()
+    table_check_queue.enqueue(job(metadata_hash='9876543210'))
+    table_check_queue.complete(claimed)
+    assert table_check_queue.claim().metadata_hash == '9876543210'
+
+
+def test_queue_gives_up_and_tries_again_when_asked():
+    table_check_queue.enqueue(job())
+    for attempt in range(1, table_check_queue.MAX_ATTEMPTS + 1):
+        claimed = table_check_queue.claim()
+        assert claimed.attempts == attempt
+        assert table_check_queue.release(claimed) == (attempt == table_check_queue.MAX_ATTEMPTS)
+    assert table_check_queue.claim() is None
+    table_check_queue.enqueue(job())
+    assert table_check_queue.claim().attempts == 1
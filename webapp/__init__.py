@@ -247,3 +247,8 @@ def download_qudt_annotations_data_file():
 
 download_qudt_annotations_data_file()
 update_gc_cutoff_date_pickle()
+
+# Compile the EML schemas now, so under uWSGI the workers share the master's copy (see schema_validators.py).
+from webapp.home.utils.schema_validators import preload_enabled, preload_schema_validators
+if preload_enabled():
+    preload_schema_validators()
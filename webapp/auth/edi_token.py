@@ -79,7 +79,8 @@ def get_linked_ezeml_accounts(edi_token, primary_folder=None):
                     only_files = [f for f in folder_contents if os.path.isfile(os.path.join(user_dir, f))]
                     if only_files:
                         for filename in only_files:
-                            if filename and filename.endswith('.xml'):
+                            # XML files are generated on demand, so go by the JSON files
+                            if filename and filename.endswith('.json') and filename != '__user_properties__.json':
                                 package_id = os.path.splitext(filename)[0]
                                 date_modified = datetime.fromtimestamp(
                                     os.path.getmtime(os.path.join(user_dir, filename))).strftime('%Y-%m-%d %H:%M:%S')
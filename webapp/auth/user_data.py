@@ -27,6 +27,10 @@ import webapp.home.views as views
 import webapp.views.collaborations.collaborations as collaborations
 import webapp.home.exceptions as exceptions
 from webapp.home.home_utils import log_error, log_info
+import webapp.home.utils.document_meta as document_meta
+import webapp.home.utils.file_utils as file_utils
+import webapp.home.utils.model_sidecar as model_sidecar
+import webapp.home.utils.table_check_scheduler as table_check_scheduler
 from webapp.home.utils.security import validate_user_data_path
 
 USER_PROPERTIES_FILENAME = '__user_properties__.json'
@@ -348,11 +352,21 @@ def delete_package(filename:str=''):
         except FileNotFoundError as e:
             pass
 
+        # Evaluations are now memoized in the evaluation store, but the package may have an eval file from before then.
         try:
             os.remove(eval_filename)
         except FileNotFoundError as e:
             pass
 
+        for hidden_filename in (document_meta.meta_pathname(json_filename),
+                                model_sidecar.sidecar_pathname(json_filename),
+                                file_utils.document_lock_pathname(json_filename),
+                                table_check_scheduler.progress_pathname(json_filename)):
+            try:
+                os.remove(hidden_filename)
+            except FileNotFoundError as e:
+                pass
+
         try:
             uploads_path = os.path.join(user_folder, "uploads")
             if os.path.isdir(os.path.join(uploads_path, filename)):
@@ -369,10 +383,12 @@ def delete_package(filename:str=''):
 
 
 def download_eml(filename:str='', package_id:str=''):
+    from webapp.home.utils.load_and_save import get_xml_pathname
+
     if filename:
         user_folder = get_user_folder_name(current_user_directory_only=False)
         filename_xml = f'{filename}.xml'
-        pathname = f'{user_folder}/{filename_xml}'
+        pathname = get_xml_pathname(filename, folder_name=user_folder)
         if os.path.exists(pathname):
             # If we have a PID, we use that for the EML filename. The idea is that an ezEML EML document can be
             #   created under a filename that differs from the data package id, but then when a data package id is
@@ -145,7 +145,7 @@ def clean_orphaned_exports(user_dir, logger, logonly):
 
 
 def clean_orphaned_xml_and_eval_files(user_dir, logger, logonly):
-	# Remove xml and eval pkl files for which there is no corresponding JSON file
+	# Remove xml files for which there is no corresponding JSON file, and eval pkl files
 
 	json_filelist = glob.glob(f'{user_dir}/*.json')
 	xml_filelist = glob.glob(f'{user_dir}/*.xml')
@@ -161,15 +161,49 @@ def clean_orphaned_xml_and_eval_files(user_dir, logger, logonly):
 			except FileNotFoundError:
 				pass
 
+	# Evaluation results are now kept in the evaluation store (see webapp/home/utils/eval_store.py), so eval pkl files
+	#  are obsolete, orphaned or not.
 	for eval_file in eval_filelist:
-		json_file = eval_file[:-9] + '.json'
-		if json_file not in json_filelist:
-			try:
-				logger.info(f'Removing orphaned eval file {short_name(eval_file)}')
+		try:
+			logger.info(f'Removing obsolete eval file {short_name(eval_file)}')
+			if not logonly:
+				os.remove(eval_file)
+		except FileNotFoundError:
+			pass
+
+
+def clean_orphaned_lock_and_temp_files(user_dir, logger, logonly):
+	# Remove document lock files (.foo.lock), metadata records (.foo.meta), model sidecars (.foo.model), and Check All
+	#  Data Tables progress files (.foo.progress) for which there is no corresponding JSON file, and temp files
+	#  (.foo.json.xxxxxxxx.tmp) left behind by saves that were killed before they completed.
+	#  Temp files are only removed if they're more than an hour old, so we don't pull the rug out from under a save
+	#  that's in progress. Likewise, progress files are removed if they haven't been updated for an hour, since the
+	#  check they report on must have been killed.
+	now = datetime.datetime.now()
+
+	for suffix in ('.lock', '.meta', '.model', '.progress'):
+		for hidden_file in glob.glob(f'{glob.escape(user_dir)}/.*{suffix}'):
+			# Strip the known suffix rather than using splitext(), which is the same thing only as long as we're sure
+			#  of the suffix.
+			root = os.path.basename(hidden_file)[1:-len(suffix)]
+			json_file = os.path.join(user_dir, root + '.json')
+			if not os.path.exists(json_file):
+				try:
+					logger.info(f'Removing orphaned file {short_name(hidden_file)}')
+					if not logonly:
+						os.remove(hidden_file)
+				except FileNotFoundError:
+					pass
+
+	for temp_file in glob.glob(f'{user_dir}/.*.tmp') + glob.glob(f'{glob.escape(user_dir)}/.*.progress'):
+		try:
+			age = now - datetime.datetime.fromtimestamp(os.stat(temp_file).st_mtime)
+			if age.total_seconds() > 3600:
+				logger.info(f'Removing leftover temp file {short_name(temp_file)}')
 				if not logonly:
-					os.remove(eval_file)
-			except FileNotFoundError:
-				pass
+					os.remove(temp_file)
+		except FileNotFoundError:
+			pass
 
 
 @click.command()
@@ -242,9 +276,12 @@ def GC(days, base, keep_uploads, include_exports, exports_days, logonly):
 			# Remove orphaned directories in the exports directory
 			clean_orphaned_exports(user_dir, logger, logonly)
 
-			# Remove xml and eval pkl files for which there is no corresponding JSON file
+			# Remove xml files for which there is no corresponding JSON file, and eval pkl files
 			clean_orphaned_xml_and_eval_files(user_dir, logger, logonly)
 
+			# Remove orphaned lock files and metadata records, and temp files left behind by interrupted saves
+			clean_orphaned_lock_and_temp_files(user_dir, logger, logonly)
+
 
 if __name__ == '__main__':
 	GC()
@@ -2,7 +2,8 @@
 Helper functions for Check Data Tables.
 
 This code is set up to allow Check Data Tables to be called as a web service by another application.
-So, for example, its functions load_eml_file() and load_df() take arguments in the form of URLs rather than file paths.
+So, for example, its functions load_eml_file(), load_df(), and load_df_chunks() take arguments in the form of URLs rather
+than file paths.
 Likewise, the errors are returned as a JSON object rather than a Python dictionary, say.
 
 
@@ -16,15 +17,17 @@ We do the following:
     Let's say we have a data table file foobar.csv and we run check data table on it.
     
     We compute a hash of the data table metadata using the function hash_data_table_metadata_settings().
-    Let's say the hash is 1234567890. We save the JSON results of the check in a file named foobar.csv_eval_1234567890.
+    Let's say the hash is 1234567890. We save the JSON results of the check in a file named foobar.csv_eval_1234567890,
+    and record in an index for the document's uploads folder that foobar.csv was checked with metadata hash 1234567890,
+    which CSV file was checked, and whether any errors were found (see webapp/home/utils/data_table_evals.py).
     Then whenever we generate the Check Data Tables page, we can check to see if the metadata hash differs from the 
-    current metadata hash.
+    current metadata hash, or the CSV file has changed.
 
     If it does, we know we need to recompute the check, so on the Check Data Tables page, instead of displaying a
     "Show errors" link for the table, we display a "Check data table" link so the check will be performed anew.
 
-    If check data table returns no errors, we create a file foobar.csv_eval_1234567890_ok, where the "ok"
-    lets us know the table has no errors without our having to open the file and see that the errors list is empty.
+    Because the index records whether errors were found, we know the table has no errors without our having to open
+    the results file and see that the errors list is empty.
 
 One motivation for all this is that we frequently need to set the badge color for the Check Data Tables menu item,
 so we want to know as quickly as possible what the error check status is for each of the tables.
@@ -33,14 +36,14 @@ so we want to know as quickly as possible what the error check status is for eac
 import os
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import csv
 from datetime import datetime, timedelta
-from flask import session, flash, request, redirect, url_for
+from flask import session, flash, get_flashed_messages, request, redirect, url_for
 import glob
-import hashlib
 import json
+import multiprocessing
 import pandas as pd
-import re
 import requests
 from requests_file import FileAdapter
 from typing import List
@@ -48,11 +51,16 @@ import urllib.parse
 
 from urllib.parse import unquote_plus
 import urllib.request
-import warnings
 
 import webapp.home.metapype_client
 from webapp.home.home_utils import log_error, log_info, log_available_memory
+import webapp.home.utils.data_table_evals as data_table_evals
+import webapp.home.utils.data_table_settings as data_table_settings
+import webapp.home.utils.date_time_validators as date_time_validators
+import webapp.home.utils.eval_queue as eval_queue
 import webapp.home.utils.load_and_save
+import webapp.home.utils.table_check_queue as table_check_queue
+import webapp.home.utils.table_check_scheduler as table_check_scheduler
 from webapp.home.utils.security import validate_download_url
 from webapp.pages import PAGE_CHECK_DATA_TABLES, PAGE_DATA_TABLE_SELECT, PAGE_OTHER_ENTITY_SELECT
 from webapp.utils import path_exists, path_isdir, path_join
@@ -103,20 +111,18 @@ def load_eml_file(eml_file_url:str):
     return eml_node, nsmap_changed
 
 
-def load_df(eml_node, csv_url, data_table_name, max_rows=None):
+def get_csv_format(data_table_node):
     """
-    Retrieve a data table CSV file from a URL and return:
-     a Pandas data frame for it, and
-     a flag indicating whether the data frame was truncated.
+    Return the field delimiter, quote character, number of header lines, and number of footer lines that the metadata
+    specifies for a data table, defaulting to a comma, a double quote, 1, and 0, respectively.
     """
-
-    data_table_node = find_data_table_node(eml_node, data_table_name)
-
     field_delimiter_node = data_table_node.find_descendant(names.FIELDDELIMITER)
     if field_delimiter_node:
         delimiter = field_delimiter_node.content
     else:
         delimiter = ','
+    if delimiter == '\\t':
+        delimiter = '\t'
     quote_char_node = data_table_node.find_descendant(names.QUOTECHARACTER)
     if quote_char_node:
         quote_char = quote_char_node.content
@@ -137,24 +143,71 @@ def load_df(eml_node, csv_url, data_table_name, max_rows=None):
     except:
         pass
 
-    try:
-        if delimiter == '\\t':
-            delimiter = '\t'
-
-        num_rows = load_data.get_num_rows(unquote_plus(csv_url), delimiter=delimiter, quote_char=quote_char)
-        if max_rows is None:
-            max_rows = num_rows
-        truncated = num_rows > max_rows
-        df = pd.read_csv(unquote_plus(csv_url), encoding='utf-8-sig', sep=delimiter, quotechar=quote_char,
-                           keep_default_na=False, skiprows=range(1, num_header_lines), nrows=max_rows,
-                           skipfooter=num_footer_lines, low_memory=False, parse_dates=True,
-                           dtype=str)   # Set dtype to str to prevent pandas from converting empty strings to NaN,
-                                        # whole numbers to floats, etc.
-        return df, truncated
+    return delimiter, quote_char, num_header_lines, num_footer_lines
+
+
+def load_df_chunks(eml_node, csv_url, data_table_name, max_rows=None):
+    """
+    Retrieve a data table CSV file from a URL and return:
+     a generator of Pandas data frames for consecutive chunks of the table's rows, and
+     a flag indicating whether the rows were truncated to max_rows.
 
+    Only one chunk is in memory at a time, so memory use doesn't depend on the size of the table. A chunk has about
+    Config.DATA_TABLE_CHUNK_CELLS cells. The data frames' indexes continue from one chunk to the next, so a row's index
+    is its position in the table. There's always at least one data frame, so the columns are known even if the table
+    has no rows.
+
+    The table is read with pandas' C parser. The C parser doesn't support skipfooter, so the rows are counted first,
+    and the footer lines are excluded by reading only the rows that precede them.
+    """
+    return load_data_table_chunks(find_data_table_node(eml_node, data_table_name), csv_url, max_rows=max_rows)
+
+
+def load_data_table_chunks(data_table_node, csv_url, max_rows=None):
+    """
+    Like load_df_chunks(), but for a data table node that has already been found, e.g., in the model that's loaded
+    from the user's document.
+    """
+    delimiter, quote_char, num_header_lines, num_footer_lines = get_csv_format(data_table_node)
+    csv_path = unquote_plus(csv_url)
+    read_csv_args = dict(encoding='utf-8-sig', sep=delimiter, quotechar=quote_char, keep_default_na=False,
+                         skiprows=range(1, num_header_lines),
+                         dtype=str)     # Set dtype to str to prevent pandas from converting empty strings to NaN,
+                                        # whole numbers to floats, etc.
+    try:
+        # The count includes any header lines after the first, and the footer lines.
+        num_rows = load_data.get_num_rows(csv_path, delimiter=delimiter, quote_char=quote_char)
+        num_data_rows = max(num_rows - (num_header_lines - 1) - num_footer_lines, 0)
+        rows_to_read = min(num_data_rows, max_rows) if max_rows else num_data_rows
+        num_columns = len(pd.read_csv(csv_path, nrows=0, **read_csv_args).columns)
     except Exception as err:
         log_info(f'Error loading CSV file: {err}')
         raise
+    chunk_cells = getattr(Config, 'DATA_TABLE_CHUNK_CELLS', 10**6)
+    chunk_rows = max(chunk_cells // max(num_columns, 1), 1)
+
+    def chunks():
+        try:
+            if not rows_to_read:
+                yield pd.read_csv(csv_path, nrows=0, **read_csv_args)
+                return
+            with pd.read_csv(csv_path, nrows=rows_to_read, chunksize=chunk_rows, **read_csv_args) as reader:
+                yield from reader
+        except Exception as err:
+            log_info(f'Error loading CSV file: {err}')
+            raise
+
+    return chunks(), rows_to_read < num_data_rows
+
+
+def load_df(eml_node, csv_url, data_table_name, max_rows=None):
+    """
+    Retrieve a data table CSV file from a URL and return:
+     a Pandas data frame for it, and
+     a flag indicating whether the data frame was truncated.
+    """
+    chunks, truncated = load_df_chunks(eml_node, csv_url, data_table_name, max_rows=max_rows)
+    return pd.concat(list(chunks)), truncated
 
 
 def find_data_table_node(eml_node, data_table_name):
@@ -226,6 +279,21 @@ def get_attribute_node(data_table_node, attribute_name):
     raise ValueError(f'Column "{attribute_name}" not found in EML')
 
 
+def get_attribute_nodes_by_name(data_table_node):
+    """
+    Return a dict mapping the normalized names of a data table's attributes to the attribute nodes, for looking up
+    many attributes by name. As with get_attribute_node(), if names are duplicated, the first attribute wins.
+    """
+    attribute_nodes = []
+    data_table_node.find_all_descendants(names.ATTRIBUTE, attribute_nodes)
+    attribute_nodes_by_name = {}
+    for attribute_node in attribute_nodes:
+        attribute_name_node = attribute_node.find_child(names.ATTRIBUTENAME)
+        if attribute_name_node and attribute_name_node.content is not None:
+            attribute_nodes_by_name.setdefault(normalize_column_name(attribute_name_node.content), attribute_node)
+    return attribute_nodes_by_name
+
+
 def get_variable_type(attribute_node):
     """
     Get the variable type of an attribute (column) from an attribute node. Variable type here means
@@ -313,14 +381,32 @@ def create_error_json(data_table_name, column_name, row_index, error_type, expec
     return f'{{ "error_scope": "{error_scope}", "location": {location}, "error_type": "{error_type}", "expected": {json.dumps(expected)}, "found": {json.dumps(found)}}}'
 
 
-def get_date_time_format_specification(data_table_node, attribute_name):
+def create_element_errors_json(data_table_name, column_name, row_indices, error_type, expected, found_values):
+    """
+    Return a list of JSONs representing errors in elements of a column, one for each of the given row indexes and
+    corresponding values found. The JSONs are the same as create_error_json() would return, but the parts they have in
+    common are built just once.
+    """
+    if not data_table_name or not column_name:
+        return [create_error_json(data_table_name, column_name, row_index, error_type, expected, found)
+                for row_index, found in zip(row_indices, found_values)]
+    location = f'{{ "table": "{urllib.parse.quote(data_table_name)}", "column": "{urllib.parse.quote(column_name)}", "row": "'
+    prefix = f'{{ "error_scope": "element", "location": {location}'
+    middle = f'" }}, "error_type": "{error_type}", "expected": {json.dumps(expected)}, "found": '
+    dumps = json.dumps
+    return [f'{prefix}{row_index}{middle}{dumps(found)}}}' for row_index, found in zip(row_indices, found_values)]
+
+
+def get_date_time_format_specification(data_table_node, attribute_name, attribute_node=None):
     """
     Return the datetime format string, if any, found in the EML for a given attribute (column) name. If no format
     string is found, return None.
 
-    If an attribute with the given name is not found in the EML, raise ValueError.
+    If an attribute with the given name is not found in the EML, raise ValueError. If the caller has the attribute
+    node, it can pass it in to save looking it up.
     """
-    attribute_node = get_attribute_node(data_table_node, attribute_name)
+    if not attribute_node:
+        attribute_node = get_attribute_node(data_table_node, attribute_name)
     if attribute_node:
         format_string_node = attribute_node.find_single_node_by_path(
             [names.MEASUREMENTSCALE, names.DATETIME, names.FORMATSTRING])
@@ -329,18 +415,19 @@ def get_date_time_format_specification(data_table_node, attribute_name):
     raise ValueError
 
 
-def get_missing_value_codes(data_table_node, column_name):
+def get_missing_value_codes(data_table_node, column_name, attribute_node=None):
     """
     Return a list of missing value codes for a given attribute (column) name. If no missing value codes are found,
-    return an empty list.
+    return an empty list. If the caller has the attribute node, it can pass it in to save looking it up.
     """
-    attribute_node = get_attribute_node(data_table_node, column_name)
+    if not attribute_node:
+        attribute_node = get_attribute_node(data_table_node, column_name)
     missing_value_codes = []
     if attribute_node:
         missing_value_code_nodes = attribute_node.find_all_nodes_by_path([names.MISSINGVALUECODE, names.CODE])
         for missing_value_code_node in missing_value_code_nodes:
             if missing_value_code_node.content:
-                missing_value_codes.append(re.escape(missing_value_code_node.content))
+                missing_value_codes.append(missing_value_code_node.content)
     return missing_value_codes
 
 
@@ -377,24 +464,49 @@ def get_number_type(attribute_node):
 
 def match_with_regex(col_values, regex, mvc, empty_is_ok=True):
     """
-    Return a boolean Series indicating whether each value in a column matches a given regex.
+    Return a boolean Series indicating whether each value in a column matches a given regex or is one of the missing
+    value codes mvc (or is empty, if empty_is_ok).
+
+    The regex must match the whole value. The values it doesn't match are compared with the missing value codes as a
+    set, so the codes are taken literally and a long list of them doesn't slow the match.
     """
-    warnings.filterwarnings("ignore", 'This pattern is interpreted as a regular expression, and has match groups.')
-    # If regex starts with a ^, remove it temporarily
+    # If regex starts with a ^, remove it
     if regex.startswith('^'):
         regex = regex[1:]
-    # If regex ends with a $, remove it temporarily
+    # If regex ends with a $, remove it
     if regex.endswith('$'):
         regex = regex[:-1]
-    if mvc:
-        regex = f"({regex})" + '|' + f"{'|'.join(mvc)}"
+    return allow_missing_values(col_values, col_values.str.fullmatch(regex).astype(bool), mvc, empty_is_ok)
+
+
+def allow_missing_values(col_values, matches, mvc, empty_is_ok=True):
+    """
+    Given a boolean Series indicating whether each value in a column has the expected form, return one that also allows
+    the missing value codes mvc (and the empty string, if empty_is_ok).
+    """
+    allowed = set(mvc)
     if empty_is_ok:
-        regex = '$|' + regex
-    regex = f"^{regex}$"
-    matches = col_values.str.match(regex)
+        allowed.add('')
+    unmatched = ~matches.to_numpy()
+    if allowed and unmatched.any():
+        # Usually few values are unmatched, so they're looked up one by one.
+        matches = matches.to_numpy().copy()
+        matches[unmatched] = [value in allowed for value in col_values.to_numpy()[unmatched]]
+        matches = pd.Series(matches, index=col_values.index)
     return matches
 
 
+def match_with_codes(col_values, codes, mvc, empty_is_ok=True):
+    """
+    Return a boolean Series indicating whether each value in a column is one of the codes or missing value codes mvc
+    (or is empty, if empty_is_ok).
+    """
+    allowed = set(codes).union(mvc)
+    if empty_is_ok:
+        allowed.add('')
+    return col_values.isin(allowed)
+
+
 def check_columns_existence_against_metadata(data_table_node, df):
     """
     Check that the columns in a data table match what's expected based on the metadata.
@@ -443,67 +555,282 @@ def get_num_header_lines(data_table_node):
         return 1
 
 
-def check_numerical_column(df, data_table_node, column_name, max_errs_per_column):
+class ColumnCheck:
     """
-    Check the contents of a numerical column. I.e., check that the values are numbers and that they match the
-    numberType specified in the metadata.
+    A check of the contents of a numerical, categorical, or datetime column, i.e., a check that each value has the
+    form the metadata calls for or is a missing value code.
+
+    A table is checked a chunk of rows at a time (see load_df_chunks()), so what the check needs from the metadata is
+    looked up once, when the check is created, and check() is called for each chunk. The errors are accumulated from
+    chunk to chunk. Once there are more than max_errs_per_column, truncated is set and the remaining chunks are skipped.
     """
 
-    attribute_node = get_attribute_node(data_table_node, column_name)
-    number_type = get_number_type(attribute_node)
-    col_values = df[column_name].astype(str)
+    def __init__(self, data_table_node, column_name, variable_type, max_errs_per_column, attribute_node=None):
+        self.column_name = column_name
+        self.data_table_name = get_data_table_name(data_table_node)
+        self.num_header_lines = get_num_header_lines(data_table_node)
+        self.max_errs_per_column = max_errs_per_column
+        self.errors = []
+        self.truncated = False
+        self.done = False
+        self.not_found_error = None     # The error to report if the column isn't in the data table
+        self.regex = None               # The form of the values, for numerical and datetime columns
+        self.codes = None               # The allowed values, for categorical columns
+        self.validator = None           # The DateTimeValidator, for datetime columns
+        if not attribute_node:
+            attribute_node = get_attribute_node(data_table_node, column_name)
+        if variable_type == 'NUMERICAL':
+            self._init_numerical(data_table_node, attribute_node)
+        elif variable_type == 'CATEGORICAL':
+            self._init_categorical(data_table_node, attribute_node)
+        elif variable_type == 'DATETIME':
+            self._init_date_time(data_table_node, attribute_node)
+        else:
+            raise ValueError(f'Column {column_name} has unexpected variable type: {variable_type}')
 
-    # Construct a regex based on the number type
-    if number_type == 'integer':
-        regex = '^[-+]?[0-9]+$'
-    elif number_type == 'whole' or number_type == 'natural':
-        regex = '^[0-9]+$'
-    else:
-        regex = '^[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?$'
-    mvc = get_missing_value_codes(data_table_node, column_name)
-    truncated = False
+    def _init_numerical(self, data_table_node, attribute_node):
+        """ Check that the values are numbers that match the numberType specified in the metadata. """
+        number_type = get_number_type(attribute_node)
+
+        # Construct a regex based on the number type
+        if number_type == 'integer':
+            self.regex = '^[-+]?[0-9]+$'
+        elif number_type == 'whole' or number_type == 'natural':
+            self.regex = '^[0-9]+$'
+        else:
+            self.regex = '^[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?$'
+        self.mvc = get_missing_value_codes(data_table_node, self.column_name, attribute_node)
+        self.error_type = 'Numerical element not of the expected type'
+        # Set up the expected value error message based on the number type
+        self.expected = number_type
+        if number_type == 'real':
+            self.expected = 'A real number (e.g., 123.4)'
+        elif number_type == 'integer':
+            self.expected = 'An integer (e.g. -3, 0, 42)'
+        elif number_type == 'whole':
+            self.expected = 'A whole number (e.g. 0, 1, 2)'
+        elif number_type == 'natural':
+            self.expected = 'A natural number (e.g. 0, 1, 2)'
+        self.not_found_error = create_error_json(self.data_table_name, self.column_name, None,
+                                                 'Column not found in data table', self.column_name, 'Not found')
+
+    def _init_categorical(self, data_table_node, attribute_node):
+        """ Check that the values are in the list of codes and missing value codes. """
+        # If the metadata says codes values are not "enforced" to be the defined codes, then there cannot be errors
+        enumerated_domain_node = attribute_node.find_descendant(names.ENUMERATEDDOMAIN)
+        if enumerated_domain_node and enumerated_domain_node.attribute_value('enforced') == 'no':
+            self.done = True
+            return
+        self.codes = get_categorical_codes(attribute_node)
+        self.mvc = get_missing_value_codes(data_table_node, self.column_name, attribute_node)
+        self.error_type = 'Categorical element is not a defined code'
+        self.expected = 'A defined code'
+        # If the column is missing, that type of error is reported via check_columns_existence_against_metadata()
+
+    def _init_date_time(self, data_table_node, attribute_node):
+        """ Check that the values are in the format specified in the metadata. """
+        date_time_format = get_date_time_format_specification(data_table_node, self.column_name, attribute_node)
+        load_date_time_format_files()
+        # A format that's not in our list is checked, if possible, against a regex compiled from the format string.
+        self.validator = date_time_validators.get_validator(date_time_format,
+                                                            date_time_format_regex.get(date_time_format, None))
+        if not self.validator:
+            self.errors.append(create_error_json(self.data_table_name, self.column_name, None,
+                                                 'The specified DateTime Format String is not supported.',
+                                                 'A <a href="../datetime_formats">supported</a> format',
+                                                 date_time_format))
+            self.done = True
+            return
+        self.mvc = get_missing_value_codes(data_table_node, self.column_name, attribute_node)
+        self.error_type = 'DateTime element does not have expected format'
+        self.expected = date_time_format
+        self.not_found_error = create_error_json(self.data_table_name, self.column_name, None,
+                                                 'Column not found in table', self.column_name, 'Not found')
+
+    def check(self, df):
+        """ Check the column's values in a chunk of the table. """
+        if self.done:
+            return
+        if self.column_name not in df.columns:
+            if self.not_found_error:
+                self.errors.append(self.not_found_error)
+            self.done = True
+            return
+        self.add_errors(self.find_errors(df[self.column_name], self.errors_wanted()))
+
+    def errors_wanted(self):
+        """ Return the number of errors it would take to exceed max_errs_per_column, or None if there's no maximum. """
+        if self.max_errs_per_column:
+            return self.max_errs_per_column + 1 - len(self.errors)
+        return None
+
+    def find_errors(self, column, limit=None):
+        """
+        Return the errors in a chunk of the column, given as a Series indexed by row position, up to limit of them.
+
+        This depends only on how the check was set up, not on the errors found so far, so it can be done in a pool
+        process (see check_columns()).
+        """
+        col_values = column.astype(str)
+        if self.codes is not None:
+            matches = match_with_codes(col_values, self.codes, self.mvc)
+        elif self.validator is not None:
+            matches = allow_missing_values(col_values, self.validator.match(col_values), self.mvc)
+        else:
+            matches = match_with_regex(col_values, self.regex, self.mvc)
+        if matches.all():
+            return []
+        errs = ~matches.to_numpy()
+        error_indices = column.index.to_numpy()[errs]
+        found_values = col_values.to_numpy()[errs]
+        if limit is not None:
+            # Build only as many errors as are wanted.
+            error_indices = error_indices[:limit]
+            found_values = found_values[:limit]
+        # Make the index 1-based and take into account the number of header rows. I.e., make it match what they'd see in Excel.
+        return create_element_errors_json(self.data_table_name, self.column_name,
+                                          (error_indices + self.num_header_lines + 1).tolist(),
+                                          self.error_type, self.expected, found_values.tolist())
+
+    def add_errors(self, errors):
+        """ Add errors found by find_errors(). Once there are more than max_errs_per_column, the check is done. """
+        self.errors.extend(errors)
+        if self.max_errs_per_column and len(self.errors) > self.max_errs_per_column:
+            self.truncated = True
+            self.done = True
+
+    def __getstate__(self):
+        # The errors found so far aren't needed to find more, so they aren't sent to pool processes.
+        state = self.__dict__.copy()
+        state['errors'] = []
+        return state
+
+
+def find_column_errors(tasks):
+    """
+    Find the errors in chunks of columns. tasks is a list of (column check, column values, limit) tuples, and a list of
+    the errors found for each is returned.
+    """
+    return [column_check.find_errors(column, limit) for column_check, column, limit in tasks]
+
+
+def pack_column(column):
+    """
+    Return a chunk of a column in a form that's cheap to send to a pool process. Pickling a Series of strings costs
+    much more than pickling one long string, so unless a value contains a NUL, the values are joined by NULs.
+    """
+    values = column.tolist()
     try:
-        matches = match_with_regex(col_values, regex, mvc)
-    except KeyError:
-        # This indicates the column name was not found in the data table.
-        return [create_error_json(get_data_table_name(data_table_node), column_name, None,
-                                 'Column not found in data table', column_name, 'Not found')], truncated
-    # mvc = get_missing_value_codes(data_table_node, column_name)
-    # if len(mvc) > 0:
-    #     mvc_regex = '^' + '|'.join(mvc) + '$'
-    #     warnings.filterwarnings("ignore", 'This pattern is interpreted as a regular expression, and has match groups.')
-    #     mvc_matches = col_values.str.contains(mvc_regex)
-    #     # Errors are rows with both matches == False and mvc_matches == False
-    #     result = ~(matches | mvc_matches)
-    # else:
-    #     result = ~matches
-    result = ~matches
-    error_indices = result[result].index.values
+        joined = '\x00'.join(values)
+        if joined.count('\x00') == max(len(values) - 1, 0):
+            values = joined
+    except TypeError:
+        pass
+    return values, column.index
 
-    data_table_name = get_data_table_name(data_table_node)
-    # Set up the expected value error message based on the number type
-    expected = number_type
-    if number_type == 'real':
-        expected = 'A real number (e.g., 123.4)'
-    elif number_type == 'integer':
-        expected = 'An integer (e.g. -3, 0, 42)'
-    elif number_type == 'whole':
-        expected = 'A whole number (e.g. 0, 1, 2)'
-    elif number_type == 'natural':
-        expected = 'A natural number (e.g. 0, 1, 2)'
-    errors = []
-    num_header_lines = get_num_header_lines(data_table_node)
-    for index in error_indices:
-        # Make the index 1-based and taking into account the number of header rows. I.e., make it match what they'd see in Excel.
-        errors.append(create_error_json(data_table_name, column_name,
-                                        index + num_header_lines + 1,
-                                        'Numerical element not of the expected type',
-                                        expected, col_values[index]))
-        if max_errs_per_column and len(errors) > max_errs_per_column:
-            truncated = True
+
+def unpack_column(packed_column):
+    """ Return the Series for a column packed by pack_column(). """
+    values, index = packed_column
+    if isinstance(values, str):
+        values = values.split('\x00') if len(index) else []
+    return pd.Series(values, index=index, dtype=str)
+
+
+def find_packed_column_errors(tasks):
+    """ Do find_column_errors() in a pool process, given the columns packed by pack_column(). """
+    return find_column_errors([(column_check, unpack_column(packed_column), limit)
+                               for column_check, packed_column, limit in tasks])
+
+
+def column_check_processes():
+    """ Return the maximum number of processes to use for checking the columns of a table. """
+    return getattr(Config, 'DATA_TABLE_CHECK_PROCESSES', 1) or 1
+
+
+def create_column_check_pool(num_columns, num_processes=None):
+    """
+    Return a pool of processes for checking the columns of a table, or None if the columns are to be checked in this
+    process. The number of processes is limited by num_processes, which defaults to Config.DATA_TABLE_CHECK_PROCESSES,
+    and by the number of columns.
+    """
+    num_processes = min(num_processes or column_check_processes(), num_columns)
+    if num_processes < 2:
+        return None
+    # Forked processes start without having to import the app, and inherit what's been loaded, e.g., the datetime
+    #  formats.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = None
+    return ProcessPoolExecutor(max_workers=num_processes, mp_context=context)
+
+
+def check_columns(column_checks, df, pool=None, max_errs_per_table=None):
+    """
+    Check the columns in a chunk of a table.
+
+    If there's a pool (see create_column_check_pool()), the columns are divided into as many groups as the pool has
+    processes, each group's columns being sent to a process, packed by pack_column(), along with their checks. Either
+    way, the errors are added to the checks in column order, so the results are the same whether or not there's a pool.
+
+    If max_errs_per_table is given, once the columns have more errors than that in all, the checks are done.
+    """
+    active_checks = []
+    for column_check in column_checks:
+        if column_check.done:
+            continue
+        if column_check.column_name not in df.columns:
+            column_check.check(df)
+            continue
+        active_checks.append(column_check)
+    if not active_checks:
+        return
+
+    table_errors_wanted = None
+    if max_errs_per_table:
+        table_errors_wanted = max_errs_per_table + 1 - sum(len(column_check.errors) for column_check in column_checks)
+    tasks = []
+    for column_check in active_checks:
+        limit = column_check.errors_wanted()
+        if table_errors_wanted is not None:
+            limit = table_errors_wanted if limit is None else min(limit, table_errors_wanted)
+        tasks.append((column_check, df[column_check.column_name], limit))
+
+    if pool:
+        num_groups = min(column_check_processes(), len(tasks))
+        group_size, extra = divmod(len(tasks), num_groups)
+        groups = []
+        start = 0
+        for i in range(num_groups):
+            end = start + group_size + (1 if i < extra else 0)
+            groups.append([(column_check, pack_column(column), limit)
+                           for column_check, column, limit in tasks[start:end]])
+            start = end
+        found = [errors for group_errors in pool.map(find_packed_column_errors, groups) for errors in group_errors]
+    else:
+        found = find_column_errors(tasks)
+
+    for column_check, errors in zip(active_checks, found):
+        if table_errors_wanted is not None:
+            errors = errors[:table_errors_wanted]
+            table_errors_wanted -= len(errors)
+        column_check.add_errors(errors)
+        if table_errors_wanted == 0:
+            column_check.truncated = True
+            for other_check in column_checks:
+                other_check.done = True
             break
 
-    return errors, truncated
+
+def check_numerical_column(df, data_table_node, column_name, max_errs_per_column):
+    """
+    Check the contents of a numerical column. I.e., check that the values are numbers and that they match the
+    numberType specified in the metadata.
+    """
+    column_check = ColumnCheck(data_table_node, column_name, 'NUMERICAL', max_errs_per_column)
+    column_check.check(df)
+    return column_check.errors, column_check.truncated
 
 
 def check_categorical_column(df, data_table_node, column_name, max_errs_per_column):
@@ -511,50 +838,9 @@ def check_categorical_column(df, data_table_node, column_name, max_errs_per_colu
     Check the contents of a categorical column. I.e., check that the values are in the list of codes
     and missing value codes.
     """
-
-    errors = []
-    truncated = False
-    attribute_node = get_attribute_node(data_table_node, column_name)
-    col_values = df[column_name].astype(str)
-
-    # If the metadata says codes values are not "enforced" to be the defined codes, then there cannot be errors
-    enumerated_domain_node = attribute_node.find_descendant(names.ENUMERATEDDOMAIN)
-    if enumerated_domain_node and enumerated_domain_node.attribute_value('enforced') == 'no':
-        return [], truncated
-
-    codes = list(map(re.escape, get_categorical_codes(attribute_node)))
-    codes_regex = '^' + '|'.join(codes) + '$'
-    mvc = get_missing_value_codes(data_table_node, column_name)
-    try:
-        matches = match_with_regex(col_values, codes_regex, mvc)
-    except KeyError:
-        return [], truncated   # This indicates the column is missing, but that type of error is reported via
-                               # check_columns_existence_against_metadata()
-    # mvc = get_missing_value_codes(data_table_node, column_name)
-    # if len(mvc) > 0:
-    #     mvc_regex = '^' + '|'.join(mvc) + '$'
-    #     warnings.filterwarnings("ignore", 'This pattern is interpreted as a regular expression, and has match groups.')
-    #     mvc_matches = col_values.str.contains(mvc_regex)
-    #     # Errors are rows with both matches == False and mvc_matches == False
-    #     result = ~(matches | mvc_matches)
-    # else:
-    #     result = ~matches
-    result = ~matches
-    error_indices = result[result].index.values
-    data_table_name = get_data_table_name(data_table_node)
-    expected = 'A defined code'
-    num_header_lines = get_num_header_lines(data_table_node)
-    for index in error_indices:
-        # Make the index 1-based and take into account the number of header rows. I.e., make it match what they'd see in Excel.
-        errors.append(create_error_json(data_table_name, column_name,
-                                        index + num_header_lines + 1,
-                                        'Categorical element is not a defined code',
-                                        expected, col_values[index]))
-        if max_errs_per_column and len(errors) > max_errs_per_column:
-            truncated = True
-            break
-
-    return errors, truncated
+    column_check = ColumnCheck(data_table_node, column_name, 'CATEGORICAL', max_errs_per_column)
+    column_check.check(df)
+    return column_check.errors, column_check.truncated
 
 
 def check_date_time_column(df, data_table_node, column_name, max_errs_per_column):
@@ -562,59 +848,9 @@ def check_date_time_column(df, data_table_node, column_name, max_errs_per_column
     Check the contents of a datetime column. I.e., check that the values are in the expected format based on the
     metadata or are one of the missing value codes.
     """
-
-    def get_date_time_format_regex(data_table_node, attribute_name):
-        """ Get the regex for the date time format specified in the metadata."""
-        def get_regex_for_format(format):
-            load_date_time_format_files()
-            return date_time_format_regex.get(format, None)
-
-        date_time_format = get_date_time_format_specification(data_table_node, attribute_name)
-        return get_regex_for_format(date_time_format)
-
-    col_values = df[column_name].astype(str)
-    truncated = False
-    regex = get_date_time_format_regex(data_table_node, column_name)
-    if not regex:
-        date_time_format = get_date_time_format_specification(data_table_node, column_name)
-        return [create_error_json(get_data_table_name(data_table_node), column_name, None,
-                                 'The specified DateTime Format String is not supported.',
-                                  'A <a href="../datetime_formats">supported</a> format',
-                                  date_time_format)], truncated
-    mvc = get_missing_value_codes(data_table_node, column_name)
-    try:
-        matches = match_with_regex(col_values, regex, mvc)
-    # try:
-    #     matches = match_with_regex(col_values, regex)
-    except KeyError:
-        return [create_error_json(get_data_table_name(data_table_node), column_name, None,
-                                 'Column not found in table', (column_name), 'Not found')], truncated
-    # mvc = get_missing_value_codes(data_table_node, column_name)
-    # if len(mvc) > 0:
-    #     mvc_regex = '^' + '|'.join(mvc) + '$'
-    #     warnings.filterwarnings("ignore", 'This pattern is interpreted as a regular expression, and has match groups.')
-    #     mvc_matches = col_values.str.contains(mvc_regex)
-    #     # Errors are rows with both matches == False and mvc_matches == False
-    #     result = ~(matches | mvc_matches)
-    # else:
-    #     result = ~matches
-    result = ~matches
-    error_indices = result[result].index.values
-    data_table_name = get_data_table_name(data_table_node)
-    expected = get_date_time_format_specification(data_table_node, column_name)
-    errors = []
-    num_header_lines = get_num_header_lines(data_table_node)
-    for index in error_indices:
-        # Make the index 1-based and taking into account the number of header rows. I.e., make it match what they'd see in Excel.
-        errors.append(create_error_json(data_table_name, column_name,
-                                        index + num_header_lines + 1,
-                                        'DateTime element does not have expected format',
-                                        expected, col_values[index]))
-        if max_errs_per_column and len(errors) > max_errs_per_column:
-            truncated = True
-            break
-
-    return errors, truncated
+    column_check = ColumnCheck(data_table_node, column_name, 'DATETIME', max_errs_per_column)
+    column_check.check(df)
+    return column_check.errors, column_check.truncated
 
 
 def check_data_table(eml_file_url:str=None,
@@ -622,7 +858,9 @@ def check_data_table(eml_file_url:str=None,
                      data_table_name:str=None,
                      column_names:List[str]=None,
                      max_errs_per_column=Config.MAX_ERRS_PER_COLUMN,
-                     collapse_errs:bool=False):
+                     collapse_errs:bool=False,
+                     column_check_processes:int=None,
+                     data_table_node:Node=None):
     """
     Check a data table and return JSON with information about what was checked and a list of any errors found.
 
@@ -630,68 +868,86 @@ def check_data_table(eml_file_url:str=None,
 
     eml_file and csv_file are provided as URLs. Check the column names match the metadata, and for each column check
     its contents based on the metadata specification for the column.
+
+    The table is read and checked a chunk of rows at a time, so memory use doesn't depend on the size of the table.
+    The columns of each chunk are checked in a pool of processes if column_check_processes, which defaults to
+    Config.DATA_TABLE_CHECK_PROCESSES, is more than 1 (see check_columns()).
+
+    Within ezEML, the caller already has the document's model, so it passes the table's node as data_table_node, and
+    the EML file isn't loaded and parsed again. eml_file_url is then used only to identify the EML file in the results.
     """
-    eml_node, _ = load_eml_file(eml_file_url)
+    if data_table_node is None:
+        eml_node, _ = load_eml_file(eml_file_url)
+        data_table_node = find_data_table_node(eml_node, data_table_name)
 
     if not check_table_headers(csv_file_url=csv_file_url):
         flash(f'A column header in table {data_table_name} contains a "#" character, which is not allowed. '
               'Please remove this character and re-upload the file.', 'error')
         return False
 
-    max_rows = Config.MAX_DATA_ROWS_TO_CHECK
-    df, truncated = load_df(eml_node, csv_file_url, data_table_name, max_rows=max_rows)
+    # The table is read in chunks, so a limit on the number of rows is needed only to limit the time a check takes.
+    max_rows = getattr(Config, 'MAX_DATA_ROWS_TO_CHECK_CONTENTS', Config.MAX_DATA_ROWS_TO_CHECK)
+    chunks, truncated = load_data_table_chunks(data_table_node, csv_file_url, max_rows=max_rows)
     if truncated:
         flash(f'The number of rows in {os.path.basename(unquote_plus(csv_file_url))} is greater than {max_rows:,}. ezEML checks '
               f'only the first {max_rows:,} rows. Often this suffices to indicate the kinds of errors that are present.\nThe full '
               f'file will be checked when you submit the data package to the EDI repository.', 'warning')
 
-    log_available_memory('After loading the data table')
-
-    data_table_node = find_data_table_node(eml_node, data_table_name)
-    errors, data_table_column_names, metadata_column_names = check_columns_existence_against_metadata(data_table_node, df)
-
-    # Check for empty rows
     data_table_name = get_data_table_name(data_table_node)
     num_header_lines = get_num_header_lines(data_table_node)
-    errors.extend(check_for_empty_rows(df, data_table_name, num_header_lines))
 
-    if not column_names:
-        # check them all... we will use the data table column names. they may not exactly match the metadata column
-        # names, for example if there are spaces at the end of column names.
-        column_names = data_table_column_names
+    # A limit on the total number of errors in the columns, in addition to the limit for each column
+    max_errs_per_table = getattr(Config, 'MAX_ERRS_PER_TABLE', None)
+
+    errors = None
+    empty_row_errors = []
+    column_checks = []
     columns_checked = []
-    truncated = False
-    for column_name in column_names:
-        if column_name not in data_table_column_names:
-            continue
-        try:
-            attribute_node = get_attribute_node(data_table_node, column_name)
-        except ValueError:
-            # If the column is not found in the metadata, then it is a column name mismatch error that will have been
-            #  reported above by check_columns_existence_against_metadata().
-            continue
-        variable_type = get_variable_type(attribute_node)
-        from datetime import date, datetime
-        start = datetime.now()
-        if variable_type == 'CATEGORICAL':
-            columns_checked.append(column_name)
-            new_errors, truncated = check_categorical_column(df, data_table_node, column_name, max_errs_per_column)
-            errors.extend(new_errors)
-        elif variable_type == 'DATETIME':
-            columns_checked.append(column_name)
-            new_errors, truncated = check_date_time_column(df, data_table_node, column_name, max_errs_per_column)
-            errors.extend(new_errors)
-        elif variable_type == 'NUMERICAL':
-            columns_checked.append(column_name)
-            new_errors, truncated = check_numerical_column(df, data_table_node, column_name, max_errs_per_column)
-            errors.extend(new_errors)
-        end = datetime.now()
-        elapsed = (end - start).total_seconds()
-        log_available_memory(f'After checking column: {column_name}... elapsed time: {elapsed:.1f} seconds')
+    num_rows_checked = 0
+    pool = None
+    try:
+        for df in chunks:
+            if errors is None:
+                # The first chunk has what we need to know about the columns.
+                errors, data_table_column_names, metadata_column_names = \
+                    check_columns_existence_against_metadata(data_table_node, df)
+                if not column_names:
+                    # check them all... we will use the data table column names. they may not exactly match the metadata
+                    # column names, for example if there are spaces at the end of column names.
+                    column_names = data_table_column_names
+                attribute_nodes_by_name = get_attribute_nodes_by_name(data_table_node)
+                for column_name in column_names:
+                    if column_name not in data_table_column_names:
+                        continue
+                    attribute_node = attribute_nodes_by_name.get(normalize_column_name(column_name))
+                    if not attribute_node:
+                        # If the column is not found in the metadata, then it is a column name mismatch error that will
+                        #  have been reported above by check_columns_existence_against_metadata().
+                        continue
+                    variable_type = get_variable_type(attribute_node)
+                    if variable_type in ('CATEGORICAL', 'DATETIME', 'NUMERICAL'):
+                        columns_checked.append(column_name)
+                        column_checks.append(ColumnCheck(data_table_node, column_name, variable_type,
+                                                         max_errs_per_column, attribute_node))
+
+                pool = create_column_check_pool(len(column_checks), column_check_processes)
+
+            empty_row_errors.extend(check_for_empty_rows(df, data_table_name, num_header_lines,
+                                                         first_row_position=num_rows_checked))
+            check_columns(column_checks, df, pool, max_errs_per_table)
+            num_rows_checked += len(df)
+            log_available_memory(f'After checking {num_rows_checked:,} rows')
+    finally:
+        if pool:
+            pool.shutdown()
+
+    errors.extend(empty_row_errors)
+    for column_check in column_checks:
+        errors.extend(column_check.errors)
 
     results = create_result_json(eml_file_url, csv_file_url, columns_checked, errors, max_errs_per_column)
 
-    if truncated:
+    if any(column_check.truncated for column_check in column_checks):
         flash('Only partial results are shown below because the number of errors has exceeded the maximum allowed.\n' \
               'To find additional errors, correct the errors shown below, re-upload the table, and run the check again.')
 
@@ -766,9 +1022,10 @@ def check_date_time_attribute(attribute_node):
             return format_string
 
 
-def check_for_empty_rows(df, data_table_name, num_header_lines):
+def check_for_empty_rows(df, data_table_name, num_header_lines, first_row_position=0):
     """
-    Check for empty rows in the data table.
+    Check for empty rows in the data table. If df is a chunk of the table, first_row_position is the position of its
+    first row in the table.
     """
     errors = []
     # Check for empty rows
@@ -777,7 +1034,7 @@ def check_for_empty_rows(df, data_table_name, num_header_lines):
     for index in empty_row_indices:
         # Make the index 1-based and take into account the number of header rows. I.e., make it match what they'd see in Excel.
         # We need to handle MultiIndex data frames as well as regular data frames.
-        row_position = df.index.get_loc(index)
+        row_position = first_row_position + df.index.get_loc(index)
         errors.append(create_error_json(data_table_name, None,
                                         row_position + num_header_lines + 1,
                                         'Row is empty', 'Data', 'No data'))
@@ -869,7 +1126,13 @@ def generate_error_info_for_webpage(data_table_node, errors):
 
 
 def get_eml_file_url(document_name, eml_node):
-    """ Return the EML file location as a URL for use in the check data tables code. """
+    """
+    Return the EML file location as a URL for use in the check data tables code.
+
+    The checks are given the table's node from the model, so the URL only identifies the EML file in the results, and
+    the XML isn't regenerated here. The XML file is written when something reads it (see get_xml_pathname()), so it
+    may not exist yet.
+    """
     filepath = f'{path_join(Config.BASE_DIR, user_data.get_user_folder_name(), document_name)}.xml'
     encoded_for_url = f'{path_join(Config.BASE_DIR, user_data.get_user_folder_name(), urllib.parse.quote(document_name))}.xml'
     if path_exists(filepath):
@@ -879,11 +1142,13 @@ def get_eml_file_url(document_name, eml_node):
         filepath = f'{path_join(Config.BASE_DIR, user_data.get_user_folder_name(), package_id)}.xml'
         if path_exists(filepath):
             return f'file://{filepath}'
-    return None
+    return f'file://{encoded_for_url}'
 
 
 def get_eml_external_url(document_name):
     """ Return the EML's URL for use in the explore data tables code. """
+    # Make sure the XML that will be fetched via the URL is up to date with the JSON.
+    webapp.home.utils.load_and_save.get_xml_pathname(document_name, folder_name=user_data.get_user_folder_name())
     parsed_url = urllib.parse.urlparse(request.base_url)
     path = f'{os.path.join(user_data.get_user_download_folder_name(), urllib.parse.quote(document_name))}.xml'
     return f"{parsed_url.scheme}://{parsed_url.netloc}/{path}"
@@ -912,17 +1177,6 @@ def get_csv_filepath(document_name, csv_file_name):
         return None
 
 
-def get_csv_errors_archive_filepath(document_name, csv_file_name, metadata_hash):
-    """ Return the file paths associated with the  CSV file. """
-
-    archive_filepath = f"{get_csv_filepath(document_name, csv_file_name)}_eval_{metadata_hash}"
-    ok_filepath = f"{get_csv_filepath(document_name, csv_file_name)}_eval_{metadata_hash}_ok"
-    # Allow for the metadata hash forming part of the eval file's filename.
-    wildcard_filepath = f"{get_csv_filepath(document_name, csv_file_name)}_eval_??????????"
-    ok_wildcard_filepath = f"{get_csv_filepath(document_name, csv_file_name)}_eval_??????????_ok"
-    return archive_filepath, ok_filepath, wildcard_filepath, ok_wildcard_filepath
-
-
 def set_check_data_tables_badge_status(document_name, eml_node):
     """ Determine the color of the Check Data Tables badge in the main Contents menu. """
     status = 'green'
@@ -931,7 +1185,7 @@ def set_check_data_tables_badge_status(document_name, eml_node):
     for data_table_node in data_table_nodes:
         csv_file_name = get_data_table_filename(data_table_node)
         data_table_name = get_data_table_name(data_table_node)
-        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name)
+        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name, data_table_node)
         this_status = get_data_file_eval_status(document_name, csv_file_name, metadata_hash)
 
         if this_status == 'red' or this_status == 'black':
@@ -1059,13 +1313,8 @@ def get_data_file_eval_status(document_name, csv_file_name, metadata_hash):
     if not csv_file_exists(document_name, csv_file_name):
         return 'black'
     # Returns green, yellow, red, or black.
-    archive_filepath, ok_filepath, wildcard_filepath, ok_wildcard_filepath = \
-        get_csv_errors_archive_filepath(document_name, csv_file_name, metadata_hash)
-    if path_exists(archive_filepath):
-        return "red"
-    if path_exists(ok_filepath):
-        return "green"
-    return "yellow"
+    uploads_folder = user_data.get_document_uploads_folder_name(document_name)
+    return data_table_evals.get_status(uploads_folder, csv_file_name, metadata_hash)
 
 #
 # def flush_dex_cache_entry(eml_url, csv_url, dist_url):
@@ -1116,48 +1365,30 @@ def flush_dex_cache(eml_node, current_document, csv_file_name):
 def reset_data_file_eval_status(eml_node, document_name, csv_file_name):
     """ Reset the data table to unevaluated state, for example because a Reupload has been done. """
 
-    archive_filepath, ok_filepath, wildcard_filepath, ok_wildcard_filepath = \
-        get_csv_errors_archive_filepath(document_name, csv_file_name, '')
+    data_table_evals.reset(user_data.get_document_uploads_folder_name(document_name), csv_file_name)
+    flush_dex_cache(eml_node, document_name, csv_file_name)
 
-    filelist = glob.glob(wildcard_filepath)
-    for filepath in filelist:
-        os.remove(filepath)
 
-    filelist = glob.glob(ok_wildcard_filepath)
-    for filepath in filelist:
-        os.remove(filepath)
+def save_data_file_eval_results(uploads_folder, csv_file_name, metadata_hash, errors):
+    """ Save the results of the data table evaluation in the given uploads folder. Doesn't depend on the session. """
 
-    flush_dex_cache(eml_node, document_name, csv_file_name)
+    errs_obj = json.loads(errors)
+    data_table_evals.save_results(uploads_folder, csv_file_name, metadata_hash, errors, ok=not errs_obj['errors'])
 
 
 def save_data_file_eval(eml_node, document_name, csv_file_name, metadata_hash, errors):
     """ Save the results of the data table evaluation. """
 
-    reset_data_file_eval_status(eml_node, document_name, csv_file_name)
-    archive_filepath, ok_filepath, wildcard_filepath, ok_wildcard_filepath = \
-        get_csv_errors_archive_filepath(document_name, csv_file_name, metadata_hash)
-    errs_obj = json.loads(errors)
-    if not errs_obj['errors']:
-        archive_filepath = ok_filepath
-    with open(archive_filepath, 'w') as eval_file:
-        eval_file.write(errors)
+    save_data_file_eval_results(user_data.get_document_uploads_folder_name(document_name), csv_file_name,
+                                metadata_hash, errors)
+    flush_dex_cache(eml_node, document_name, csv_file_name)
 
 
 def get_data_file_eval(document_name, csv_file_name, metadata_hash):
-    """ Return the data table evaluation results as saved in an eval file, or None if no eval file exists. """
-
-    archive_filepath, ok_filepath, wildcard_filepath, ok_wildcard_filepath = \
-        get_csv_errors_archive_filepath(document_name, csv_file_name, metadata_hash)
-    if not path_exists(archive_filepath):
-        archive_filepath = ok_filepath
-        if not path_exists(archive_filepath):
-            # There may exist a version with a different hash. If so, it's obsolete and we want to delete it.
-            matches = glob.glob(wildcard_filepath)
-            for match in matches:
-                os.remove(match)
-            return None
-    with open(archive_filepath, 'r') as eval_file:
-        return eval_file.read()
+    """ Return the data table evaluation results as saved in an eval file, or None if there are no current results. """
+
+    return data_table_evals.get_results(user_data.get_document_uploads_folder_name(document_name), csv_file_name,
+                                        metadata_hash)
 
 
 def check_table_headers(current_document=None, data_table_node=None, csv_file_url=None):
@@ -1179,7 +1410,34 @@ def check_table_headers(current_document=None, data_table_node=None, csv_file_ur
     return True
 
 
+def check_data_table_in_worker(eml_file_url, csv_file_url, data_table_name, data_table_json):
+    """
+    Check a data table in a worker process for check_all_tables(), and return the results along with the messages the
+    check flashed, as (category, message) pairs, so they can be flashed in the request.
+
+    data_table_json is a snapshot of the table's node in the model, from metapype_io.to_json(), so the worker needn't
+    load the EML file. The worker has no request of its own, so the check is done in a test request context. The worker
+    processes are already running in parallel, so the table's columns are checked in the worker's process.
+    """
+    from webapp import app
+    data_table_node = metapype_io.from_json(data_table_json)
+    with app.test_request_context('/'):
+        errors = check_data_table(eml_file_url, csv_file_url, data_table_name, column_check_processes=1,
+                                  data_table_node=data_table_node)
+        return errors, get_flashed_messages(with_categories=True)
+
+
 def check_all_tables(current_document, eml_node):
+    """
+    Check the tables that haven't been checked since they or their metadata changed, i.e., the ones whose badges are
+    yellow. Tables whose saved results are still valid are skipped.
+
+    If Config.EVALUATION_WORKER is True, the tables are handed to the background worker (see
+    webapp/home/utils/table_check_queue.py), and we return without waiting for them. Otherwise, they're checked here,
+    and the request waits for them: in worker processes if Config.CHECK_DATA_TABLES_PROCESSES_PER_USER is more than 1
+    (see webapp/home/utils/table_check_scheduler.py), and one after another if not. Either way, each table's results
+    are saved as soon as its check is done, and the progress is recorded so the Check Data Tables page can show it.
+    """
     def check_all_table_headers(current_document, eml_node):
         data_table_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE])
         for data_table_node in data_table_nodes:
@@ -1190,36 +1448,87 @@ def check_all_tables(current_document, eml_node):
                 return False
         return True
 
-    def check_a_table(current_document, eml_node, data_table_node, data_table_name):
-        eml_file_url = get_eml_file_url(current_document, eml_node)
-        csv_file_url = get_csv_file_url(current_document, data_table_node)
+    def save_results(data_table_node, data_table_name, metadata_hash, errors):
         csv_filename = get_data_table_filename(data_table_node)
-        csv_filepath = get_csv_filepath(current_document, csv_filename)
-        data_table_size = get_data_table_size(data_table_node)
-
-        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name)
-
-        errors = get_data_file_eval(current_document, csv_filename, metadata_hash)
-        if not errors:
-            errors = check_data_table(eml_file_url, csv_file_url, data_table_name)
-
-        row_errs, column_errs, has_blanks = generate_error_info_for_webpage(data_table_node, errors)
-        collapsed_errors = collapse_error_info_for_webpage(row_errs, column_errs)
-
         save_data_file_eval(eml_node, current_document, csv_filename, metadata_hash, errors)
-        set_check_data_tables_badge_status(current_document, eml_node)
+        progress.table_checked(data_table_name)
 
     if not check_all_table_headers(current_document, eml_node):
         return
 
+    eml_file_url = get_eml_file_url(current_document, eml_node)
+    tables_to_check = []
     data_table_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE])
     for data_table_node in data_table_nodes:
         data_table_name = get_data_table_name(data_table_node)
         csv_file_name = get_data_table_filename(data_table_node)
-        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name)
+        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name, data_table_node)
         status = get_data_file_eval_status(current_document, csv_file_name, metadata_hash)
         if status == 'yellow':
-            check_a_table(current_document, eml_node, data_table_node, data_table_name)
+            tables_to_check.append((data_table_node, data_table_name, metadata_hash))
+    if not tables_to_check:
+        return
+
+    user_folder = user_data.get_user_folder_name()
+    progress = table_check_scheduler.TableCheckProgress(user_folder, current_document)
+    owner = os.path.basename(user_data.get_user_folder_name(current_user_directory_only=True))
+    if eval_queue.worker_enabled():
+        existing = table_check_scheduler.TableCheckProgress.load(user_folder, current_document)
+        if existing and not existing['done']:
+            # The worker is already checking them.
+            return
+        progress.start([data_table_name for _, data_table_name, _ in tables_to_check])
+        uploads_folder = user_data.get_document_uploads_folder_name(current_document)
+        for data_table_node, data_table_name, metadata_hash in tables_to_check:
+            csv_filename = get_data_table_filename(data_table_node)
+            job = table_check_queue.TableCheckJob(uploads_folder, csv_filename, user_folder, current_document, owner,
+                                                  data_table_name, metadata_hash, eml_file_url,
+                                                  get_csv_file_url(current_document, data_table_node),
+                                                  metapype_io.to_json(data_table_node), 0)
+            if not table_check_queue.enqueue(job):
+                progress.table_failed(data_table_name)
+            # The results will be saved by the worker, which has no session, so we flush DEX's cache now.
+            flush_dex_cache(eml_node, current_document, csv_filename)
+        return
+
+    progress.start([data_table_name for _, data_table_name, _ in tables_to_check])
+    try:
+        if table_check_scheduler.processes_per_user() < 2 or len(tables_to_check) < 2:
+            for data_table_node, data_table_name, metadata_hash in tables_to_check:
+                csv_file_url = get_csv_file_url(current_document, data_table_node)
+                errors = check_data_table(eml_file_url, csv_file_url, data_table_name,
+                                          data_table_node=data_table_node)
+                save_results(data_table_node, data_table_name, metadata_hash, errors)
+        else:
+            jobs = [(eml_file_url, get_csv_file_url(current_document, data_table_node), data_table_name,
+                     metapype_io.to_json(data_table_node))
+                    for data_table_node, data_table_name, _ in tables_to_check]
+            for i, (errors, flashed_messages) in table_check_scheduler.run_table_checks(
+                    check_data_table_in_worker, jobs, owner):
+                for category, message in flashed_messages:
+                    flash(message, category)
+                save_results(*tables_to_check[i], errors)
+    finally:
+        progress.finish()
+    set_check_data_tables_badge_status(current_document, eml_node)
+
+
+def collect_table_check_results(current_document):
+    """
+    Return True if the background worker is still checking the document's tables for Check All Data Tables. If it's
+    done, flash the messages the checks left, note any tables whose checks failed, and forget the progress.
+    """
+    progress = table_check_scheduler.TableCheckProgress.load(user_data.get_user_folder_name(), current_document)
+    if not progress:
+        return False
+    if not progress['done']:
+        return True
+    for category, message in progress['messages']:
+        flash(message, category)
+    for data_table_name in progress['failed']:
+        flash(f'Table {data_table_name} could not be checked. Please try again.', 'error')
+    table_check_scheduler.TableCheckProgress(user_data.get_user_folder_name(), current_document).finish()
+    return False
 
 
 def create_check_data_tables_status_page_content(document_name, eml_node):
@@ -1235,7 +1544,7 @@ def create_check_data_tables_status_page_content(document_name, eml_node):
     for data_table_node in data_table_nodes:
         data_table_name = get_data_table_name(data_table_node)
         csv_file_name = get_data_table_filename(data_table_node)
-        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name)
+        metadata_hash = hash_data_table_metadata_settings(eml_node, data_table_name, data_table_node)
         status = get_data_file_eval_status(document_name, csv_file_name, metadata_hash)
         if status == 'yellow':
             btn_status = ''
@@ -1364,7 +1673,7 @@ def error_as_dict(error_info):
     }
 
 
-def hash_data_table_metadata_settings(eml_node, data_table_name):
+def hash_data_table_metadata_settings(eml_node, data_table_name, data_table_node=None):
     """
     Generate a hash of data table metadata settings. This is used to determine if the metadata has changed, in which
     case memoized error results are obsolete.
@@ -1378,12 +1687,13 @@ def hash_data_table_metadata_settings(eml_node, data_table_name):
        For Categorical attributes: codes, the "enforced" flag, missing value codes
        For DateTime attributes: format string, missing value codes
        For Numerical attributes: number type, missing value codes
-    For now, though, we'll just capture the entire metadata tree under the data table node
+    Along with the table's name and its data format (delimiters, header lines, etc.). The hashes are memoized per
+     data table node (see webapp/home/utils/data_table_settings.py).
+    If the caller has the data table node, it can pass it in to save looking it up.
     """
-    data_table_node = find_data_table_node(eml_node, data_table_name)
-    _json = metapype_io.to_json(data_table_node)
-    hash = hashlib.shake_256(_json.encode()).hexdigest(5)
-    return hash
+    if data_table_node is None:
+        data_table_node = find_data_table_node(eml_node, data_table_name)
+    return data_table_settings.settings_hash(data_table_node)
 
 
 def collapse_error_info_for_webpage(row_errs, column_errs):
@@ -1480,3 +1790,6 @@ def clear_eval_files():
         filelist = glob.glob(f'{subdir}/*_eval')
         for filepath in filelist:
             os.remove(filepath)
+    for subdir in subdirs:
+        if path_exists(data_table_evals.index_pathname(subdir)):
+            os.remove(data_table_evals.index_pathname(subdir))
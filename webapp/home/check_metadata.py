@@ -5,23 +5,33 @@ This uses the contents of 'webapp/static/evaluate.csv', which has already been l
 See load_eval_entries() in webapp.home.views.py. The loaded items in current_app.config are named via
 current_app.config[f'__eval__{id}'] where id is the id of the entry in the csv file.
 
-Memoizing: When the evaluation is complete, the list of errors and warnings is pickled and saved in a file. If we're
-evaluating foo.JSON, the evaluation is saved in foo_eval.pkl. The pickle file also contains the MD5 hash of the JSON
-file, so we can tell if the metadata has changed since the last evaluation. If not, we can just load the pickle file and
-return the list of errors and warnings.
+Memoizing: When the evaluation is complete, the list of errors and warnings is saved in the evaluation store (see
+webapp/home/utils/eval_store.py), keyed by the fingerprint (MD5 hash) of the JSON file, so we can tell if the metadata
+has changed since the last evaluation. If not, we can just return the memoized list of errors and warnings. The
+fingerprint is recorded by save_eml() when it writes the JSON (see webapp/home/utils/document_meta.py), so checking the
+memo doesn't require reading the JSON file.
+
+If the metadata has changed, we don't start from scratch. The evaluation is done in sections -- the title, each data
+table, the creators, and so on -- and the store also holds each section's errors and warnings, keyed by a digest of
+the parts of the document the section's checks look at (see evaluate_sections()). Only sections we haven't seen before
+are evaluated anew. So, e.g., editing a keyword doesn't cause all of the data tables to be re-evaluated. Since the
+section keys depend only on content, the results are shared across documents, e.g., copies of a package. The HTML of
+the Check Metadata report is memoized, too, so viewing the report again for unchanged content is just a read.
+
+If Config.EVALUATION_WORKER is True, the badges don't wait for an evaluation that isn't memoized. Instead, the
+document is queued for the evaluation worker (see webapp/home/eval_worker.py), and the badges show the last known
+evaluation until the worker's result arrives. Only the Check Metadata page itself evaluates synchronously.
 
 At the end of the file find the code that handles badges.
 """
 
-from datetime import datetime
 from enum import Enum
-import hashlib
 import os
-import pickle
 import re
+import threading
 
 from urllib.parse import urlparse, urlunparse, parse_qs
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from markupsafe import escape
 
 from flask import (
@@ -29,11 +39,17 @@ from flask import (
 )
 
 from webapp.scopes import SCOPES
+import webapp.home.utils.document_meta as document_meta
+import webapp.home.utils.eval_queue as eval_queue
+import webapp.home.utils.eval_store as eval_store
+import webapp.home.utils.eval_timing as eval_timing
 import webapp.home.utils.load_and_save
+import webapp.home.utils.node_index as node_index
+from webapp.home.utils.subtree_digest import combine_digests, subtree_digest
 from webapp.home.home_utils import log_error, log_info
 from webapp.home.standard_units import deprecated_in_favor_of
 from metapype.eml import names
-import metapype.eml.validate as validate
+import metapype.eml.rule as rule
 from metapype.eml.validation_errors import ValidationError
 import metapype.eml.evaluate as evaluate
 from metapype.eml.evaluation_warnings import EvaluationWarning
@@ -106,6 +122,11 @@ class EvalEntry:
 
 severities = [EvalSeverity.ERROR, EvalSeverity.WARNING, EvalSeverity.INFO]
 
+# Bump this whenever a change to the checks could change their results, so results memoized by the old code aren't used.
+EVALUATION_RULES_VERSION = 1
+# Likewise, bump this whenever a change to format_output() or its helpers could change the HTML of the report.
+REPORT_TEMPLATE_VERSION = 1
+
 
 def annotate_link(eval_entry, id=None):
     """
@@ -433,7 +454,7 @@ def check_creators(eml_node, doc_name, validation_errs=None, evaluation_warnings
                       data_source_node_id=data_source_node.id if is_data_source else None) or len(dataset_node.children) == 0:
         add_to_evaluation(eval_code('creators_01', is_data_source), link)
     if not is_data_source:
-        creator_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.CREATOR])
+        creator_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.CREATOR])
         section = 'Creators'
         item = 'Creator'
     else:
@@ -449,7 +470,7 @@ def check_metadata_providers(eml_node, doc_name):
     """
     Check that metadata providers are valid.
     """
-    metadata_provider_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.METADATAPROVIDER])
+    metadata_provider_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.METADATAPROVIDER])
     if metadata_provider_nodes and len(metadata_provider_nodes) > 0:
         for metadata_provider_node in metadata_provider_nodes:
             check_responsible_party(metadata_provider_node, 'Metadata Providers', 'Metadata Provider',
@@ -460,7 +481,7 @@ def check_associated_parties(eml_node, doc_name):
     """
     Check that associated parties are valid.
     """
-    associated_party_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.ASSOCIATEDPARTY])
+    associated_party_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.ASSOCIATEDPARTY])
     if associated_party_nodes and len(associated_party_nodes) > 0:
         for associated_party_node in associated_party_nodes:
             check_responsible_party(associated_party_node, 'Associated Parties', 'Associated Party',
@@ -516,7 +537,7 @@ def check_intellectual_rights(eml_node, doc_name, evaluation_warnings=None):
         # We need to check this case. Metapype currently thinks it's an error if intellectualRights node has no
         #  content. It may, however, have content in children. This is a case that will be ironed out when all the
         #  dust settles regarding handling of TextType nodes.
-        intellectual_rights_node = eml_node.find_descendant(names.INTELLECTUALRIGHTS)
+        intellectual_rights_node = node_index.find_descendant(eml_node, names.INTELLECTUALRIGHTS)
         if intellectual_rights_node and intellectual_rights_node.children:
             return
         add_to_evaluation('intellectual_rights_01', link)
@@ -563,7 +584,7 @@ def check_coverage(eml_node, doc_name, evaluation_warnings=None):
     # Check taxonomic coverage nodes for empty taxon rank names or values
     if not webapp.home.utils.load_and_save.was_imported_from_xml(eml_node):
         taxonomic_classification_nodes = []
-        dataset_node.find_all_descendants(names.TAXONOMICCOVERAGE, taxonomic_classification_nodes)
+        node_index.find_all_descendants(dataset_node, names.TAXONOMICCOVERAGE, taxonomic_classification_nodes)
         for taxonomic_classification_node in taxonomic_classification_nodes:
             check_taxonomic_coverage(taxonomic_classification_node, doc_name)
 
@@ -592,7 +613,7 @@ def check_geographic_coverage(eml_node, doc_name):
     coordinates, etc.
     """
     link = url_for(PAGE_GEOGRAPHIC_COVERAGE_SELECT, filename=doc_name)
-    geographic_coverage_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.COVERAGE, names.GEOGRAPHICCOVERAGE])
+    geographic_coverage_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.COVERAGE, names.GEOGRAPHICCOVERAGE])
     for geographic_coverage_node in geographic_coverage_nodes:
         link = url_for(PAGE_GEOGRAPHIC_COVERAGE, filename=doc_name, node_id=geographic_coverage_node.id)
         validation_errs = validate_via_metapype(geographic_coverage_node)
@@ -624,50 +645,107 @@ def check_geographic_coverage(eml_node, doc_name):
             add_to_evaluation('geographic_coverage_07', link)
         check_bounding_box(geographic_coverage_node, link, validation_errs)
 
-def check_attribute(eml_node, doc_name, data_table_node:Node, attrib_node:Node, data_table_name:str):
+def get_attribute_type(attrib_node: Node):
+    """ Return the attribute type (i.e., metapype_client.VariableType) of the given attribute node. """
+    mscale_node = attrib_node.find_child(names.MEASUREMENTSCALE)
+    # Formerly, Categorical variables were nominal. But now that we're importing externally created XML
+    #  files, they may be ordinal.
+    if not mscale_node:
+        return None
+    nominal_or_ordinal_node = mscale_node.find_child(names.NOMINAL)
+    if not nominal_or_ordinal_node:
+        nominal_or_ordinal_node = mscale_node.find_child(names.ORDINAL)
+    if nominal_or_ordinal_node:
+        enumerated_domain_node = nominal_or_ordinal_node.find_single_node_by_path(
+            [names.NONNUMERICDOMAIN, names.ENUMERATEDDOMAIN])
+        if enumerated_domain_node:
+            return webapp.home.metapype_client.VariableType.CATEGORICAL
+        text_domain_node = nominal_or_ordinal_node.find_single_node_by_path(
+            [names.NONNUMERICDOMAIN, names.TEXTDOMAIN])
+        if text_domain_node:
+            return webapp.home.metapype_client.VariableType.TEXT
+
+    # Formerly, Numerical variables were ratio. But now that we're importing externally created XML
+    #  files, they may be interval.
+    ratio_or_interval_node = mscale_node.find_child(names.RATIO)
+    if not ratio_or_interval_node:
+        ratio_or_interval_node = mscale_node.find_child(names.INTERVAL)
+    if ratio_or_interval_node:
+        return webapp.home.metapype_client.VariableType.NUMERICAL
+
+    datetime_node = mscale_node.find_child(names.DATETIME)
+    if datetime_node:
+        return webapp.home.metapype_client.VariableType.DATETIME
+    return None
+
+
+@dataclass
+class AttributeRecord:
+    """ What the attribute rules look at for an attribute (i.e., a data table column). """
+    node: Node
+    type: object                            # metapype_client.VariableType, or None
+    validation_errs: list
+    standard_unit_node: Node = None         # The first standardUnit descendant
+    custom_unit_node: Node = None           # The first customUnit descendant
+    bounds_nodes: list = field(default_factory=list)
+
+
+def get_attribute_records(attribute_nodes:list, attribute_errs:dict):
     """
-    Check an attribute -- i.e., a data table column -- for missing attribute name, missing attribute label,
-    missing attribute definition, missing attribute type, etc.
+    Return an AttributeRecord for each attribute node, gathering what the attribute rules look at in one walk of each
+    attribute's subtree. attribute_errs holds the validation errors for each attribute, keyed by node id.
     """
-
-    def get_attribute_type(attrib_node: Node):
-        """ Return the attribute type (i.e., metapype_client.VariableType) of the given attribute node. """
-        mscale_node = attrib_node.find_child(names.MEASUREMENTSCALE)
-        # Formerly, Categorical variables were nominal. But now that we're importing externally created XML
-        #  files, they may be ordinal.
-        if not mscale_node:
-            return None
-        nominal_or_ordinal_node = mscale_node.find_child(names.NOMINAL)
-        if not nominal_or_ordinal_node:
-            nominal_or_ordinal_node = mscale_node.find_child(names.ORDINAL)
-        if nominal_or_ordinal_node:
-            enumerated_domain_node = nominal_or_ordinal_node.find_single_node_by_path(
-                [names.NONNUMERICDOMAIN, names.ENUMERATEDDOMAIN])
-            if enumerated_domain_node:
-                return webapp.home.metapype_client.VariableType.CATEGORICAL
-            text_domain_node = nominal_or_ordinal_node.find_single_node_by_path(
-                [names.NONNUMERICDOMAIN, names.TEXTDOMAIN])
-            if text_domain_node:
-                return webapp.home.metapype_client.VariableType.TEXT
-
-        # Formerly, Numerical variables were ratio. But now that we're importing externally created XML
-        #  files, they may be interval.
-        ratio_or_interval_node = mscale_node.find_child(names.RATIO)
-        if not ratio_or_interval_node:
-            ratio_or_interval_node = mscale_node.find_child(names.INTERVAL)
-        if ratio_or_interval_node:
-            return webapp.home.metapype_client.VariableType.NUMERICAL
-
-        datetime_node = mscale_node.find_child(names.DATETIME)
-        if datetime_node:
-            return webapp.home.metapype_client.VariableType.DATETIME
-        return None
+    records = []
+    for attribute_node in attribute_nodes:
+        record = AttributeRecord(attribute_node, get_attribute_type(attribute_node), attribute_errs[attribute_node.id])
+        # Preorder, so the first unit nodes found, and the order of the bounds nodes, are those that find_descendant()
+        #  and find_all_descendants() would give.
+        stack = list(reversed(attribute_node.children))
+        while stack:
+            node = stack.pop()
+            if node.name == names.STANDARDUNIT:
+                if record.standard_unit_node is None:
+                    record.standard_unit_node = node
+            elif node.name == names.CUSTOMUNIT:
+                if record.custom_unit_node is None:
+                    record.custom_unit_node = node
+            elif node.name == names.BOUNDS:
+                record.bounds_nodes.append(node)
+            stack.extend(reversed(node.children))
+        records.append(record)
+    return records
+
+
+def check_attributes(eml_node, doc_name, data_table_node:Node, attribute_nodes:list, data_table_name:str,
+                     attribute_errs:dict):
+    """
+    Check the attributes -- i.e., the data table columns -- for missing attribute name, missing attribute label,
+    missing attribute definition, missing attribute type, etc. attribute_errs holds the validation errors for each
+    attribute, keyed by node id (see validate_data_table()).
+
+    Tables can have thousands of columns, so the attributes are gathered into AttributeRecords in one pass and the
+    rules are applied to the records. What the rules need for every attribute -- the standard units, the document's
+    custom units, the table's entity name -- is looked up once per table, and an attribute's link is generated only
+    if the attribute has errors or warnings.
+    """
+    import webapp.views.data_tables.table_spreadsheets as table_spreadsheets # imported here to avoid circular import
+
+    CATEGORICAL = webapp.home.metapype_client.VariableType.CATEGORICAL
+    NUMERICAL = webapp.home.metapype_client.VariableType.NUMERICAL
+    TEXT = webapp.home.metapype_client.VariableType.TEXT
+    DATETIME = webapp.home.metapype_client.VariableType.DATETIME
+    pages = {
+        CATEGORICAL: PAGE_ATTRIBUTE_CATEGORICAL,
+        NUMERICAL: PAGE_ATTRIBUTE_NUMERICAL,
+        TEXT: PAGE_ATTRIBUTE_TEXT,
+        DATETIME: PAGE_ATTRIBUTE_DATETIME
+    }
 
     def generate_code_definition_errs(eml_node, doc_name, err_code, errs_found):
         """ Generate errors for code definition errors. This requires walking up the tree to get the
             various node ids needed for the code definition page that will be linked to from the
             evaluation page. I.e., the issue here is generating the link to the code definition page."""
-        mscale = webapp.home.metapype_client.VariableType.CATEGORICAL
+        mscale = CATEGORICAL
         for err in errs_found:
             err_node = err[2]
             code_definition_node = err_node.parent
@@ -680,50 +758,33 @@ def check_attribute(eml_node, doc_name, data_table_node:Node, attrib_node:Node,
             attribute_node = mscale_node.parent
             attribute_list_node = attribute_node.parent
             data_table_node = attribute_list_node.parent
-            # data_table_name = data_table_node.find_child(names.ENTITYNAME).content
-
-            # code = code_definition_node.find_child(names.CODE).content
 
             link = url_for(PAGE_CODE_DEFINITION, filename=doc_name, dt_node_id=data_table_node.id,
                            att_node_id=attribute_node.id,
                            nom_ord_node_id=nominal_node.id, node_id=code_definition_node.id, mscale=mscale)
             add_to_evaluation(err_code, link, data_table_name=get_data_table_name(data_table_node))
 
-    def bad_standard_unit(attr_node):
-        import webapp.views.data_tables.table_spreadsheets as table_spreadsheets # imported here to avoid circular import
-        """ Return True if the attribute node has a standard unit that is not in the standard unit list. """
-        standard_unit_node = attr_node.find_descendant(names.STANDARDUNIT)
-        if not standard_unit_node:
-            return None, None
-        standard_unit = standard_unit_node.content
-        if standard_unit not in table_spreadsheets.standard_units:
-            return standard_unit, deprecated_in_favor_of(standard_unit)
-        return None, None
-
-    def check_custom_units(attr_node):
-        """ Check for custom units that differ only by case and/or whitespace. """
-        def get_all_custom_units():
-            custom_unit_nodes = eml_node.find_all_nodes_by_path([names.ADDITIONALMETADATA,
-                                                            names.METADATA,
-                                                            names.UNITLIST,
-                                                            names.UNIT])
-            custom_units = []
+    custom_units_by_normalized_name = None
+
+    def duplicate_custom_unit(custom_unit):
+        """ Return a custom unit that differs from the given one only by case and/or whitespace, or None. """
+        nonlocal custom_units_by_normalized_name
+        if custom_units_by_normalized_name is None:
+            custom_units_by_normalized_name = {}
+            custom_unit_nodes = node_index.find_all_nodes_by_path(eml_node, [names.ADDITIONALMETADATA,
+                                                                             names.METADATA,
+                                                                             names.UNITLIST,
+                                                                             names.UNIT])
             for custom_unit_node in custom_unit_nodes:
-                custom_units.append(custom_unit_node.attribute_value('id'))
-            return custom_units
-
-        def check_for_duplicates(custom_unit):
-            normalized_custom_unit = ''.join(custom_unit.split()).lower()
-            all_custom_units = get_all_custom_units()
-            for unit in all_custom_units:
-                if unit != custom_unit and normalized_custom_unit == ''.join(unit.split()).lower():
-                    return unit
-            return None
-
-        custom_unit_node = attr_node.find_descendant(names.CUSTOMUNIT)
-        if not custom_unit_node:
-            return None
-        return check_for_duplicates(custom_unit_node.content)
+                unit = custom_unit_node.attribute_value('id')
+                if unit is None:
+                    continue
+                custom_units_by_normalized_name.setdefault(''.join(unit.split()).lower(), []).append(unit)
+        normalized_custom_unit = ''.join(custom_unit.split()).lower()
+        for unit in custom_units_by_normalized_name.get(normalized_custom_unit, []):
+            if unit != custom_unit:
+                return unit
+        return None
 
     def is_strict_float(s: str):
         s = s.strip()
@@ -735,112 +796,96 @@ def check_attribute(eml_node, doc_name, data_table_node:Node, attrib_node:Node,
         except ValueError:
             return False
 
-    attr_type = get_attribute_type(attrib_node)
-    mscale = None
-    page = None
-    if attr_type == webapp.home.metapype_client.VariableType.CATEGORICAL:
-        page = PAGE_ATTRIBUTE_CATEGORICAL
-        mscale = webapp.home.metapype_client.VariableType.CATEGORICAL.name
-        data_table_name = None
-        if data_table_node:
-            entity_name_node = data_table_node.find_child(names.ENTITYNAME)
-            if entity_name_node:
-                data_table_name = entity_name_node.content
-        attrib_name = None
-        if attrib_node:
-            attrib_name_node = attrib_node.find_child(names.ATTRIBUTENAME)
-            if attrib_name_node:
-                attrib_name = attrib_name_node.content
-        # log_info(f"CATEGORICAL... filename={filename}  data_table={data_table_name}  attr_name={attrib_name}  attr_type={attr_type}")
-    elif attr_type == webapp.home.metapype_client.VariableType.NUMERICAL:
-        page = PAGE_ATTRIBUTE_NUMERICAL
-        mscale = webapp.home.metapype_client.VariableType.NUMERICAL.name
-    elif attr_type == webapp.home.metapype_client.VariableType.TEXT:
-        page = PAGE_ATTRIBUTE_TEXT
-        mscale = webapp.home.metapype_client.VariableType.TEXT.name
-    elif attr_type == webapp.home.metapype_client.VariableType.DATETIME:
-        page = PAGE_ATTRIBUTE_DATETIME
-        mscale = webapp.home.metapype_client.VariableType.DATETIME.name
-    # This section is temporary code to track down a bug
-    if not page:
-        data_table_name = None
-        if data_table_node:
-            entity_name_node = data_table_node.find_child(names.ENTITYNAME)
-            if entity_name_node:
-                data_table_name = entity_name_node.content
-        attrib_name = None
-        if attrib_node:
+    standard_units = set(table_spreadsheets.standard_units)
+    entity_name = None
+    entity_name_node = data_table_node.find_child(names.ENTITYNAME)
+    if entity_name_node:
+        entity_name = entity_name_node.content
+
+    for record in get_attribute_records(attribute_nodes, attribute_errs):
+        attrib_node = record.node
+        attr_type = record.type
+        page = pages.get(attr_type)
+        mscale = attr_type.name if page else None
+        # Categorical variables are reported under the entity name as is, even if it's missing.
+        attribute_data_table_name = entity_name if attr_type == CATEGORICAL else data_table_name
+        # This section is temporary code to track down a bug
+        if not page:
+            attrib_name = None
             attrib_name_node = attrib_node.find_child(names.ATTRIBUTENAME)
             if attrib_name_node:
                 attrib_name = attrib_name_node.content
-        log_error(f"page not initialized... filename={doc_name}  data_table={data_table_name}  attr_name={attrib_name}  attr_type={attr_type}")
-        link = url_for(PAGE_ATTRIBUTE_SELECT, filename=doc_name, dt_node_id=data_table_node.id, node_id=attrib_node.id, mscale=mscale)
-        add_to_evaluation('attributes_12', link, data_table_name=data_table_name)
-        return
+            log_error(f"page not initialized... filename={doc_name}  data_table={entity_name}  attr_name={attrib_name}  attr_type={attr_type}")
+            link = url_for(PAGE_ATTRIBUTE_SELECT, filename=doc_name, dt_node_id=data_table_node.id, node_id=attrib_node.id, mscale=mscale)
+            add_to_evaluation('attributes_12', link, data_table_name=entity_name)
+            continue
 
-    link = url_for(page, filename=doc_name, dt_node_id=data_table_node.id, node_id=attrib_node.id, mscale=mscale)
-
-    validation_errs = validate_via_metapype(attrib_node)
-    if find_content_empty(validation_errs, names.ATTRIBUTEDEFINITION) or \
-        find_min_unmet(validation_errs, names.ATTRIBUTE, names.ATTRIBUTEDEFINITION):
-        add_to_evaluation('attributes_01', link, data_table_name=data_table_name)
-    if find_min_unmet(validation_errs, names.MISSINGVALUECODE, names.CODEEXPLANATION):
-        add_to_evaluation('attributes_07', link, data_table_name=data_table_name)
-
-    # Categorical
-    if attr_type == webapp.home.metapype_client.VariableType.CATEGORICAL:
-        if find_min_unmet_for_choice(validation_errs, names.ENUMERATEDDOMAIN):
-            add_to_evaluation('attributes_04', link, data_table_name=data_table_name)
-        found = find_content_empty(validation_errs, names.CODE)
-        if found:
-            generate_code_definition_errs(eml_node, doc_name, 'attributes_05', found)
-        found = find_content_empty(validation_errs, names.DEFINITION)
-        if found:
-            generate_code_definition_errs(eml_node, doc_name, 'attributes_06', found)
-
-    # Numerical
-    if attr_type == webapp.home.metapype_client.VariableType.NUMERICAL:
-        # attribute_name = attrib_node.find_child(names.ATTRIBUTENAME).content
-
-        if find_min_unmet(validation_errs, names.RATIO, names.UNIT):
-            add_to_evaluation('attributes_02', link, data_table_name=data_table_name)
-        if find_min_unmet_for_choice(validation_errs, names.UNIT):
-            add_to_evaluation('attributes_02', link, data_table_name=data_table_name)
-        if find_err_code(validation_errs, ValidationError.CONTENT_EXPECTED_FLOAT, names.PRECISION):
-            add_to_evaluation('attributes_09', link, data_table_name=data_table_name)
-        bad_standard_unit, deprecated_use_instead = bad_standard_unit(attrib_node)
-        if bad_standard_unit:
-            if not deprecated_use_instead:
-                add_to_evaluation('attributes_10', link, data_table_name=data_table_name, replace_value=bad_standard_unit)
-            else:
-                add_to_evaluation('attributes_11', link, data_table_name=data_table_name, replace_value=bad_standard_unit, replace_with=deprecated_use_instead)
-        duplicate_custom_unit = check_custom_units(attrib_node)
-        if duplicate_custom_unit:
-            add_to_evaluation('attributes_13', link, data_table_name=data_table_name)
-
-        # The EML schema has two different uses of "bounds". When the bounds are for a numeric variable, the
-        #  values of maxiumum and minimum must be floats. When the bounds are for a categorical variable,
-        #  they are simply strings. Metapype cannot handle this ambiguous use of bounds, so we check it
-        #  here "by hand".
-        bounds_nodes = []
-        attrib_node.find_all_descendants(names.BOUNDS, bounds_nodes)
-        if bounds_nodes:
-            for bounds_node in bounds_nodes:
+        link = None
+
+        def add_attribute_entry(id, **kwargs):
+            nonlocal link
+            if link is None:
+                link = url_for(page, filename=doc_name, dt_node_id=data_table_node.id, node_id=attrib_node.id, mscale=mscale)
+            add_to_evaluation(id, link, data_table_name=attribute_data_table_name, **kwargs)
+
+        validation_errs = record.validation_errs
+        if find_content_empty(validation_errs, names.ATTRIBUTEDEFINITION) or \
+            find_min_unmet(validation_errs, names.ATTRIBUTE, names.ATTRIBUTEDEFINITION):
+            add_attribute_entry('attributes_01')
+        if find_min_unmet(validation_errs, names.MISSINGVALUECODE, names.CODEEXPLANATION):
+            add_attribute_entry('attributes_07')
+
+        # Categorical
+        if attr_type == CATEGORICAL:
+            if find_min_unmet_for_choice(validation_errs, names.ENUMERATEDDOMAIN):
+                add_attribute_entry('attributes_04')
+            found = find_content_empty(validation_errs, names.CODE)
+            if found:
+                generate_code_definition_errs(eml_node, doc_name, 'attributes_05', found)
+            found = find_content_empty(validation_errs, names.DEFINITION)
+            if found:
+                generate_code_definition_errs(eml_node, doc_name, 'attributes_06', found)
+
+        # Numerical
+        if attr_type == NUMERICAL:
+            if find_min_unmet(validation_errs, names.RATIO, names.UNIT):
+                add_attribute_entry('attributes_02')
+            if find_min_unmet_for_choice(validation_errs, names.UNIT):
+                add_attribute_entry('attributes_02')
+            if find_err_code(validation_errs, ValidationError.CONTENT_EXPECTED_FLOAT, names.PRECISION):
+                add_attribute_entry('attributes_09')
+            if record.standard_unit_node:
+                standard_unit = record.standard_unit_node.content
+                if standard_unit and standard_unit not in standard_units:
+                    deprecated_use_instead = deprecated_in_favor_of(standard_unit)
+                    if not deprecated_use_instead:
+                        add_attribute_entry('attributes_10', replace_value=standard_unit)
+                    else:
+                        add_attribute_entry('attributes_11', replace_value=standard_unit,
+                                            replace_with=deprecated_use_instead)
+            if record.custom_unit_node and duplicate_custom_unit(record.custom_unit_node.content):
+                add_attribute_entry('attributes_13')
+
+            # The EML schema has two different uses of "bounds". When the bounds are for a numeric variable, the
+            #  values of maxiumum and minimum must be floats. When the bounds are for a categorical variable,
+            #  they are simply strings. Metapype cannot handle this ambiguous use of bounds, so we check it
+            #  here "by hand".
+            for bounds_node in record.bounds_nodes:
                 minimum_node = bounds_node.find_child(names.MINIMUM)
                 maximum_node = bounds_node.find_child(names.MAXIMUM)
                 if minimum_node and not is_strict_float(minimum_node.content):
-                    add_to_evaluation('attributes_14', link, data_table_name=data_table_name)
+                    add_attribute_entry('attributes_14')
                 if maximum_node and not is_strict_float(maximum_node.content):
-                    add_to_evaluation('attributes_15', link, data_table_name=data_table_name)
+                    add_attribute_entry('attributes_15')
 
-    # DateTime
-    if attr_type == webapp.home.metapype_client.VariableType.DATETIME:
-        if find_min_unmet(validation_errs, names.DATETIME, names.FORMATSTRING):
-            add_to_evaluation('attributes_03', link, data_table_name=data_table_name)
-        elif find_content_empty(validation_errs, names.FORMATSTRING):
-            add_to_evaluation('attributes_03', link, data_table_name=data_table_name)
-        elif check_date_time_attribute(attrib_node):
-            add_to_evaluation('attributes_08', link, data_table_name=data_table_name)
+        # DateTime
+        if attr_type == DATETIME:
+            if find_min_unmet(validation_errs, names.DATETIME, names.FORMATSTRING):
+                add_attribute_entry('attributes_03')
+            elif find_content_empty(validation_errs, names.FORMATSTRING):
+                add_attribute_entry('attributes_03')
+            elif check_date_time_attribute(attrib_node):
+                add_attribute_entry('attributes_08')
 
 
 def get_data_table_name(data_table_node:Node):
@@ -852,16 +897,24 @@ def get_data_table_name(data_table_node:Node):
         return ''
 
 
+def document_uploads_folder():
+    """
+    Return the uploads folder of the document being evaluated. The evaluation worker has no user session from which to
+    get it, so it passes it in g.uploads_folder.
+    """
+    return g.get('uploads_folder') or user_data.get_document_uploads_folder_name()
+
+
 def check_data_table(eml_node, doc_name, data_table_node:Node):
     """ Check a data table for completeness, including checking all of its columns (attributes). """
 
     def check_data_table_file_existence(data_table_node, link, data_table_name=None):
         """ Check for the existence of the data_table file. Not currently checking its MD5 checksum. """
-        object_name_node = data_table_node.find_descendant(names.OBJECTNAME)
+        object_name_node = node_index.find_descendant(data_table_node, names.OBJECTNAME)
         if not object_name_node:
             return
         data_file = object_name_node.content
-        uploads_folder = user_data.get_document_uploads_folder_name()
+        uploads_folder = document_uploads_folder()
         full_path = f'{uploads_folder}/{data_file}'
         if not os.path.exists(full_path):
             # We'll just check for the data_table file's existence. Don't need to recompute the MD5 over and over
@@ -876,7 +929,9 @@ def check_data_table(eml_node, doc_name, data_table_node:Node):
                 return
 
     link = url_for(PAGE_DATA_TABLE, filename=doc_name, dt_node_id=data_table_node.id)
-    validation_errs = validate_via_metapype(data_table_node)
+    attribute_list_node = data_table_node.find_child(names.ATTRIBUTELIST)
+    attribute_nodes = attribute_list_node.find_all_children(names.ATTRIBUTE) if attribute_list_node else []
+    validation_errs, attribute_errs = validate_data_table(data_table_node, attribute_nodes)
     data_table_name = get_data_table_name(data_table_node)
 
     check_data_table_file_existence(data_table_node, link, data_table_name=data_table_name)
@@ -902,11 +957,7 @@ def check_data_table(eml_node, doc_name, data_table_node:Node):
     if find_err_code(evaluation_warnings, EvaluationWarning.DATATABLE_NUMBER_OF_RECORDS_MISSING, names.DATATABLE):
         add_to_evaluation('data_table_11', link, data_table_name=data_table_name)
 
-    attribute_list_node = data_table_node.find_child(names.ATTRIBUTELIST)
-    if attribute_list_node:
-        attribute_nodes = attribute_list_node.find_all_children(names.ATTRIBUTE)
-        for attribute_node in attribute_nodes:
-            check_attribute(eml_node, doc_name, data_table_node, attribute_node, data_table_name=data_table_name)
+    check_attributes(eml_node, doc_name, data_table_node, attribute_nodes, data_table_name, attribute_errs)
 
 
 def check_data_tables(eml_node, doc_name, evaluation_warnings=None):
@@ -915,7 +966,7 @@ def check_data_tables(eml_node, doc_name, evaluation_warnings=None):
     if evaluation_warnings is None:
         evaluation_warnings = evaluate_via_metapype(dataset_node)
 
-    data_table_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE])
+    data_table_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.DATATABLE])
     for data_table_node in data_table_nodes:
         check_data_table(eml_node, doc_name, data_table_node)
 
@@ -955,7 +1006,7 @@ def check_contacts(eml_node, doc_name, validation_errs=None, evaluation_warnings
                       data_source_node_id=data_source_node.id if is_data_source else None) or len(dataset_node.children) == 0:
         add_to_evaluation(eval_code('contacts_01', is_data_source), link=link)
     if not is_data_source:
-        contact_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.CONTACT])
+        contact_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.CONTACT])
         section = 'Contacts'
         item = 'Contact'
     else:
@@ -973,7 +1024,7 @@ def check_publisher(eml_node, doc_name):
     Check that publisher is valid.
     """
     # link = url_for(PAGE_PUBLISHER, filename=doc_name)
-    publisher_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.PUBLISHER])
+    publisher_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.PUBLISHER])
     if publisher_nodes and len(publisher_nodes) > 0:
         for publisher_node in publisher_nodes:
             check_responsible_party(publisher_node, 'Publisher', 'Publisher',
@@ -1033,7 +1084,7 @@ def check_data_source(doc_name, data_source_node):
                    validation_errs=validation_errs,
                    evaluation_warnings=evaluation_warnings,
                    is_data_source=True)
-    distribution_node = data_source_node.find_descendant(names.DISTRIBUTION)
+    distribution_node = node_index.find_descendant(data_source_node, names.DISTRIBUTION)
     if distribution_node:
         check_distribution_element(distribution_node, doc_name)
 
@@ -1070,7 +1121,7 @@ def check_method_steps(eml_node, doc_name, validation_errs=None, evaluation_warn
         if find_min_unmet(validation_errs, names.METHODS, names.METHODSTEP):
             add_to_evaluation('methods_03', link)
 
-    method_step_nodes = eml_node.find_all_nodes_by_path([
+    method_step_nodes = node_index.find_all_nodes_by_path(eml_node, [
         names.DATASET,
         names.METHODS,
         names.METHODSTEP
@@ -1150,29 +1201,29 @@ def check_project(eml_node, doc_name, evaluation_warnings=None):
             add_to_evaluation('project_03', link)
 
 
-def check_other_entities(eml_node, doc_name):
-    """ Check all other entity nodes for completeness and correctness. """
+def check_other_entity(entity_node, doc_name):
+    """ Check an other entity node for completeness and correctness. """
 
-    def check_other_entity(entity_node, doc_name):
-        """ Check an other entity node for completeness and correctness. """
+    link = url_for(PAGE_OTHER_ENTITY, filename=doc_name, node_id=entity_node.id)
 
-        link = url_for(PAGE_OTHER_ENTITY, filename=doc_name, node_id=entity_node.id)
+    validation_errors = validate_via_metapype(entity_node)
+    if find_min_unmet(validation_errors, names.OTHERENTITY, names.ENTITYNAME):
+        add_to_evaluation('other_entity_01', link)
+    if find_min_unmet(validation_errors, names.OTHERENTITY, names.ENTITYTYPE):
+        add_to_evaluation('other_entity_02', link)
+    if find_min_unmet(validation_errors, names.PHYSICAL, names.OBJECTNAME):
+        add_to_evaluation('other_entity_04', link)
+    if find_min_unmet(validation_errors, names.PHYSICAL, names.DATAFORMAT):
+        add_to_evaluation('other_entity_05', link)
 
-        validation_errors = validate_via_metapype(entity_node)
-        if find_min_unmet(validation_errors, names.OTHERENTITY, names.ENTITYNAME):
-            add_to_evaluation('other_entity_01', link)
-        if find_min_unmet(validation_errors, names.OTHERENTITY, names.ENTITYTYPE):
-            add_to_evaluation('other_entity_02', link)
-        if find_min_unmet(validation_errors, names.PHYSICAL, names.OBJECTNAME):
-            add_to_evaluation('other_entity_04', link)
-        if find_min_unmet(validation_errors, names.PHYSICAL, names.DATAFORMAT):
-            add_to_evaluation('other_entity_05', link)
+    evaluation_warnings = evaluate_via_metapype(entity_node)
+    if find_err_code(evaluation_warnings, EvaluationWarning.OTHER_ENTITY_DESCRIPTION_MISSING, names.OTHERENTITY):
+        add_to_evaluation('other_entity_03', link)
 
-        evaluation_warnings = evaluate_via_metapype(entity_node)
-        if find_err_code(evaluation_warnings, EvaluationWarning.OTHER_ENTITY_DESCRIPTION_MISSING, names.OTHERENTITY):
-            add_to_evaluation('other_entity_03', link)
 
-    other_entity_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.OTHERENTITY])
+def check_other_entities(eml_node, doc_name):
+    """ Check all other entity nodes for completeness and correctness. """
+    other_entity_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.OTHERENTITY])
     for other_entity_node in other_entity_nodes:
         check_other_entity(other_entity_node, doc_name)
 
@@ -1239,13 +1290,46 @@ def format_tooltip(node, section=None):
     return tooltip
 
 
+# The sections of the Check Metadata report, in order, and their anchors
+REPORT_SECTIONS = {
+    'Title': 'title',
+    'Data Tables': 'data_tables',
+    'Creators': 'creators',
+    'Contacts': 'contacts',
+    'Associated Parties': 'associated_parties',
+    'Metadata Providers': 'metadata_providers',
+    'Abstract': 'abstract',
+    'Keywords': 'keywords',
+    'Intellectual Rights': 'intellectual_rights',
+    'Coverage': 'coverage',
+    'Geographic Coverage': 'geographic_coverage',
+    'Temporal Coverage': 'temporal_coverage',
+    'Taxonomic Coverage': 'taxonomic_coverage',
+    'Maintenance': 'maintenance',
+    'Publisher': 'publisher',
+    'Methods': 'methods',
+    'Data Sources': 'data_sources',
+    'Project': 'project',
+    'Other Entities': 'other_entities',
+    'Data Package ID': 'data_package_id'}
+
+
+def report_highlight():
+    """
+    Return the anchor of the section of the Check Metadata report to highlight, given by the query string when we're
+    following a link to a specific section, or None.
+    """
+    offset = request.query_string.decode('utf-8')
+    return offset if offset in REPORT_SECTIONS.values() else None
+
+
 def format_output(evaluation, parse_errs, unicode_errs, eml_node):
     """ Format the evaluation output for display. """
 
     def get_data_table_names(eml_node):
         """ Get the names of all data tables in the EML document. """
         data_table_names = []
-        data_table_name_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE, names.ENTITYNAME])
+        data_table_name_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.DATATABLE, names.ENTITYNAME])
         for data_table_name_node in data_table_name_nodes:
             data_table_names.append(data_table_name_node.content)
         return data_table_names
@@ -1291,27 +1375,6 @@ def format_output(evaluation, parse_errs, unicode_errs, eml_node):
         else:
             return [entry for entry in evaluation if entry.section == section]
 
-    sections = {
-        'Title': 'title',
-        'Data Tables': 'data_tables',
-        'Creators': 'creators',
-        'Contacts': 'contacts',
-        'Associated Parties': 'associated_parties',
-        'Metadata Providers': 'metadata_providers',
-        'Abstract': 'abstract',
-        'Keywords': 'keywords',
-        'Intellectual Rights': 'intellectual_rights',
-        'Coverage': 'coverage',
-        'Geographic Coverage': 'geographic_coverage',
-        'Temporal Coverage': 'temporal_coverage',
-        'Taxonomic Coverage': 'taxonomic_coverage',
-        'Maintenance': 'maintenance',
-        'Publisher': 'publisher',
-        'Methods': 'methods',
-        'Data Sources': 'data_sources',
-        'Project': 'project',
-        'Other Entities': 'other_entities',
-        'Data Package ID': 'data_package_id'}
 
     def get_query_string():
         return request.query_string.decode('utf-8')
@@ -1321,10 +1384,10 @@ def format_output(evaluation, parse_errs, unicode_errs, eml_node):
     offset = get_query_string()
     output = '<span style="font-family: Helvetica,Arial,sans-serif;">'
     """ Format the sections, with headings, in order. """
-    for section in sections:
+    for section in REPORT_SECTIONS:
         if section == 'Data Sources':
             continue
-        anchor = sections[section]
+        anchor = REPORT_SECTIONS[section]
         if offset == anchor:
             section_output = f'<mark style="background-color:#ffffa0;">{section}</mark>'
         else:
@@ -1355,71 +1418,327 @@ def format_output(evaluation, parse_errs, unicode_errs, eml_node):
     return output
 
 
-def check_evaluation_memo(json_filename, eml_node):
+def document_memo_key(json_filename, md5):
     """
-    We memoize validation results in a pickle file and only recompute them when the json file's content has changed,
-    as indicated by a change in the MD5 hash. Check to see if memoizing is needed. If not, return the memoized results.
-    The caller will know if memoizing is needed if the memoized results are None.
+    Return the key under which the evaluation of the document is memoized. The evaluation's links name the document,
+    and its data table errors depend on the user's uploaded files, so this key is specific to the user's document.
+    The results for the document's sections are keyed by content alone, so they're shared more widely.
     """
-    base, _ = os.path.splitext(json_filename)
-    eval_filename = f"{base}_eval.pkl"
-    try:
-        # start = datetime.now()
-        # Get the memoized results
-        old_md5, validation_errs, evaluation_warnings, evaluation, parse_errs, unicode_errs = pickle.load(open(eval_filename, 'rb'))
-        # Compute the current MD5 hash to see if it has changed
-        with open(json_filename, 'rt') as json_file:
-            json = json_file.read()
-        new_md5 = hashlib.md5(json.encode('utf-8')).hexdigest()
-        # end = datetime.now()
-        # elapsed = (end - start).total_seconds()
-        # print('**** check_evaluation_memo', elapsed)
-        if new_md5 == old_md5:
-            # print(f'**** new_md5={new_md5}')
-            return old_md5, validation_errs, evaluation_warnings, evaluation, parse_errs, unicode_errs
-        else:
-            # print(f'**** new_md5={new_md5}, old_md5={old_md5}')
-            return new_md5, None, None, None, None, None
-    except ValueError:
-        # Memo files used to contain fewer objects. I.e., this memo file must be obsolete. Delete it.
-        try:
-            os.remove(eval_filename)
-        except Exception:
-            pass
-    except Exception:
-        pass
+    return combine_digests('document', EVALUATION_RULES_VERSION, os.path.abspath(json_filename), md5)
+
+
+def report_memo_key(json_filename, md5, highlight):
+    """
+    Return the key under which the HTML of the Check Metadata report for the document is memoized. The report
+    highlights the section whose anchor is highlight, if any, so there's one for each.
+    """
+    return combine_digests('report', EVALUATION_RULES_VERSION, REPORT_TEMPLATE_VERSION, os.path.abspath(json_filename),
+                           md5, highlight)
 
-    return None, None, None, None, None, None
 
+def parse_memo_key(md5):
+    """ Return the key under which the results of parsing the XML for the document with the given MD5 are memoized. """
+    return combine_digests('parse', EVALUATION_RULES_VERSION, md5)
 
-def memoize_evaluation(json_filename, eml_node, md5, validation_errs, evaluation_warnings, evaluation, parse_errs, unicode_errs):
-    """ Memoize the evaluation results in a pickle file, together with the MD5 hash. """
-    base, _ = os.path.splitext(json_filename)
-    eval_filename = f"{base}_eval.pkl"
-    try:
+
+def badge_memo_key(json_filename, md5):
+    """ Return the key under which the BadgeSummary of the document's evaluation is memoized. """
+    return combine_digests('badges', EVALUATION_RULES_VERSION, os.path.abspath(json_filename), md5)
+
+
+def latest_memo_key(json_filename):
+    """ Return the key under which the BadgeSummary of the document's most recent evaluation is kept, whatever its MD5. """
+    return combine_digests('latest', EVALUATION_RULES_VERSION, os.path.abspath(json_filename))
+
+
+def check_evaluation_memo(json_filename, eml_node, md5=None):
+    """
+    We memoize evaluation results in the evaluation store and only recompute them when the json file's content has
+    changed, as indicated by a change in the MD5 hash. Check to see if memoizing is needed. If not, return the memoized
+    results. The caller will know if memoizing is needed if the memoized results are None.
+    """
+    # Get the current MD5 hash, unless the caller already has it. Normally, this comes from the document's metadata
+    #  record.
+    if md5 is None:
+        md5 = document_meta.get_fingerprint(json_filename)
+    if md5 is None:
+        return None, None, None, None
+    memo = eval_store.get(document_memo_key(json_filename, md5))
+    if memo is None:
+        return md5, None, None, None
+    evaluation, parse_errs, unicode_errs = memo
+    return md5, evaluation, parse_errs, unicode_errs
+
+
+def memoize_evaluation(json_filename, eml_node, md5, evaluation, section_results, parse_errs, unicode_errs):
+    """
+    Memoize the evaluation results in the evaluation store, keyed by the MD5 hash, together with the results for the
+    sections that were evaluated anew, the results of parsing the XML, and the BadgeSummary. Returns the BadgeSummary.
+    """
+    summary = summarize_for_badges(evaluation, parse_errs, eml_node)
+    if md5 is None:
+        md5 = document_meta.get_fingerprint(json_filename)
         if md5 is None:
-            with open(json_filename, 'rt') as json_file:
-                json = json_file.read()
-            md5 = hashlib.md5(json.encode('utf-8')).hexdigest()
-        with open(eval_filename, 'wb') as f:
-            pickle.dump((md5, validation_errs, evaluation_warnings, evaluation, parse_errs, unicode_errs), f)
-    except Exception:
-        if os.path.exists(eval_filename):
-            os.remove(eval_filename)
+            return summary
+    items = dict(section_results)
+    items[parse_memo_key(md5)] = (parse_errs, unicode_errs)
+    items[document_memo_key(json_filename, md5)] = (evaluation, parse_errs, unicode_errs)
+    items[badge_memo_key(json_filename, md5)] = summary
+    items[latest_memo_key(json_filename)] = (md5, summary)
+    eval_store.put_many(items)
+    return summary
+
+
+def memoized_badge_summary(json_filename, md5):
+    """ Return the memoized BadgeSummary for the document's content with the given MD5, or None. """
+    if md5 is None:
+        return None
+    return eval_store.get(badge_memo_key(json_filename, md5))
 
 
-def perform_evaluation(eml_node, doc_name):
+def last_known_badge_summary(json_filename):
+    """
+    Return the BadgeSummary of the most recent evaluation of the document that we have, for any version of its
+    content, or None if the document has never been evaluated.
+    """
+    memo = eval_store.get(latest_memo_key(json_filename))
+    if memo is None:
+        return None
+    _, summary = memo
+    return summary
+
+
+class ModelScan:
     """
-    Perform the evaluation of the EML document. If the evaluation has already been performed and memoized, return the
-    memoized results. Otherwise, perform the evaluation, memoize the results, and return them.
+    What evaluate_sections() needs to know about the model: the digest of each child of the dataset node, and the nodes
+    whose validation and evaluation results are shared by more than one section. The nodes are found via the node
+    index, so the only walk of the model is the one that computes the digests.
     """
-    def display_elapsed(start, msg):
-        # Uncomment below to display elapsed times for troubleshooting
-        # end = datetime.now()
-        # elapsed = (end - start).total_seconds()
-        # print(f"**** {msg} {elapsed}")
-        pass
+    def __init__(self, eml_node:Node, index:node_index.NodeIndex):
+        self.child_digests = {}             # Digest of each child of the dataset node, keyed by node id
+        self.taxonomy_holders = set()       # Ids of the dataset's children that contain taxonomic coverage
+        dataset_node = eml_node.find_child(names.DATASET)
+        if dataset_node:
+            for child in dataset_node.children:
+                self.child_digests[child.id] = subtree_digest(child)
+            for taxonomic_coverage_node in index.find_all(names.TAXONOMICCOVERAGE, dataset_node):
+                ancestor = taxonomic_coverage_node
+                while ancestor.parent is not dataset_node:
+                    ancestor = ancestor.parent
+                self.taxonomy_holders.add(ancestor.id)
+
+        # All methods nodes that validate.tree() would validate. It doesn't descend into the children of metadata nodes.
+        self.methods_nodes = [node for node in index.find_all(names.METHODS)
+                              if names.METADATA not in index.lineage(node)[:-1]]
+        # All description nodes whose parent is a maintenance node
+        self.maintenance_descriptions = [node for node in index.find_all(names.DESCRIPTION)
+                                         if node.parent is not None and node.parent.name == names.MAINTENANCE]
+        self.imported_from_xml = index.find_first('importedFromXML') is not None
+
+
+def shared_findings(eml_node:Node, dataset_node:Node, scan:ModelScan):
+    """
+    Return the validation errors and evaluation warnings that the dataset-level checks look for, i.e., those that
+    perform_evaluation() used to get by validating and evaluating the whole document. Since the checks look only for
+    errors on particular nodes -- e.g., a dataset missing its creators, or a maintenance node missing its description
+    -- we validate and evaluate just those nodes. The rest of the document is validated section by section.
+    """
+    validation_errs = []
+    evaluation_warnings = []
+    try:
+        for node in [eml_node, dataset_node, *scan.methods_nodes]:
+            if node is not None:
+                validate_node(node, validation_errs)
+        title_nodes = dataset_node.find_all_children(names.TITLE) if dataset_node else []
+        for node in [dataset_node, *title_nodes, *scan.maintenance_descriptions]:
+            if node is not None:
+                evaluation_warnings.extend(evaluate.node(node) or [])
+    except Exception as e:
+        log_error(f'shared_findings: exception={e}')
+    return validation_errs, evaluation_warnings
+
+
+def findings_signature(findings):
+    """ Return a digest of validation errors or evaluation warnings, capturing what the find_* functions look at. """
+    return combine_digests(*[(str(code), node.name, node.id, node.parent.id if node.parent else None, repr(args))
+                             for code, _, node, *args in findings])
+
+
+def evaluate_sections(eml_node, doc_name, lookup=eval_store.get_many, timer:eval_timing.EvaluationTimer=None):
+    """
+    Run the checks section by section: the dataset title, each data table, the creators, and so on. Each section is
+    keyed by a digest of the parts of the document its checks look at. lookup is called with the list of keys and
+    returns the memoized results for those it has. They're used as-is. For the other sections, the checks are run.
+    If a timer is given, the time taken by the scan, the shared validation, and each section that's run is added to it.
+
+    Returns the evaluation, in the order in which the checks were formerly run over the whole document, and the
+    results for the sections whose checks were run, keyed by section key, for memoizing.
+    """
+    if timer is None:
+        timer = eval_timing.EvaluationTimer()
+    # The checks don't change the model, so they can all use the same node index.
+    with node_index.indexed(eml_node) as index:
+        dataset_node = eml_node.find_child(names.DATASET)
+        with timer.stage('scan'):
+            scan = ModelScan(eml_node, index)
+        with timer.stage('shared validation'):
+            validation_errs, evaluation_warnings = shared_findings(eml_node, dataset_node, scan)
+        shared = combine_digests(findings_signature(validation_errs), findings_signature(evaluation_warnings))
+        dataset_children = dataset_node.children if dataset_node else []
+
+        def child_digests(*child_names):
+            return [scan.child_digests[child.id] for child in dataset_children if child.name in child_names]
+
+        # The attribute checks look for custom units that differ only in case from other custom units, and the data
+        #  table check looks for the data file.
+        custom_units = [unit_node.attribute_value('id') for unit_node in node_index.find_all_nodes_by_path(
+            eml_node, [names.ADDITIONALMETADATA, names.METADATA, names.UNITLIST, names.UNIT])]
+
+        def data_table_parts(data_table_node):
+            object_name_node = node_index.find_descendant(data_table_node, names.OBJECTNAME)
+            data_file_exists = None
+            if object_name_node:
+                uploads_folder = document_uploads_folder()
+                data_file_exists = os.path.exists(f'{uploads_folder}/{object_name_node.content}')
+            return [scan.child_digests[data_table_node.id], custom_units, data_file_exists]
+
+        sections = [('title', child_digests(names.TITLE) + [shared],
+                     lambda: check_dataset_title(eml_node, doc_name, validation_errs, evaluation_warnings))]
+        for data_table_node in node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.DATATABLE]):
+            sections.append((f'data_table {data_table_node.id}', data_table_parts(data_table_node),
+                             lambda node=data_table_node: check_data_table(eml_node, doc_name, node)))
+        sections.extend([
+            ('creators', child_digests(names.CREATOR) + [shared, len(dataset_children)],
+             lambda: check_creators(eml_node, doc_name, validation_errs)),
+            ('contacts', child_digests(names.CONTACT) + [shared, len(dataset_children)],
+             lambda: check_contacts(eml_node, doc_name, validation_errs)),
+            ('associated_parties', child_digests(names.ASSOCIATEDPARTY),
+             lambda: check_associated_parties(eml_node, doc_name)),
+            ('metadata_providers', child_digests(names.METADATAPROVIDER),
+             lambda: check_metadata_providers(eml_node, doc_name)),
+            ('abstract', [shared],
+             lambda: check_dataset_abstract(eml_node, doc_name, evaluation_warnings)),
+            ('keywords', [shared],
+             lambda: check_keywords(eml_node, doc_name, evaluation_warnings)),
+            # If the dataset has no intellectual rights, the check looks for them elsewhere, e.g., in a data source.
+            ('intellectual_rights', child_digests(names.INTELLECTUALRIGHTS, names.METHODS) + [shared],
+             lambda: check_intellectual_rights(eml_node, doc_name, evaluation_warnings)),
+            # Taxonomic coverage is checked wherever it occurs in the dataset, unless the package was imported from XML.
+            ('coverage', child_digests(names.COVERAGE) +
+             [scan.child_digests[child.id] for child in dataset_children if child.id in scan.taxonomy_holders] +
+             [scan.imported_from_xml],
+             lambda: check_coverage(eml_node, doc_name, evaluation_warnings)),
+            ('geographic_coverage', child_digests(names.COVERAGE),
+             lambda: check_geographic_coverage(eml_node, doc_name)),
+            ('maintenance', [shared],
+             lambda: check_maintenance(eml_node, doc_name, evaluation_warnings)),
+            ('publisher', child_digests(names.PUBLISHER),
+             lambda: check_publisher(eml_node, doc_name)),
+            ('methods', child_digests(names.METHODS) + [shared],
+             lambda: check_method_steps(eml_node, doc_name, validation_errs, evaluation_warnings)),
+            ('project', child_digests(names.PROJECT) + [shared],
+             lambda: check_project(eml_node, doc_name, evaluation_warnings))
+        ])
+        for other_entity_node in node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.OTHERENTITY]):
+            sections.append((f'other_entity {other_entity_node.id}', [scan.child_digests[other_entity_node.id]],
+                             lambda node=other_entity_node: check_other_entity(node, doc_name)))
+        sections.append(('data_package_id', [shared, eml_node.attribute_value('packageId')],
+                         lambda: check_data_package_id(eml_node, doc_name, validation_errs)))
+
+        # The results' links name the document and its nodes, so the keys include doc_name as well as the digests,
+        #  which include node ids. Results aren't shared across documents.
+        keyed_sections = [(combine_digests(EVALUATION_RULES_VERSION, doc_name, name, *parts), name, check)
+                          for name, parts, check in sections]
+        with timer.stage('memo lookup'):
+            memoized_sections = lookup([key for key, _, _ in keyed_sections])
+        evaluation = []
+        section_results = {}
+        for key, name, check in keyed_sections:
+            entries = memoized_sections.get(key)
+            if entries is None:
+                g.evaluation = []
+                with timer.stage(name):
+                    check()
+                entries = g.evaluation
+                section_results[key] = entries
+            evaluation.extend(entries)
+        g.evaluation = evaluation
+        return evaluation, section_results
+
+
+def evaluate_document(eml_node, doc_name, json_filename, md5=None, use_memo=True):
+    """
+    Evaluate the EML document whose JSON file is json_filename. If the evaluation has already been performed and
+    memoized, return the memoized results. Otherwise, perform the evaluation, memoize the results, and return them.
+    Only the sections of the document that have changed since the memoized evaluation are evaluated anew.
+
+    md5 is the fingerprint of the content of the JSON file from which eml_node was loaded, if the caller knows it.
+    If use_memo is False, the whole document is evaluated, and nothing is memoized. That's for timing evaluations.
+
+    Returns the evaluation, the XML parse errors and unicode errors, and the BadgeSummary. The timings of the stages
+    of the evaluation, if it was performed, are left in g.evaluation_timings (see eval_timing.py).
+
+    Used both by perform_evaluation() and by the evaluation worker, so this doesn't depend on the user's session.
+    """
+    g.evaluation_timings = None
+    if use_memo:
+        md5, evaluation, parse_errs, unicode_errs = check_evaluation_memo(json_filename, eml_node, md5)
+    else:
+        evaluation = None
+    if evaluation is not None:
+        # We don't need to run any of the checks. We can just use the memoized evaluation.
+        g.evaluation = evaluation
+        summary = memoized_badge_summary(json_filename, md5)
+        if summary is None:
+            # Memoized before we kept badge summaries.
+            summary = summarize_for_badges(evaluation, parse_errs, eml_node)
+            eval_store.put_many({badge_memo_key(json_filename, md5): summary,
+                                 latest_memo_key(json_filename): (md5, summary)})
+        return evaluation, parse_errs, unicode_errs, summary
+
+    # check_evaluation_memo() returns None for evaluation if there's no memo for the document's current content.
+    #  Run the checks anew for the sections that haven't been evaluated before.
+    timer = eval_timing.EvaluationTimer()
+    lookup = eval_store.get_many if use_memo else (lambda keys: {})
+    with node_index.indexed(eml_node):
+        evaluation, section_results = evaluate_sections(eml_node, doc_name, lookup, timer)
+
+    memo = eval_store.get(parse_memo_key(md5)) if md5 and use_memo else None
+    if memo is not None:
+        parse_errs, unicode_errs = memo
+    else:
+        user_folder = os.path.dirname(json_filename)
+        with timer.stage('parse and validate XML'):
+            try:
+                # The user folder is named for the package's owner.
+                xml_filename = webapp.home.utils.load_and_save.get_xml_pathname(
+                    doc_name, folder_name=user_folder, owner_login=os.path.basename(user_folder))
+                _, parse_errs, unicode_errs = views.parse_and_validate(pathname=xml_filename, parse_only=True)
+            except FileNotFoundError:
+                parse_errs = []
+                unicode_errs = []
+
+    if use_memo:
+        with timer.stage('memoize'):
+            summary = memoize_evaluation(json_filename, eml_node, md5, evaluation, section_results, parse_errs,
+                                         unicode_errs)
+    else:
+        with timer.stage('badge summary'):
+            summary = summarize_for_badges(evaluation, parse_errs, eml_node)
+
+    timings = timer.finish()
+    g.evaluation_timings = timings
+    if use_memo:
+        eval_timing.record_timings(timings, json_filename)
+
+    return evaluation, parse_errs, unicode_errs, summary
 
+
+def perform_evaluation(eml_node, doc_name):
+    """
+    Perform the evaluation of the EML document, or get the memoized evaluation, and set the badges accordingly.
+    See evaluate_document(), which also logs the timings of the evaluation's stages, if so configured.
+    """
     if not eml_node:
         # If the user uses the browser's back button after deleting the current package, for example, the eml_node will be None
         # We'll redirect to the index page
@@ -1429,76 +1748,28 @@ def perform_evaluation(eml_node, doc_name):
         raise RuntimeError("perform_evaluation() must be called during a request; g is request-scoped.")
 
     g.evaluation = []
-    start = datetime.now()
-
-    user_folder = user_data.get_user_folder_name()
-    xml_filename = f'{user_folder}/{doc_name}.xml'
-    json_filename = f'{user_folder}/{doc_name}.json'
-
-    md5, validation_errs, evaluation_warnings, evaluation, parse_errs, unicode_errs = check_evaluation_memo(json_filename, eml_node)
-    need_to_memoize = False
-    if evaluation is None:
-        # check_evaluation_memo() returns None for evaluation if the memo is stale, as shown by an md5 checksum mismatch
-        g.evaluation = []
-        need_to_memoize = True
-        validation_errs = validate_via_metapype(eml_node)
-        evaluation_warnings = evaluate_via_metapype(eml_node)
-    else:
-        g.evaluation = evaluation
-
-    if not need_to_memoize:
-        # We don't need to run all the checks. We can just use the memoized evaluation.
-        display_elapsed(start, '**** perform_evaluation')
-        set_session_info(evaluation, eml_node)
-        return evaluation, parse_errs, unicode_errs
-
-    # Run the checks anew.
-    display_elapsed(start, '**** starting checks')
-    check_dataset_title(eml_node, doc_name, validation_errs, evaluation_warnings)
-    check_data_tables(eml_node, doc_name, evaluation_warnings)
-    check_creators(eml_node, doc_name, validation_errs)
-    check_contacts(eml_node, doc_name, validation_errs)
-    check_associated_parties(eml_node, doc_name)
-    check_metadata_providers(eml_node, doc_name)
-    check_dataset_abstract(eml_node, doc_name, evaluation_warnings)
-    check_keywords(eml_node, doc_name, evaluation_warnings)
-    check_intellectual_rights(eml_node, doc_name, evaluation_warnings)
-    check_coverage(eml_node, doc_name, evaluation_warnings)
-    check_geographic_coverage(eml_node, doc_name)
-    check_maintenance(eml_node, doc_name, evaluation_warnings)
-    check_publisher(eml_node, doc_name)
-    check_method_steps(eml_node, doc_name, validation_errs, evaluation_warnings)
-    check_project(eml_node, doc_name)
-    check_other_entities(eml_node, doc_name)
-    check_data_package_id(eml_node, doc_name, validation_errs)
 
-    try:
-        _, parse_errs, unicode_errs = views.parse_and_validate(pathname=xml_filename, parse_only=True)
-    except FileNotFoundError:
-        parse_errs = []
-        unicode_errs = []
+    json_filename = document_json_filename(doc_name)
 
-    if need_to_memoize:
-        memoize_evaluation(json_filename, eml_node, md5,
-                           validation_errs, evaluation_warnings, evaluation,
-                           parse_errs, unicode_errs)
+    # The evaluation and the badge summary can share a node index, since neither changes the model.
+    with node_index.indexed(eml_node):
+        evaluation, parse_errs, unicode_errs, summary = evaluate_document(eml_node, doc_name, json_filename)
+    set_session_info(summary)
 
-    display_elapsed(start, '**** perform_evaluation')
+    return evaluation, parse_errs, unicode_errs
 
-    set_session_info(evaluation, eml_node)
 
-    return g.evaluation, parse_errs, unicode_errs
+def document_json_filename(doc_name):
+    """ Return the pathname of the JSON file of the user's document, respecting any collaboration in effect. """
+    user_folder = user_data.get_user_folder_name()
+    return f'{user_folder}/{doc_name}.json'
 
 
-def check_metadata_status(eml_node, doc_name):
-    """
-    Return the number of errors and warnings for the metadata status. This is used to set the badge color for the
-    Check Metadata menu item. Most of the time the evaluation is memoized, so this is fast.
-    """
-    evaluations, parse_errs, unicode_errs = perform_evaluation(eml_node, doc_name)
+def count_errors_and_warnings(evaluation, parse_errs):
+    """ Return the number of errors and warnings in an evaluation. """
     errors = 0
     warnings = 0
-    for entry in evaluations:
+    for entry in evaluation:
         severity = entry.severity
         if severity == EvalSeverity.ERROR:
             errors += 1
@@ -1511,10 +1782,144 @@ def check_metadata_status(eml_node, doc_name):
     return errors, warnings
 
 
+def check_metadata_status(eml_node, doc_name, wait=False):
+    """
+    Return the number of errors and warnings for the metadata status, and whether a new evaluation is pending, and set
+    the badges. This is used to set the badge color for the Check Metadata menu item. Most of the time the evaluation
+    is memoized, and all we need is its BadgeSummary, so this is fast.
+
+    If the evaluation worker is enabled and the evaluation isn't memoized, we don't wait for it unless wait is True.
+    The document is queued for the worker, pending is True, and the counts are for the last known evaluation of the
+    document, or None if it has never been evaluated.
+    """
+    if not eml_node:
+        raise EMLFileNotFound(doc_name)
+
+    json_filename = document_json_filename(doc_name)
+    md5 = document_meta.get_fingerprint(json_filename)
+    summary = memoized_badge_summary(json_filename, md5)
+    if summary is not None:
+        set_session_info(summary)
+        return summary.errors, summary.warnings, False
+
+    # If there's no JSON file, there's nothing to hand to the worker.
+    if wait or md5 is None or not eval_queue.worker_enabled():
+        evaluation, parse_errs, unicode_errs = perform_evaluation(eml_node, doc_name)
+        errors, warnings = count_errors_and_warnings(evaluation, parse_errs)
+        return errors, warnings, False
+
+    eval_queue.enqueue(json_filename, doc_name, document_uploads_folder(), md5)
+    summary = last_known_badge_summary(json_filename)
+    if summary is None:
+        return None, None, True
+    set_session_info(summary)
+    return summary.errors, summary.warnings, True
+
+
+def memoized_metadata_status(doc_name):
+    """
+    Return the number of errors and warnings in the memoized evaluation of the document's current content, and whether
+    the evaluation worker has yet to evaluate it. The counts are None if there's no such evaluation. This doesn't need
+    the model, so it's cheap enough to be polled by the page while the worker is busy.
+    """
+    json_filename = document_json_filename(doc_name)
+    md5 = document_meta.get_fingerprint(json_filename)
+    summary = memoized_badge_summary(json_filename, md5)
+    if summary is not None:
+        return summary.errors, summary.warnings, False
+    pending = md5 is not None and eval_queue.is_pending(json_filename, md5)
+    return None, None, pending
+
+
 def check_eml(eml_node, doc_name):
-    """ Evaluate the EML document and return the results as HTML. """
+    """
+    Evaluate the EML document and return the results as HTML. The HTML is memoized in the evaluation store along with
+    the evaluation, so viewing the report again when the document hasn't changed doesn't re-format it.
+    """
+    if not eml_node:
+        raise EMLFileNotFound(doc_name)
+
+    json_filename = document_json_filename(doc_name)
+    md5 = document_meta.get_fingerprint(json_filename)
+    key = report_memo_key(json_filename, md5, report_highlight()) if md5 else None
+    memo = eval_store.get(key) if key else None
+    if memo is not None:
+        content, parse_errs, unicode_errs = memo
+        return content, parse_errs, unicode_errs
+
     evaluations, parse_errs, unicode_errs = perform_evaluation(eml_node, doc_name)
-    return format_output(evaluations, parse_errs, unicode_errs, eml_node), parse_errs, unicode_errs
+    content = format_output(evaluations, parse_errs, unicode_errs, eml_node)
+    if key:
+        eval_store.put(key, (content, parse_errs, unicode_errs))
+    return content, parse_errs, unicode_errs
+
+
+_rules = threading.local()
+
+
+def validate_node(node, errs):
+    """
+    Validate a node, as validate.node() does, but reuse the metapype Rule for each kind of node instead of constructing
+    one for every node validated. Constructing the rules is about a quarter of the cost of validating a tree. A rule
+    holds state only while it's validating a node, so each thread keeps its own rules.
+    """
+    if node.name not in rule.node_mappings:
+        errs.append((ValidationError.UNKNOWN_NODE, f"Unknown node rule type: {node.name}", node))
+        return
+    rules = getattr(_rules, 'rules', None)
+    if rules is None:
+        rules = _rules.rules = {}
+    node_rule = rules.get(node.name)
+    if node_rule is None:
+        node_rule = rules[node.name] = rule.get_rule(node.name)
+    node_rule.validate_rule(node, errs)
+
+
+def validate_tree(node, errs):
+    """ Validate a subtree, as validate.tree() does, i.e., in preorder and not descending into metadata nodes. """
+    validate_node(node, errs)
+    if node.name != names.METADATA:
+        for child in node.children:
+            validate_tree(child, errs)
+
+
+def validate_data_table(data_table_node, attribute_nodes):
+    """
+    Validate a data table and, in the same walk, each of the given attributes (columns). Returns the table's
+    validation errors, as validate_via_metapype(data_table_node) would return them, and the validation errors for each
+    attribute, keyed by node id, as validate_via_metapype(attribute_node) would return them. I.e., each attribute is
+    validated once, rather than once for the table and again for the column.
+    """
+    attribute_ids = set(attribute_node.id for attribute_node in attribute_nodes)
+    attribute_errs = {}
+
+    def walk(node, errs):
+        if node.id in attribute_ids:
+            errs_for_attribute = attribute_errs[node.id] = []
+            try:
+                validate_tree(node, errs_for_attribute)
+            except Exception as e:
+                log_error(f'validate_via_metapype: node={node.name} exception={e}')
+                raise
+            finally:
+                errs.extend(errs_for_attribute)
+            return
+        validate_node(node, errs)
+        if node.name != names.METADATA:
+            for child in node.children:
+                walk(child, errs)
+
+    validation_errs = []
+    try:
+        walk(data_table_node, validation_errs)
+    except Exception as e:
+        log_error(f'validate_via_metapype: node={data_table_node.name} exception={e}')
+    # If metapype raised an exception, validation of the table stopped there. Validate the remaining attributes
+    #  on their own.
+    for attribute_node in attribute_nodes:
+        if attribute_node.id not in attribute_errs:
+            attribute_errs[attribute_node.id] = validate_via_metapype(attribute_node)
+    return validation_errs, attribute_errs
 
 
 def validate_via_metapype(node):
@@ -1522,7 +1927,7 @@ def validate_via_metapype(node):
     errs = []
     try:
         # start = time.perf_counter()
-        validate.tree(node, errs)
+        validate_tree(node, errs)
         # end = time.perf_counter()
         # elapsed = end - start
         # if elapsed > 0.05:
@@ -1612,7 +2017,7 @@ def section_to_name(section):
 def empty_subtree(eml_node, subtree_name):
     if eml_node is None:
         return True
-    subtree = eml_node.find_descendant(subtree_name)
+    subtree = node_index.find_descendant(eml_node, subtree_name)
     if subtree is None:
         return True
     if (subtree.content is None or len(subtree.content) == 0) and len(subtree.attributes) == 0 and len(subtree.children) == 0:
@@ -1670,44 +2075,47 @@ def get_section_from_link(link):
     return None
 
 
-def set_session_info(evaluation, eml_node):
-    def init_section_links_found(section_links_found):
-        section_links_found['title'] = EvalSeverity.OK
-        section_links_found['data_tables'] = EvalSeverity.OK
-        section_links_found['creators'] = EvalSeverity.OK
-        section_links_found['contacts'] = EvalSeverity.OK
-        section_links_found['associated_parties'] = EvalSeverity.OK
-        section_links_found['metadata_providers'] = EvalSeverity.OK
-        section_links_found['abstract'] = EvalSeverity.OK
-        section_links_found['keywords'] = EvalSeverity.OK
-        section_links_found['intellectual_rights'] = EvalSeverity.OK
-        section_links_found['geographic_coverage'] = EvalSeverity.OK
-        section_links_found['temporal_coverage'] = EvalSeverity.OK
-        section_links_found['taxonomic_coverage'] = EvalSeverity.OK
-        section_links_found['maintenance'] = EvalSeverity.OK
-        section_links_found['publisher'] = EvalSeverity.OK
-        section_links_found['publication_info'] = EvalSeverity.OK
-        section_links_found['methods'] = EvalSeverity.OK
-        section_links_found['project'] = EvalSeverity.OK
-        section_links_found['other_entities'] = EvalSeverity.OK
-        section_links_found['data_package_id'] = EvalSeverity.OK
-
-        for key, value in section_links_found.items():
-            name = section_to_name(key)
-            if name and not empty_subtree(eml_node, name):
-                g.badge_data[key + '_status'] = 'green'
-            else:
-                g.badge_data[key + '_status'] = 'white'
+# The sections of the Contents menu that have badges
+BADGE_SECTIONS = [
+    'title',
+    'data_tables',
+    'creators',
+    'contacts',
+    'associated_parties',
+    'metadata_providers',
+    'abstract',
+    'keywords',
+    'intellectual_rights',
+    'geographic_coverage',
+    'temporal_coverage',
+    'taxonomic_coverage',
+    'maintenance',
+    'publisher',
+    'publication_info',
+    'methods',
+    'project',
+    'other_entities',
+    'data_package_id'
+]
 
-    def severity_to_status(severity):
-        if severity == EvalSeverity.OK:
-            return 'green'
-        if severity == EvalSeverity.WARNING:
-            return 'yellow'
-        if severity == EvalSeverity.ERROR:
-            return 'red'
-        return 'green'
 
+@dataclass
+class BadgeSummary:
+    """
+    What the badges need to know about an evaluation: the worst severity found for each section of the Contents menu
+    and for each node that has a page of its own, which sections are empty, and the numbers of errors and warnings for
+    the Check Metadata badge. It's computed when the evaluation is memoized and memoized along with it, so rendering a
+    page doesn't have to go through the evaluation entries and parse their links.
+    """
+    section_severities: dict
+    node_severities: dict
+    empty_sections: frozenset
+    errors: int
+    warnings: int
+
+
+def summarize_for_badges(evaluation, parse_errs, eml_node):
+    """ Return the BadgeSummary for the evaluation of the model. """
     def find_node_ids(link):
         """
         Finds the node ids in a link.
@@ -1735,33 +2143,56 @@ def set_session_info(evaluation, eml_node):
                     node_ids.append(val)
         return node_ids
 
-    section_links_found = {}
-    node_links_found = {}
-    init_section_links_found(section_links_found)
-    g.badge_data = {}
-
-    for entry in g.evaluation:
+    section_severities = {}
+    node_severities = {}
+    for entry in evaluation:
         severity = entry.severity
         if entry.link:
             which = get_section_from_link(entry.link)
             if which:
-                current_severity = section_links_found.get(which, EvalSeverity.OK)
+                current_severity = section_severities.get(which, EvalSeverity.OK)
                 if severity.value < current_severity.value:
-                    section_links_found[which] = severity
+                    section_severities[which] = severity
             node_ids = find_node_ids(entry.link)
             for node_id in node_ids:
-                current_severity = node_links_found.get(node_id, EvalSeverity.OK)
+                current_severity = node_severities.get(node_id, EvalSeverity.OK)
                 if severity.value < current_severity.value:
-                    node_links_found[node_id] = severity
+                    node_severities[node_id] = severity
 
-    for key, value in section_links_found.items():
-        color = severity_to_status(value)
-        if color == 'green':
+    # empty_subtree() searches the whole model for each section, so give it an index to search.
+    with node_index.indexed(eml_node):
+        empty_sections = set()
+        for key in BADGE_SECTIONS:
             name = section_to_name(key)
             if name and empty_subtree(eml_node, name):
-                color = 'white'
-        g.badge_data[key + '_status'] = color
+                empty_sections.add(key)
+
+    errors, warnings = count_errors_and_warnings(evaluation, parse_errs)
+    return BadgeSummary(section_severities, node_severities, frozenset(empty_sections), errors, warnings)
+
+
+def badge_data_from_summary(summary:BadgeSummary):
+    """ Return the badge data for the templates (see inject_badge_data() in webapp/__init__.py). """
+    def severity_to_status(severity):
+        if severity == EvalSeverity.OK:
+            return 'green'
+        if severity == EvalSeverity.WARNING:
+            return 'yellow'
+        if severity == EvalSeverity.ERROR:
+            return 'red'
+        return 'green'
+
+    badge_data = {}
+    for key in BADGE_SECTIONS:
+        color = severity_to_status(summary.section_severities.get(key, EvalSeverity.OK))
+        if color == 'green' and key in summary.empty_sections:
+            color = 'white'
+        badge_data[key + '_status'] = color
+    for node_id, severity in summary.node_severities.items():
+        badge_data[node_id + '_status'] = severity_to_status(severity)
+    return badge_data
 
-    for key, value in node_links_found.items():
-        g.badge_data[key + '_status'] = severity_to_status(value)
 
+def set_session_info(summary:BadgeSummary):
+    """ Set the badges from the evaluation's BadgeSummary. """
+    g.badge_data = badge_data_from_summary(summary)
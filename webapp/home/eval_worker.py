@@ -0,0 +1,128 @@
+"""
+Background worker for Check Metadata evaluations and Check All Data Tables.
+
+When Config.EVALUATION_WORKER is True, saving a document doesn't wait for the document to be evaluated. Instead, the
+document is queued (see webapp/home/utils/eval_queue.py), and this worker evaluates it and memoizes the results in the
+evaluation store, where the app's requests find them. Meanwhile, the badges show the last known evaluation.
+
+Likewise, Check All Data Tables queues the tables to be checked (see webapp/home/utils/table_check_queue.py), and this
+worker checks them, saves the results, and records the progress that the Check Data Tables page polls. Evaluations
+are done first, since they're quick. A table check can take minutes, during which this worker doesn't evaluate
+documents, so if tables are checked often, it's worth running a second worker.
+
+The worker runs in its own process, either as a uWSGI mule (see deployment/ezeml.ini) or standalone:
+
+    python eval_worker.py
+
+Any number of workers can run at once; each job is claimed by one of them. The worker has no user session, so what
+the evaluation would otherwise get from the session -- the pathnames of the document and its uploads folder -- comes
+from the job.
+"""
+
+import time
+
+from flask import g
+from metapype.model.node import Node
+
+from webapp.config import Config
+from webapp.home.home_utils import log_error, log_info
+import webapp.home.utils.document_meta as document_meta
+import webapp.home.utils.eval_queue as eval_queue
+import webapp.home.utils.model_cache as model_cache
+import webapp.home.utils.table_check_queue as table_check_queue
+import webapp.home.utils.table_check_scheduler as table_check_scheduler
+
+
+DEFAULT_POLL_SECONDS = 1.0
+
+
+def _poll_seconds():
+    return getattr(Config, 'EVALUATION_WORKER_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+
+
+def evaluate_job(app, job:eval_queue.EvaluationJob):
+    """
+    Evaluate the document named by the job and memoize the results. Returns True if the job is done, i.e., the
+    document's content was evaluated or the document no longer exists.
+    """
+    import webapp.home.check_metadata as check_metadata
+    import webapp.home.utils.load_and_save as load_and_save
+    import webapp.home.views as views
+
+    md5 = document_meta.get_fingerprint(job.json_filename)
+    if md5 is None:
+        # The document has been deleted.
+        return True
+    # The document may have been saved again since the job was queued. If so, we evaluate what's there now, which is
+    #  what the newer job asks for.
+    with app.test_request_context('/'):
+        views.load_eval_entries()
+        g.uploads_folder = job.uploads_folder
+        # Use a private node store, so the worker's models don't accumulate.
+        with Node.store_scope({}, clear_on_exit=True):
+            eml_node = model_cache.get_model(job.json_filename, load_and_save.load_model_file)
+            if eml_node is None:
+                return True
+            if document_meta.get_fingerprint(job.json_filename) != md5:
+                # Saved while we were loading it. We can't tell which content we have, so try again.
+                return False
+            check_metadata.evaluate_document(eml_node, job.doc_name, job.json_filename, md5)
+    return True
+
+
+def run_once(app):
+    """ Claim a job and do it. Returns False if there was no job to do. """
+    job = eval_queue.claim()
+    if job is None:
+        return False
+    start = time.perf_counter()
+    try:
+        done = evaluate_job(app, job)
+    except Exception as e:
+        log_error(f'eval_worker: evaluating {job.json_filename} failed: {e}')
+        done = False
+    if done:
+        eval_queue.complete(job)
+        log_info(f'eval_worker: evaluated {job.json_filename} in {(time.perf_counter() - start) * 1000:.0f} ms')
+    else:
+        eval_queue.release(job)
+    return True
+
+
+def check_table_job(job:table_check_queue.TableCheckJob):
+    """ Check the table named by the job, save the results, and record the progress. """
+    import webapp.home.check_data_table_contents as check_data_table_contents
+
+    with table_check_scheduler.held_slots(job.owner):
+        errors, flashed_messages = check_data_table_contents.check_data_table_in_worker(
+            job.eml_file_url, job.csv_file_url, job.data_table_name, job.data_table_json)
+    check_data_table_contents.save_data_file_eval_results(job.uploads_folder, job.csv_filename, job.metadata_hash,
+                                                          errors)
+    progress = table_check_scheduler.TableCheckProgress(job.user_folder, job.doc_name)
+    progress.table_checked(job.data_table_name, flashed_messages)
+
+
+def run_table_check_once():
+    """ Claim a table check and do it. Returns False if there was no check to do. """
+    job = table_check_queue.claim()
+    if job is None:
+        return False
+    start = time.perf_counter()
+    try:
+        check_table_job(job)
+    except Exception as e:
+        log_error(f'eval_worker: checking {job.csv_filename} failed: {e}')
+        if table_check_queue.release(job):
+            table_check_scheduler.TableCheckProgress(job.user_folder, job.doc_name).table_failed(job.data_table_name)
+        return True
+    table_check_queue.complete(job)
+    log_info(f'eval_worker: checked {job.csv_filename} in {(time.perf_counter() - start) * 1000:.0f} ms')
+    return True
+
+
+def run(app):
+    """ Do jobs as they're queued, forever. """
+    log_info('eval_worker: started')
+    while True:
+        if not run_once(app) and not run_table_check_once():
+            time.sleep(_poll_seconds())
@@ -133,19 +133,32 @@ def url_without_ui_element_id_query_string(url):
     return new_url
 
 
-def get_check_metadata_status(eml_node:Node=None, filename:str=None):
+def check_metadata_status_color(errors:int=None, warnings:int=None):
     """
-    Get the status of the metadata check and save it in the session variable.
+    Return the color of the Check Metadata badge, given the numbers of errors and warnings. None means not known yet.
     """
-    import webapp.home.check_metadata as check_metadata
-    errors, warnings = check_metadata.check_metadata_status(eml_node, filename)
+    if errors is None:
+        return "white"
     if errors > 0:
-        status = "red"
+        return "red"
     elif warnings > 0:
-        status = "yellow"
+        return "yellow"
     else:
-        status = "green"
+        return "green"
+
+
+def get_check_metadata_status(eml_node:Node=None, filename:str=None, wait:bool=False):
+    """
+    Get the status of the metadata check and save it in the session variable. If the evaluation worker has yet to
+    evaluate the document's current content, the status is that of the last known evaluation, and the page polls for
+    the new status (see check_metadata_badge() in views.py). Pages that act on the status, e.g., by refusing to submit
+    a package with errors, pass wait=True to get the status of the current content.
+    """
+    import webapp.home.check_metadata as check_metadata
+    errors, warnings, pending = check_metadata.check_metadata_status(eml_node, filename, wait=wait)
+    status = check_metadata_status_color(errors, warnings)
     session["check_metadata_status"] = status
+    session["check_metadata_pending"] = pending
     return status
 
 
@@ -11,8 +11,8 @@ from flask import (
     url_for
 )
 
-from webapp.home.utils.load_and_save import load_eml
 import webapp.auth.user_data as user_data
+import webapp.home.utils.data_table_evals as data_table_evals
 from webapp.config import Config
 from webapp.pages import *
 
@@ -24,54 +24,48 @@ Data_Usage = collections.namedtuple(
     'Data_Usage', ["user_name", "date_modified", "size", "uploads_size", "exports_size", "zip_temp_size", "dir_name"])
 
 
-def get_dir_size(path='.'):
-    """ Get the size of a directory in bytes. This is a recursive function that will include subdirectories. """
+def get_dir_size(path='.', exclude=None):
+    """
+    Get the size of a directory in bytes. This is a recursive function that will include subdirectories.
+    Files whose names satisfy exclude, if given, aren't counted.
+    """
 
     total = 0
     if os.path.exists(path):
         with os.scandir(path) as it:
             for entry in it:
                 if entry.is_file():
-                    total += entry.stat().st_size
+                    if not (exclude and exclude(entry.name)):
+                        total += entry.stat().st_size
                 elif entry.is_dir():
-                    total += get_dir_size(entry.path)
+                    total += get_dir_size(entry.path, exclude)
     return total
 
 
 def get_package_size(package_name, current_user_directory_only=True):
-    """ Get the size of a package in bytes. We will only count the size of the XML file and the
-    sizes of the data files. We will not count the size of the JSON files or PKL files since these
-    are not seen by users.
+    """ Get the size of a package in bytes. We will only count the size of the document and the
+    sizes of the data files. We will not count the files ezEML keeps for its own use, e.g., PKL files
+    and the results of Check Data Tables in the uploads folder, since these are not seen by users.
+
+    The document is sized by its JSON file. The XML file is generated only when it's needed (see
+    get_xml_pathname() in load_and_save.py), so it may be missing or out of date.
 
     current_user_directory_only=True means don't do redirection based on collaboration status; just look
     in the user's directory.
     """
 
-    # See if an XML file exists using the package name
     user_dir = user_data.get_user_folder_name(current_user_directory_only=current_user_directory_only)
-    xml_file = os.path.join(user_dir, package_name + '.xml')
-    xml_size = 0
-    if not os.path.isfile(xml_file):
-        # XML file isn't named using the package name, so look for it using the package ID.
-        # Load the JSON model to find the package ID.
-        json_file = os.path.join(user_dir, package_name + '.json')
-        eml_node = load_eml(package_name, folder_name=user_dir, skip_metadata_check=True, do_not_lock=True)
-        package_id = eml_node.attribute_value('packageId')
-        if package_id:
-            xml_file = os.path.join(user_dir, package_id + '.xml')
-            if os.path.isfile(xml_file):
-                xml_size = os.path.getsize(xml_file)
-    else:
-        xml_size = os.path.getsize(xml_file)
+    json_file = os.path.join(user_dir, package_name + '.json')
+    json_size = os.path.getsize(json_file) if os.path.isfile(json_file) else 0
 
     # Get the size of the data files
     uploads_dir = os.path.join(user_dir, 'uploads', package_name)
     if os.path.isdir(uploads_dir):
-        data_size = get_dir_size(uploads_dir)
+        data_size = get_dir_size(uploads_dir, exclude=data_table_evals.is_bookkeeping_file)
     else:
         data_size = 0
 
-    size = xml_size + data_size
+    size = json_size + data_size
     return size
 
 
@@ -29,6 +29,7 @@ from webapp.home.home_utils import RELEASE_NUMBER, log_error, log_info
 from webapp.home.metapype_client import VariableType
 from webapp.home.utils.node_utils import new_child_node, add_node, Optionality
 
+import webapp.home.utils.fixups as fixups
 import webapp.home.utils.load_and_save as load_and_save
 
 from metapype.eml import names
@@ -1299,21 +1300,39 @@ def get_fetched_from_edi_metadata(eml_node:Node=None):
     return msg
 
 
-def add_eml_editor_metadata(eml_node:Node=None):
+class EmlEditorMetadataFixup(fixups.Fixup):
     """
     When a package is created or edited in ezEML, we add an emlEditor node to the additional metadata section.
     This documents the fact that the package was created or edited in ezEML, and the version of ezEML used.
     """
-    eml_editor_node = eml_node.find_descendant('emlEditor')
-    if eml_editor_node:
-        metadata_node = eml_editor_node.parent
-        additional_metadata_node = metadata_node.parent
-        eml_node.remove_child(additional_metadata_node)
-    additional_metadata_node = new_child_node(names.ADDITIONALMETADATA, parent=eml_node)
-    metadata_node = new_child_node(names.METADATA, parent=additional_metadata_node)
-    # For the emlEditor node, we need to bypass Metapype validity checking
-    eml_editor_node = Node('emlEditor', parent=metadata_node)
-    metadata_node.add_child(eml_editor_node)
-    eml_editor_node.attributes.clear()
-    eml_editor_node.add_attribute('app', 'ezEML')
-    eml_editor_node.add_attribute('release', RELEASE_NUMBER)
+    name = 'add_eml_editor_metadata'
+    node_names = ('emlEditor',)
+
+    def __init__(self):
+        self.eml_editor_nodes = []
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        self.eml_editor_nodes.append(node)
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
+        eml_editor_node = next((node for node in self.eml_editor_nodes if run.is_live(node)), None)
+        if eml_editor_node:
+            metadata_node = eml_editor_node.parent
+            additional_metadata_node = metadata_node.parent
+            eml_node.remove_child(additional_metadata_node)
+            run.removed.add(additional_metadata_node.id)
+        additional_metadata_node = new_child_node(names.ADDITIONALMETADATA, parent=eml_node)
+        metadata_node = new_child_node(names.METADATA, parent=additional_metadata_node)
+        # For the emlEditor node, we need to bypass Metapype validity checking
+        eml_editor_node = Node('emlEditor', parent=metadata_node)
+        metadata_node.add_child(eml_editor_node)
+        eml_editor_node.attributes.clear()
+        eml_editor_node.add_attribute('app', 'ezEML')
+        eml_editor_node.add_attribute('release', RELEASE_NUMBER)
+
+
+def add_eml_editor_metadata(eml_node:Node=None):
+    """
+    Add an emlEditor node to the additional metadata section. See EmlEditorMetadataFixup.
+    """
+    fixups.run_fixups(eml_node, [EmlEditorMetadataFixup()])
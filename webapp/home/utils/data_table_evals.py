@@ -0,0 +1,201 @@
+"""
+Index of the results of Check Data Tables for the data tables of a document.
+
+The results of checking a data table foo.csv are saved in foo.csv_eval_<metadata hash> in the document's uploads folder,
+where the metadata hash is from hash_data_table_metadata_settings() in check_data_table_contents.py. The status of a
+table, i.e., the color of its badge, used to be found by looking for that file, or for foo.csv_eval_<hash>_ok if there
+were no errors, and resetting a table's status globbed for its files.
+
+Now the uploads folder has an index, .data_table_evals.json, a JSON dict that maps each CSV filename to the metadata hash
+it was checked with, whether errors were found, and the identity (mtime_ns, size, inode) and MD5 hash of the CSV file
+that was checked. The status of all of a document's tables comes from one read of the index, which is cached in each
+process for as long as the index file is unchanged. The results file is only read to display the errors.
+
+A table's entry is current if the metadata hash matches and the CSV file is the one that was checked. Usually the CSV
+file's identity settles that. If the identity has changed but the size hasn't, e.g., because the uploads folder was
+copied, the file is hashed, and if the hash matches, the entry is updated with the new identity, so that's done once.
+
+Updates are made while holding an flock() on .data_table_evals.lock and are written atomically. The first time an
+uploads folder's index is read, results files from before the index existed are adopted into it.
+"""
+
+from contextlib import contextmanager
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+
+import webapp.home.utils.file_utils as file_utils
+from webapp.home.utils.model_cache import file_identity
+from webapp.home.utils.row_count import file_md5
+
+
+INDEX_FILENAME = '.data_table_evals.json'
+LOCK_FILENAME = '.data_table_evals.lock'
+RESULTS_INFIX = '_eval_'
+# Results files, e.g., foo.csv_eval_1234567890, or, from before the index, foo.csv_eval_1234567890_ok
+_LEGACY_RESULTS_REGEX = re.compile(r'(?P<csv_filename>.+)_eval_(?P<metadata_hash>[0-9a-f]{10})(?P<ok>_ok)?')
+
+_cache = {}  # index pathname -> (index file identity, index)
+_cache_lock = threading.Lock()
+
+
+def index_pathname(uploads_folder):
+    return os.path.join(uploads_folder, INDEX_FILENAME)
+
+
+def results_pathname(uploads_folder, csv_filename, metadata_hash):
+    return os.path.join(uploads_folder, f'{csv_filename}{RESULTS_INFIX}{metadata_hash}')
+
+
+def is_bookkeeping_file(filename):
+    """ Return True if filename is the name of one of the files kept in an uploads folder for Check Data Tables. """
+    return filename in (INDEX_FILENAME, LOCK_FILENAME) or bool(_LEGACY_RESULTS_REGEX.fullmatch(filename))
+
+
+def _read_index_file(pathname):
+    try:
+        with open(pathname, 'r') as f:
+            index = json.load(f)
+        if isinstance(index, dict):
+            return index
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+@contextmanager
+def _index_lock(uploads_folder):
+    with open(os.path.join(uploads_folder, LOCK_FILENAME), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _adopt_legacy_results(uploads_folder):
+    """ Return an index of the results files that were saved before the index existed. """
+    index = {}
+    for pathname in glob.glob(os.path.join(glob.escape(uploads_folder), f'*{RESULTS_INFIX}*')):
+        match = _LEGACY_RESULTS_REGEX.fullmatch(os.path.basename(pathname))
+        if not match:
+            continue
+        csv_filename = match.group('csv_filename')
+        identity = file_identity(os.path.join(uploads_folder, csv_filename))
+        if identity is None:
+            continue
+        metadata_hash = match.group('metadata_hash')
+        if match.group('ok'):
+            os.replace(pathname, results_pathname(uploads_folder, csv_filename, metadata_hash))
+        # The CSV file is taken to be the one that was checked, as it was before the index. Its hash isn't known.
+        index[csv_filename] = {'metadata_hash': metadata_hash, 'ok': bool(match.group('ok')),
+                               'identity': list(identity), 'md5': None}
+    return index
+
+
+@contextmanager
+def _updating_index(uploads_folder):
+    """ Yield the index, read afresh while holding the lock, for the caller to modify, and then save it. """
+    pathname = index_pathname(uploads_folder)
+    with _index_lock(uploads_folder):
+        index = _read_index_file(pathname)
+        if index is None:
+            index = _adopt_legacy_results(uploads_folder)
+        yield index
+        file_utils.atomic_write(pathname, json.dumps(index))
+
+
+def read_index(uploads_folder):
+    """
+    Return the index for an uploads folder, creating it if it doesn't exist yet. The dict that's returned is shared,
+    so it must not be modified.
+    """
+    pathname = index_pathname(uploads_folder)
+    identity = file_identity(pathname)
+    if identity is None:
+        with _updating_index(uploads_folder):
+            pass
+        identity = file_identity(pathname)
+    with _cache_lock:
+        cached = _cache.get(pathname)
+        if cached and cached[0] == identity:
+            return cached[1]
+    index = _read_index_file(pathname) or {}
+    with _cache_lock:
+        _cache[pathname] = (identity, index)
+    return index
+
+
+def _is_checked_file(uploads_folder, csv_filename, entry, identity):
+    """ Return True if the CSV file with the given identity is the one whose results are recorded in entry. """
+    if entry.get('identity') == list(identity):
+        return True
+    if not entry.get('md5') or not entry.get('identity') or entry['identity'][1] != identity[1]:
+        return False
+    try:
+        if file_md5(os.path.join(uploads_folder, csv_filename)) != entry['md5']:
+            return False
+    except OSError:
+        return False
+    with _updating_index(uploads_folder) as index:
+        if index.get(csv_filename, {}).get('md5') == entry['md5']:
+            index[csv_filename]['identity'] = list(identity)
+    return True
+
+
+def get_status(uploads_folder, csv_filename, metadata_hash):
+    """
+    Return the status of a data table: 'black' if its CSV file is missing, 'yellow' if it hasn't been checked since it
+    or its metadata changed, and otherwise 'red' or 'green', depending on whether errors were found.
+    """
+    identity = file_identity(os.path.join(uploads_folder, csv_filename))
+    if identity is None:
+        return 'black'
+    entry = read_index(uploads_folder).get(csv_filename)
+    if not entry or entry.get('metadata_hash') != metadata_hash:
+        return 'yellow'
+    if not _is_checked_file(uploads_folder, csv_filename, entry, identity):
+        return 'yellow'
+    return 'green' if entry.get('ok') else 'red'
+
+
+def get_results(uploads_folder, csv_filename, metadata_hash):
+    """ Return the saved results of checking a data table, or None if there are no current results. """
+    if get_status(uploads_folder, csv_filename, metadata_hash) not in ('red', 'green'):
+        return None
+    try:
+        with open(results_pathname(uploads_folder, csv_filename, metadata_hash), 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _remove_results(uploads_folder, csv_filename, entry):
+    if entry:
+        try:
+            os.remove(results_pathname(uploads_folder, csv_filename, entry.get('metadata_hash')))
+        except FileNotFoundError:
+            pass
+
+
+def save_results(uploads_folder, csv_filename, metadata_hash, results, ok):
+    """ Save the results of checking a data table, replacing any earlier results. ok means no errors were found. """
+    csv_pathname = os.path.join(uploads_folder, csv_filename)
+    identity = file_identity(csv_pathname)
+    md5 = file_md5(csv_pathname) if identity else None
+    file_utils.atomic_write(results_pathname(uploads_folder, csv_filename, metadata_hash), results)
+    with _updating_index(uploads_folder) as index:
+        previous = index.get(csv_filename)
+        if previous and previous.get('metadata_hash') != metadata_hash:
+            _remove_results(uploads_folder, csv_filename, previous)
+        index[csv_filename] = {'metadata_hash': metadata_hash, 'ok': ok,
+                               'identity': list(identity) if identity else None, 'md5': md5}
+
+
+def reset(uploads_folder, csv_filename):
+    """ Forget the results of checking a data table, e.g., because it has been re-uploaded. """
+    with _updating_index(uploads_folder) as index:
+        _remove_results(uploads_folder, csv_filename, index.pop(csv_filename, None))
@@ -0,0 +1,78 @@
+"""
+Fingerprints of the metadata settings that affect Check Data Tables' checking of a data table.
+
+The results of checking a data table are saved along with a hash of the table's metadata settings (see
+data_table_evals.py), so that when the settings change, the results are known to be obsolete. The hash used to be taken
+over the whole dataTable subtree, serialized with metapype_io.to_json(), and it was computed for every table whenever
+the Check Data Tables badges were set, i.e., on nearly every page hit. For a table with hundreds of columns, that took a
+good part of a second.
+
+settings_hash() instead hashes only what the check depends on: the table's name; the data format, which gives the
+delimiters and the numbers of header and footer lines; and, for each attribute, its name, its measurement scale, which
+gives the variable type, the number type, the datetime format string, and the categorical codes, and its missing value
+codes. Node ids aren't included, so a copy of a table has the same hash. Editing a column's definition, the table's
+coverage, etc., doesn't make the table's results obsolete.
+
+Hashes are memoized per data table node, for as long as the node exists. The memo can't tell when a node's subtree is
+modified, so save_eml() calls forget() for the model it saves, and callers that modify a table's metadata without
+saving it must do so as well before asking for the table's hash.
+"""
+
+import hashlib
+import threading
+import weakref
+
+from metapype.eml import names
+from metapype.model.node import Node
+
+from webapp.home.utils.subtree_digest import combine_digests, subtree_digest
+
+
+# The size of the hash in bytes. The hash appears in the names of the files the results are saved in.
+HASH_SIZE = 5
+
+_memo = weakref.WeakKeyDictionary()  # data table node -> hash
+_memo_lock = threading.Lock()
+
+
+def _content(node:Node):
+    return node.content if node else None
+
+
+def _attribute_settings(attribute_node:Node):
+    missing_value_code_nodes = attribute_node.find_all_children(names.MISSINGVALUECODE)
+    return (_content(attribute_node.find_child(names.ATTRIBUTENAME)),
+            subtree_digest(attribute_node.find_child(names.MEASUREMENTSCALE), ids=False),
+            [subtree_digest(node, ids=False) for node in missing_value_code_nodes])
+
+
+def compute_settings_hash(data_table_node:Node):
+    """ Return the hash of a data table's settings, as a hex string, without consulting the memo. """
+    data_format_nodes = data_table_node.find_all_nodes_by_path([names.PHYSICAL, names.DATAFORMAT])
+    attribute_nodes = data_table_node.find_all_nodes_by_path([names.ATTRIBUTELIST, names.ATTRIBUTE])
+    digest = combine_digests(_content(data_table_node.find_child(names.ENTITYNAME)),
+                             [subtree_digest(node, ids=False) for node in data_format_nodes],
+                             [_attribute_settings(node) for node in attribute_nodes])
+    return hashlib.shake_256(digest.encode()).hexdigest(HASH_SIZE)
+
+
+def settings_hash(data_table_node:Node):
+    """ Return the hash of a data table's settings, as a hex string. """
+    with _memo_lock:
+        hash = _memo.get(data_table_node)
+    if hash is None:
+        hash = compute_settings_hash(data_table_node)
+        with _memo_lock:
+            _memo[data_table_node] = hash
+    return hash
+
+
+def forget(node:Node):
+    """ Forget the memoized hashes for node, if it's a data table, and for the data tables within it. """
+    if node is None:
+        return
+    data_table_nodes = [node] if node.name == names.DATATABLE else []
+    node.find_all_descendants(names.DATATABLE, data_table_nodes)
+    with _memo_lock:
+        for data_table_node in data_table_nodes:
+            _memo.pop(data_table_node, None)
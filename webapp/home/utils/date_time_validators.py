@@ -0,0 +1,130 @@
+"""
+Validators for the values in the datetime columns of data tables.
+
+Check Data Tables checks that each value in a datetime column has the form given by the column's format string. The
+forms of the supported format strings are given by regexes in webapp/static/dateTimeFormatString_regex.csv (see
+load_date_time_format_files() in check_data_table_contents.py). get_validator() returns a DateTimeValidator for a format
+string, which holds the format's compiled regex. Validators are kept in a registry, so each regex is compiled once per
+process.
+
+A format string that isn't in the CSV file is translated into a regex by compile_format_string(), which knows the
+components the CSV's format strings are made of -- YYYY, MM, DD, DDD, hh, mm, ss, and fractions of a second -- and
+gives them the same ranges of values the CSV's regexes do. Only a format string with something else in it, e.g., a
+month name, is unsupported.
+
+DateTimeValidator.match() matches a column's values all at once. Datetime columns tend to repeat values, e.g., the same
+date for many observations, so if a sample of the values has many repeats, only the distinct values are matched. The
+matches are memoized in the evaluation store (see eval_store.py), keyed by a hash of the values and the format's regex,
+so checking an unchanged table again, e.g., after an edit to the metadata of one of its other columns, doesn't match
+them again.
+"""
+
+import hashlib
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import webapp.home.utils.eval_store as eval_store
+from webapp.home.utils.subtree_digest import combine_digests
+
+
+# Columns with fewer values than this are matched without consulting the evaluation store, since matching them costs
+#  less than looking them up.
+MEMO_MIN_VALUES = 10000
+# The number of values sampled to see whether a column has enough repeats to be worth matching only its distinct values
+REPEATS_SAMPLE_SIZE = 1000
+
+# The regexes for the components of format strings, as in dateTimeFormatString_regex.csv
+_COMPONENT_REGEXES = {
+    'YYYY': r'\d\d\d\d',
+    'MM': r'(?:01|02|03|04|05|06|07|08|09|10|11|12)',
+    'DD': r'(?:0[1-9]|[1-2]\d|30|31)',
+    'DDD': r'[0-3]\d\d',
+    'hh': r'(?:[0-1]\d|2[0-4])',
+    'mm': r'[0-5]\d',
+    'ss': r'[0-5]\d',
+}
+# Letters that stand for themselves in format strings, as in 1976-09-23T11:11:11Z
+_LITERAL_LETTERS = 'TZ'
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def compile_format_string(format_string):
+    """
+    Return a regex for the values that have the form given by a format string, or None if the format string has a
+    component we don't recognize.
+    """
+    if not format_string:
+        return None
+    parts = []
+    # A component is a run of a repeated letter, e.g., YYYY, or any other character.
+    for component in [m.group(0) for m in re.finditer(r'([A-Za-z])\1*|.', format_string, flags=re.DOTALL)]:
+        if component[0] == 's' and parts and parts[-1] == re.escape('.'):
+            # A fraction of a second, with as many digits as there are s's
+            parts.append(r'\d' * len(component))
+        elif component in _COMPONENT_REGEXES:
+            parts.append(_COMPONENT_REGEXES[component])
+        elif component in _LITERAL_LETTERS or not component.isalpha():
+            parts.append(re.escape(component))
+        else:
+            return None
+    return ''.join(parts)
+
+
+class DateTimeValidator:
+    """ Matches the values in a column against the regex for a datetime format string. """
+
+    def __init__(self, format_string, regex):
+        self.format_string = format_string
+        # The regex must match the whole value, so anchors are redundant.
+        if regex.startswith('^'):
+            regex = regex[1:]
+        if regex.endswith('$') and not regex.endswith('\\$'):
+            regex = regex[:-1]
+        self.regex = regex
+        self.pattern = re.compile(regex)
+
+    def match(self, col_values):
+        """ Return a boolean Series indicating whether each value in a Series of strings has the expected form. """
+        if len(col_values) < MEMO_MIN_VALUES:
+            return self._match(col_values)
+        values = col_values.tolist()
+        digest = hashlib.md5('\x00'.join(values).encode('utf-8', 'surrogatepass')).hexdigest()
+        key = combine_digests('date time matches', self.regex, len(values), digest)
+        packed = eval_store.get(key)
+        if packed is not None:
+            matches = np.unpackbits(packed, count=len(values)).astype(bool)
+            return pd.Series(matches, index=col_values.index)
+        matches = self._match(col_values)
+        eval_store.put_many([(key, np.packbits(matches.to_numpy()))])
+        return matches
+
+    def _match(self, col_values):
+        sample = col_values.iloc[:REPEATS_SAMPLE_SIZE]
+        if len(col_values) > REPEATS_SAMPLE_SIZE and sample.nunique() <= len(sample) * 3 // 4:
+            codes, uniques = pd.factorize(col_values)
+            unique_matches = pd.Series(uniques, dtype=str).str.fullmatch(self.pattern).to_numpy(dtype=bool)
+            return pd.Series(unique_matches[codes], index=col_values.index)
+        return col_values.str.fullmatch(self.pattern).astype(bool)
+
+
+def get_validator(format_string, regex=None):
+    """
+    Return the validator for a format string. regex is the format's regex from dateTimeFormatString_regex.csv. If the
+    format string isn't in the CSV file, regex is None and the format string is compiled into a regex instead. If that
+    isn't possible, return None.
+    """
+    key = (format_string, regex)
+    with _registry_lock:
+        if key in _registry:
+            return _registry[key]
+    if not regex:
+        regex = compile_format_string(format_string)
+    validator = DateTimeValidator(format_string, regex) if regex else None
+    with _registry_lock:
+        _registry[key] = validator
+    return validator
@@ -0,0 +1,99 @@
+"""
+Small per-document metadata record, kept next to the document's JSON file.
+
+For user-data/foo/bar.json, the record is user-data/foo/.bar.meta. It is a JSON dict that records bookkeeping facts
+about the document's files, e.g., the identity of the JSON file from which the XML file was last generated. It's
+deliberately tiny, so reading it is cheap compared to reading the document itself.
+
+It also records the fingerprint of the document's content: the MD5 hash of the JSON text, computed by save_eml() from
+the text it has just serialized, together with the identity (mtime_ns, size, inode) of the JSON file that was written.
+get_fingerprint() can then tell whether a document has changed with a stat and a small read, rather than by reading and
+hashing the whole JSON file. This is what the Check Metadata memo (and the model sidecar) use to decide whether they
+are current.
+
+The record is advisory: if it's missing or unreadable, callers must behave as if nothing were known, i.e., recompute
+whatever it would have told them. Writes are atomic and are expected to be made while holding the document's write
+lock (see file_utils.document_write_lock()).
+"""
+
+import hashlib
+import json
+import os
+
+import webapp.home.utils.file_utils as file_utils
+from webapp.home.utils.model_cache import file_identity
+
+
+META_FILE_SUFFIX = '.meta'
+
+
+def meta_pathname(json_pathname):
+    """ Return the pathname of the metadata record for the document whose JSON file is at json_pathname. """
+    dirname, basename = os.path.split(json_pathname)
+    return os.path.join(dirname, f'.{file_utils.document_root(basename)}{META_FILE_SUFFIX}')
+
+
+def read_meta(json_pathname):
+    """ Return the metadata record as a dict. Returns an empty dict if there is no usable record. """
+    try:
+        with open(meta_pathname(json_pathname), 'r') as f:
+            meta = json.load(f)
+        if isinstance(meta, dict):
+            return meta
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def update_meta(json_pathname, **kwargs):
+    """ Update the given fields of the metadata record, leaving other fields as they are. """
+    meta = read_meta(json_pathname)
+    meta.update(kwargs)
+    file_utils.atomic_write(meta_pathname(json_pathname), json.dumps(meta))
+    return meta
+
+
+def content_fingerprint(json_text):
+    """ Return the fingerprint of a document's JSON text, which may be str or bytes: its MD5 hex digest. """
+    if isinstance(json_text, str):
+        json_text = json_text.encode('utf-8')
+    return hashlib.md5(json_text).hexdigest()
+
+
+def fingerprint_fields(fingerprint, json_identity):
+    """ Return the fields that record the fingerprint of the JSON file with the given identity, for update_meta(). """
+    return {'fingerprint': fingerprint, 'json_identity': list(json_identity)}
+
+
+def get_fingerprint(json_pathname):
+    """
+    Return the fingerprint of the current content of the JSON file at json_pathname, or None if there's no such file.
+
+    Normally, this is just a stat and a read of the metadata record. If the record doesn't describe the file as it is
+    now (e.g., the document predates the record, or the file was written by something other than save_eml()), we hash
+    the file and record the result, so we only have to do that once.
+
+    Must not be called while holding the document's write lock.
+    """
+    identity = file_identity(json_pathname)
+    if identity is None:
+        return None
+    meta = read_meta(json_pathname)
+    if meta.get('fingerprint') and meta.get('json_identity') == list(identity):
+        return meta['fingerprint']
+    try:
+        with open(json_pathname, 'rb') as f:
+            fingerprint = content_fingerprint(f.read())
+    except OSError:
+        return None
+    with file_utils.document_write_lock(json_pathname):
+        if file_identity(json_pathname) == identity:
+            update_meta(json_pathname, **fingerprint_fields(fingerprint, identity))
+    return fingerprint
+
+
+def remove_meta(json_pathname):
+    try:
+        os.remove(meta_pathname(json_pathname))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,155 @@
+"""
+Durable queue of Check Metadata evaluations for the evaluation worker (see webapp/home/eval_worker.py).
+
+When Config.EVALUATION_WORKER is True, requests don't evaluate a document whose evaluation isn't memoized. Instead,
+they enqueue a job -- "evaluate document X at fingerprint F" -- and show the last known status. The worker takes jobs
+off the queue, evaluates the documents, and memoizes the results, so the next request finds them.
+
+The queue is a SQLite table in user-data/__db/evaluation_queue.sqlite3, so it survives restarts and is shared by all
+of the app's processes. There's at most one job per document: enqueuing a job for a document that already has one
+for other content replaces it, since only the latest content matters. Enqueuing a job for the same content leaves the
+job as it is, whether or not a worker has claimed it. A job that's been claimed by a worker is removed only if it's
+still for the fingerprint the worker evaluated, so a save made while the worker is busy gets evaluated, too. If a
+worker dies holding a job, the job is claimed again after CLAIM_TIMEOUT seconds, up to MAX_ATTEMPTS times.
+
+A job that has used up its attempts is kept, but is never claimed again, so that the pages that keep asking for the
+same content to be evaluated don't start it over. It's replaced when the document is saved with new content.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from webapp.config import Config
+from webapp.home.home_utils import log_error
+
+
+QUEUE_FILENAME = 'evaluation_queue.sqlite3'
+# Seconds after which a claimed job that hasn't been completed is presumed abandoned
+CLAIM_TIMEOUT = 300
+# Number of times a job is claimed before we give up on it
+MAX_ATTEMPTS = 3
+
+EvaluationJob = namedtuple('EvaluationJob', ['json_filename', 'doc_name', 'uploads_folder', 'fingerprint', 'attempts'])
+
+_local = threading.local()
+
+
+def queue_pathname():
+    return os.path.join(Config.USER_DATA_DIR, '__db', QUEUE_FILENAME)
+
+
+def worker_enabled():
+    return getattr(Config, 'EVALUATION_WORKER', False)
+
+
+def _connection():
+    # Connections can't be shared across a fork, so each process (and each thread) opens its own.
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'pid', None) == os.getpid():
+        return conn
+    pathname = queue_pathname()
+    os.makedirs(os.path.dirname(pathname), exist_ok=True)
+    conn = sqlite3.connect(pathname, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                 'json_filename TEXT PRIMARY KEY, doc_name TEXT NOT NULL, uploads_folder TEXT, '
+                 'fingerprint TEXT NOT NULL, enqueued_at REAL NOT NULL, claimed_at REAL, '
+                 'attempts INTEGER NOT NULL DEFAULT 0)')
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_enqueued_at ON jobs (enqueued_at)')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+def enqueue(json_filename, doc_name, uploads_folder, fingerprint):
+    """
+    Ask for the document to be evaluated at the given fingerprint. Returns True if the job is queued, which it already
+    may have been.
+    """
+    try:
+        conn = _connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT fingerprint FROM jobs WHERE json_filename = ?', (json_filename,)).fetchone()
+            if row and row[0] == fingerprint:
+                # Replacing the job would make it claimable again if a worker has it, and would reset its attempts.
+                return True
+            conn.execute('INSERT OR REPLACE INTO jobs (json_filename, doc_name, uploads_folder, fingerprint, '
+                         'enqueued_at, claimed_at, attempts) VALUES (?, ?, ?, ?, ?, NULL, 0)',
+                         (json_filename, doc_name, uploads_folder, fingerprint, time.time()))
+        return True
+    except Exception as e:
+        log_error(f'eval_queue.enqueue: {json_filename}: {e}')
+        return False
+
+
+def is_pending(json_filename, fingerprint):
+    """
+    Return True if there's a job for the document at the given fingerprint that hasn't been completed and hasn't been
+    given up on.
+    """
+    try:
+        row = _connection().execute('SELECT 1 FROM jobs WHERE json_filename = ? AND fingerprint = ? '
+                                    'AND (attempts < ? OR claimed_at >= ?)',
+                                    (json_filename, fingerprint, MAX_ATTEMPTS, time.time() - CLAIM_TIMEOUT)).fetchone()
+        return row is not None
+    except Exception as e:
+        log_error(f'eval_queue.is_pending: {json_filename}: {e}')
+        return False
+
+
+def claim():
+    """ Claim the oldest job that's waiting, or was abandoned by a worker. Returns the EvaluationJob, or None. """
+    now = time.time()
+    try:
+        conn = _connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Jobs that have failed too many times are given up on.
+            row = conn.execute('SELECT json_filename, doc_name, uploads_folder, fingerprint, attempts FROM jobs '
+                               'WHERE attempts < ? AND (claimed_at IS NULL OR claimed_at < ?) '
+                               'ORDER BY enqueued_at LIMIT 1',
+                               (MAX_ATTEMPTS, now - CLAIM_TIMEOUT)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE jobs SET claimed_at = ?, attempts = attempts + 1 WHERE json_filename = ?',
+                         (now, row[0]))
+        return EvaluationJob(*row[:4], row[4] + 1)
+    except Exception as e:
+        log_error(f'eval_queue.claim: {e}')
+        return None
+
+
+def complete(job:EvaluationJob):
+    """ Remove the job, unless it's been replaced by a job for newer content. """
+    try:
+        with _connection() as conn:
+            conn.execute('DELETE FROM jobs WHERE json_filename = ? AND fingerprint = ?',
+                         (job.json_filename, job.fingerprint))
+    except Exception as e:
+        log_error(f'eval_queue.complete: {job.json_filename}: {e}')
+
+
+def release(job:EvaluationJob):
+    """
+    Put a claimed job back on the queue, e.g., after a failure. If it's used up its attempts, it stays on the queue
+    but isn't claimed again.
+    """
+    try:
+        with _connection() as conn:
+            conn.execute('UPDATE jobs SET claimed_at = NULL WHERE json_filename = ? AND fingerprint = ?',
+                         (job.json_filename, job.fingerprint))
+    except Exception as e:
+        log_error(f'eval_queue.release: {job.json_filename}: {e}')
+
+
+def queue_length():
+    """ Return the number of jobs that haven't been given up on. """
+    try:
+        return _connection().execute('SELECT COUNT(*) FROM jobs WHERE attempts < ?', (MAX_ATTEMPTS,)).fetchone()[0]
+    except Exception as e:
+        log_error(f'eval_queue.queue_length: {e}')
+        return 0
@@ -0,0 +1,175 @@
+"""
+Store for Check Metadata evaluation results, shared by all of the app's processes.
+
+Evaluation results used to be memoized in a pickle file next to each document (foo_eval.pkl for foo.json), which each
+uWSGI worker read independently, and which GC had to tidy up. Now they're kept in a single SQLite database,
+user-data/__db/evaluations.sqlite3, in WAL mode, so readers don't block each other or the writer.
+
+The store maps keys to pickled values. The keys are digests computed by check_metadata.py from the content being
+evaluated and the version of the evaluation rules. A section's results include links to the document's pages, so its
+key also includes the document's name, and the digests of its content include node ids. Results are reused when a
+section of a document is unchanged, e.g., when another section of it is edited, but not across documents. Entries
+are never invalidated, since a change in content means a different key. Instead, the store's size is bounded by
+Config.EVALUATION_STORE_MAX_MB, and the least recently used entries are evicted when it's exceeded.
+
+The store is only a cache. If it can't be opened or an operation fails, the error is logged and callers see a miss.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from webapp.config import Config
+from webapp.home.home_utils import log_error
+
+
+STORE_FILENAME = 'evaluations.sqlite3'
+DEFAULT_MAX_MB = 256
+# How many puts a process makes between checks of the store's size
+EVICTION_CHECK_INTERVAL = 32
+# When the store is too big, evict entries until it's down to this fraction of the maximum
+EVICTION_TARGET = 0.8
+# Don't bother recording a hit on an entry if it was last used less than this many seconds ago
+TOUCH_INTERVAL = 60
+
+_local = threading.local()
+_puts_since_check = 0
+_stats = {'hits': 0, 'misses': 0, 'puts': 0, 'evictions': 0, 'errors': 0}
+
+
+def store_pathname():
+    return os.path.join(Config.USER_DATA_DIR, '__db', STORE_FILENAME)
+
+
+def _max_bytes():
+    return getattr(Config, 'EVALUATION_STORE_MAX_MB', DEFAULT_MAX_MB) * 1024 * 1024
+
+
+def _connection():
+    # Connections can't be shared across a fork, so each process (and each thread) opens its own.
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'pid', None) == os.getpid():
+        return conn
+    pathname = store_pathname()
+    os.makedirs(os.path.dirname(pathname), exist_ok=True)
+    conn = sqlite3.connect(pathname, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                 'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+    conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+def _error(operation, e):
+    _stats['errors'] += 1
+    log_error(f'eval_store.{operation}: {e}')
+
+
+def get_many(keys):
+    """ Return a dict giving the stored value for each of the keys that's in the store. """
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    if not keys:
+        return found
+    now = time.time()
+    try:
+        conn = _connection()
+        to_touch = []
+        # SQLite limits the number of parameters in a statement
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(f'SELECT key, value, last_used FROM entries WHERE key IN ({",".join("?" * len(chunk))})',
+                                chunk).fetchall()
+            for key, value, last_used in rows:
+                try:
+                    found[key] = pickle.loads(value)
+                except Exception as e:
+                    _error('get_many', e)
+                    continue
+                if now - last_used > TOUCH_INTERVAL:
+                    to_touch.append((now, key))
+        if to_touch:
+            conn.executemany('UPDATE entries SET last_used = ? WHERE key = ?', to_touch)
+    except Exception as e:
+        _error('get_many', e)
+    _stats['hits'] += len(found)
+    _stats['misses'] += len(keys) - len(found)
+    return found
+
+
+def get(key, default=None):
+    return get_many([key]).get(key, default)
+
+
+def put_many(items):
+    """ Store the given values. items is a dict, or an iterable of (key, value) pairs. """
+    global _puts_since_check
+    if isinstance(items, dict):
+        items = items.items()
+    now = time.time()
+    try:
+        rows = []
+        for key, value in items:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((key, blob, len(blob), now))
+        if not rows:
+            return
+        conn = _connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)', rows)
+        _stats['puts'] += len(rows)
+        _puts_since_check += len(rows)
+        if _puts_since_check >= EVICTION_CHECK_INTERVAL:
+            _puts_since_check = 0
+            evict()
+    except Exception as e:
+        _error('put_many', e)
+
+
+def put(key, value):
+    put_many([(key, value)])
+
+
+def evict(max_bytes=None):
+    """ If the store is bigger than max_bytes, evict the least recently used entries. Returns the number evicted. """
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+    evicted = 0
+    try:
+        conn = _connection()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        target = max_bytes * EVICTION_TARGET
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('SELECT key, size FROM entries ORDER BY last_used').fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+        evicted = len(doomed)
+        _stats['evictions'] += evicted
+    except Exception as e:
+        _error('evict', e)
+    return evicted
+
+
+def store_stats():
+    """ Return this process's counts of hits, misses, puts, evictions, and errors, and the store's size. """
+    stats = dict(_stats)
+    try:
+        stats['entries'], stats['bytes'] = _connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+    except Exception as e:
+        _error('store_stats', e)
+    return stats
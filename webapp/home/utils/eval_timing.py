@@ -0,0 +1,74 @@
+"""
+Timing of the stages of a Check Metadata evaluation.
+
+evaluate_document() times each stage of an evaluation: the scan of the model, the metapype validation and evaluation
+shared by the rule groups, each rule group (section) that's run, the parsing and validation of the XML, and the
+memoizing of the results. The timings are logged if Config.LOG_EVALUATION_TIMINGS is True.
+
+To get a breakdown for a given document without a profiler, see the eval_timings.py script at the top of the repo.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import re
+import time
+
+from webapp.config import Config
+from webapp.home.home_utils import log_info
+
+
+TOTAL_TIMING_KEY = 'total'
+
+
+class EvaluationTimer:
+    """ Accumulates the time spent in each stage of an evaluation, in the order in which the stages are first seen. """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name:str, seconds:float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def finish(self):
+        """ Record the total elapsed time and return the timings. """
+        self.timings[TOTAL_TIMING_KEY] = time.perf_counter() - self._start
+        return self.timings
+
+
+def stage_group(name:str):
+    """
+    Return the name under which a stage is aggregated: sections for individual data tables and other entities are
+    named for their node ids, so they're grouped together.
+    """
+    return re.sub(r' \S+$', '', name) if name.startswith(('data_table ', 'other_entity ')) else name
+
+
+def record_timings(timings:dict, filename:str=None):
+    """ Log the timings if Config.LOG_EVALUATION_TIMINGS is True. """
+    if getattr(Config, 'LOG_EVALUATION_TIMINGS', False):
+        log_evaluation_timings(timings, filename)
+
+
+def grouped_timings(timings:dict):
+    """ Return the timings with the stages for individual data tables and other entities added together. """
+    grouped = OrderedDict()
+    for name, seconds in timings.items():
+        group = stage_group(name)
+        grouped[group] = grouped.get(group, 0.0) + seconds
+    return grouped
+
+
+def log_evaluation_timings(timings:dict, filename:str=None):
+    total = timings.get(TOTAL_TIMING_KEY, sum(timings.values()))
+    details = ', '.join(f'{name}: {elapsed * 1000:.1f}' for name, elapsed in grouped_timings(timings).items()
+                        if name != TOTAL_TIMING_KEY)
+    log_info(f'evaluation of {filename}: {total * 1000:.1f} ms ({details})')
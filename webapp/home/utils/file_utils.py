@@ -1,6 +1,13 @@
+from contextlib import contextmanager
+import fcntl
+import os
 import re
+import tempfile
 import unicodedata
 
+# Suffix of the temp files written by atomic_write(). Leftovers from killed processes are removed by gc.py.
+TEMP_FILE_SUFFIX = '.tmp'
+
 def sanitize_filename(value):
     """
     Sanitize a string to make it safe for use as a filename.
@@ -28,3 +35,79 @@ def sanitize_filename(value):
     value = value.strip('_')
 
     return value
+
+
+def document_root(basename):
+    """
+    Return the name of a document given the basename of one of its files, e.g., site.v2 for site.v2.json. Only the
+    .json and .xml extensions are stripped, since a document's name may itself contain dots.
+    """
+    for extension in ('.json', '.xml'):
+        if basename.endswith(extension):
+            return basename[:-len(extension)]
+    return basename
+
+
+def document_lock_pathname(pathname):
+    """
+    Return the pathname of the lock file for a document. E.g., for user-data/foo/bar.json, the lock file is
+    user-data/foo/.bar.lock. The JSON and XML files for a document share a single lock file.
+    """
+    dirname, basename = os.path.split(pathname)
+    return os.path.join(dirname, f'.{document_root(basename)}.lock')
+
+
+@contextmanager
+def document_write_lock(pathname):
+    """
+    Hold an exclusive lock on a document while its files are being written.
+
+    The lock is an flock() on the document's lock file, so it is respected by all of the uWSGI worker processes, not
+    just by threads within a process. The lock is released when the block exits, or if the process dies.
+    """
+    lock_pathname = document_lock_pathname(pathname)
+    with open(lock_pathname, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(pathname, text):
+    """
+    Write text (str or bytes) to pathname so that readers see either the old contents or the new contents, never a
+    partial file.
+
+    The text is written to a temp file in the same directory, which is flushed and fsync'ed and then renamed over the
+    target. If the process is killed partway through, the target is left untouched and only the temp file remains.
+    """
+    dirname, basename = os.path.split(pathname)
+    fd, temp_pathname = tempfile.mkstemp(dir=dirname or '.', prefix=f'.{basename}.', suffix=TEMP_FILE_SUFFIX)
+    # mkstemp creates the file readable only by its owner. Keep the permissions the target would have had.
+    try:
+        mode = os.stat(pathname).st_mode & 0o777
+    except OSError:
+        mode = 0o644
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(text, bytes) else 'w') as fh:
+            os.fchmod(fh.fileno(), mode)
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temp_pathname, pathname)
+    except BaseException:
+        try:
+            os.remove(temp_pathname)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable.
+    try:
+        dir_fd = os.open(dirname or '.', os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
@@ -0,0 +1,154 @@
+"""
+Framework for the fixups that are applied to a model each time it's saved.
+
+save_both_formats() applies a number of fixups to the model before saving it: clean_model(), fix_up_custom_units(),
+add_qudt_annotations(), etc. Formerly, each of them walked the whole tree, or called find_all_descendants() one or
+more times, so the cost of a save grew with the number of fixups. Now each fixup is a Fixup subclass that names the
+nodes it's interested in, and run_fixups() walks the tree just once, handing each node to the fixups that asked for
+it. After the walk, each fixup's finish() method is called, in the order in which the fixups were given.
+
+The rules for writing a fixup:
+  - visit() is called during the walk. It may change a node's content, attributes, or nsmap, but must not add,
+    remove, or reorder nodes. Typically, it just collects the nodes the fixup needs.
+  - Structural changes are made in finish(). The finish() methods are called in order, so when a fixup looks at the
+    tree in finish(), e.g., with find_child(), it sees the changes made by the finish() methods that precede it.
+  - But the nodes handed to visit() are those that were in the tree during the walk. A node created by a preceding
+    fixup's finish() -- e.g., the measurementScale children that CategoricalVariablesFixup creates -- is never
+    visited, and all of the visit() calls are made before any finish() is. So a fixup must not depend on seeing nodes
+    created or changed by the fixups before it, unless it finds them itself in finish(). tests/test_save_fixups.py
+    checks that save_both_formats()'s fixups give the same model as applying them one walk at a time.
+  - A node collected during the walk may since have been removed by a preceding fixup. Fixups remove nodes via
+    FixupRun.remove(), and skip nodes for which FixupRun.is_live() returns False.
+
+run_fixups() returns the time spent in each fixup, so we can see where the time goes when saving large packages.
+If Config.LOG_SAVE_FIXUP_TIMINGS is True, save_both_formats() logs them.
+"""
+
+from collections import OrderedDict
+import time
+
+from metapype.model.node import Node
+
+from webapp.home.home_utils import log_info
+
+
+# Value of Fixup.node_names for fixups that want to visit every node
+ALL_NODES = None
+
+WALK_TIMING_KEY = '(walk)'
+
+
+class Fixup:
+    """
+    Base class for fixups. Subclasses set name and node_names and override visit() and/or finish().
+    """
+    name = ''
+    node_names = ()
+
+    def visit(self, node:Node, run:'FixupRun'):
+        pass
+
+    def finish(self, eml_node:Node, run:'FixupRun'):
+        pass
+
+
+class FixupRun:
+    """
+    State shared by the fixups during a run: the root of the model, the nodes removed so far, and the timings.
+    """
+    def __init__(self, eml_node:Node):
+        self.eml_node = eml_node
+        self.removed = set()
+        self.timings = OrderedDict()
+
+    def remove(self, node:Node):
+        """ Remove the node from its parent and remember that it's gone. """
+        if node and node.parent:
+            node.parent.remove_child(node)
+            self.removed.add(node.id)
+
+    def is_live(self, node:Node):
+        """ Return True iff neither the node nor any of its ancestors has been removed during this run. """
+        while node is not None:
+            if node.id in self.removed:
+                return False
+            node = node.parent
+        return True
+
+
+def find_ancestor(node:Node, name:str):
+    """ Return the nearest ancestor of node with the given name, or None. """
+    node = node.parent
+    while node is not None:
+        if node.name == name:
+            return node
+        node = node.parent
+    return None
+
+
+def has_lineage(node:Node, path:list):
+    """
+    Return True iff the node's lineage, from the root down, matches path. I.e., the test made by
+    find_all_nodes_by_path(path) when called on the root.
+    """
+    for name in reversed(path):
+        if node is None or node.name != name:
+            return False
+        node = node.parent
+    return node is not None and node.parent is None
+
+
+def run_fixups(eml_node:Node, fixups:list):
+    """
+    Apply the fixups to the model, walking the tree just once. Returns an OrderedDict giving the time, in seconds,
+    spent in each fixup, keyed by fixup name. The WALK_TIMING_KEY entry gives the time spent walking the tree,
+    exclusive of the time spent in the fixups' visit() methods.
+    """
+    run = FixupRun(eml_node)
+    if not eml_node:
+        return run.timings
+
+    dispatch = {}
+    visit_all = []
+    for fixup in fixups:
+        run.timings[fixup.name] = 0.0
+        if fixup.node_names is ALL_NODES:
+            visit_all.append(fixup)
+        else:
+            for node_name in fixup.node_names:
+                dispatch.setdefault(node_name, []).append(fixup)
+
+    timings = run.timings
+    perf_counter = time.perf_counter
+    walk_start = perf_counter()
+    visit_time = 0.0
+    stack = [eml_node]
+    while stack:
+        node = stack.pop()
+        for fixup in dispatch.get(node.name, ()):
+            start = perf_counter()
+            fixup.visit(node, run)
+            elapsed = perf_counter() - start
+            timings[fixup.name] += elapsed
+            visit_time += elapsed
+        for fixup in visit_all:
+            start = perf_counter()
+            fixup.visit(node, run)
+            elapsed = perf_counter() - start
+            timings[fixup.name] += elapsed
+            visit_time += elapsed
+        # Push the children in reverse so they're visited in document order, as find_all_descendants() does.
+        stack.extend(reversed(node.children))
+    timings[WALK_TIMING_KEY] = perf_counter() - walk_start - visit_time
+
+    for fixup in fixups:
+        start = perf_counter()
+        fixup.finish(eml_node, run)
+        timings[fixup.name] += perf_counter() - start
+    return timings
+
+
+def log_fixup_timings(timings:dict, filename:str=None):
+    total = sum(timings.values())
+    details = ', '.join(f'{name}: {elapsed * 1000:.1f}' for name, elapsed in timings.items())
+    log_info(f'save fixups for {filename}: {total * 1000:.1f} ms ({details})')
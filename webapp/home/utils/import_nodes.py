@@ -92,15 +92,23 @@ def import_responsible_parties(target_package, node_ids_to_import, target_class)
     load_and_save.save_both_formats(target_package, target_eml_node, owner_login=owner_login)
 
 
-def consolidate_keyword_sets(eml_node):
+def consolidate_keyword_sets(eml_node, keyword_set_nodes=None, keyword_nodes=None):
+    """
+    Collect keywords for a given thesaurus into a single keywordSet node.
+    If the caller has already collected the keywordSet and keyword nodes, in document order, it passes them in.
+    """
     dataset_node = eml_node.find_child(names.DATASET)
     # Collect keywords for a given thesaurus into a single keywordSet node.
     # First, create a dict of keywords, keyed by thesaurus.
     keyword_dict = OrderedDict()
-    original_keyword_set_nodes = []
-    eml_node.find_all_descendants(names.KEYWORDSET, original_keyword_set_nodes)
-    keywords = []
-    eml_node.find_all_descendants(names.KEYWORD, keywords)
+    if keyword_set_nodes is None:
+        keyword_set_nodes = []
+        eml_node.find_all_descendants(names.KEYWORDSET, keyword_set_nodes)
+    original_keyword_set_nodes = keyword_set_nodes
+    if keyword_nodes is None:
+        keyword_nodes = []
+        eml_node.find_all_descendants(names.KEYWORD, keyword_nodes)
+    keywords = keyword_nodes
     for keyword in keywords:
         thesaurus_node = keyword.parent.find_child(names.KEYWORDTHESAURUS)
         if thesaurus_node:
@@ -22,6 +22,7 @@ from webapp.home.texttype_node_processing import excerpt_text
 from webapp.home.utils.import_nodes import compose_rp_label
 from webapp.home.utils.template_management import is_authorized_to_manage_templates
 from webapp.home.check_metadata import init_evaluation, format_tooltip
+import webapp.home.utils.node_index as node_index
 
 NO_OP = ''
 UP_ARROW = html.unescape('&#x2B06;')
@@ -174,7 +175,7 @@ def list_data_table_columns(dt_node:Node=None):
     dt_columns_list = []
     if dt_node:
         attribute_name_nodes = []
-        dt_node.find_all_descendants(names.ATTRIBUTENAME, attribute_name_nodes)
+        node_index.find_all_descendants(dt_node, names.ATTRIBUTENAME, attribute_name_nodes)
         for attribute_name_node in attribute_name_nodes:
             dt_columns_list.append([attribute_name_node.id, attribute_name_node.content])
     return dt_columns_list
@@ -233,7 +234,7 @@ def compose_entity_label(entity_node:Node=None):
         entity_name_node = entity_node.find_child(names.ENTITYNAME)
         if entity_name_node:
             label = entity_name_node.content
-        object_name_node = entity_node.find_descendant(names.OBJECTNAME)
+        object_name_node = node_index.find_descendant(entity_node, names.OBJECTNAME)
         if object_name_node:
             object_name = object_name_node.content
     return label, object_name
@@ -470,9 +471,9 @@ def compose_gc_label(gc_node:Node=None):
             ebc_node = bc_node.find_child(names.EASTBOUNDINGCOORDINATE)
             nbc_node = bc_node.find_child(names.NORTHBOUNDINGCOORDINATE)
             sbc_node = bc_node.find_child(names.SOUTHBOUNDINGCOORDINATE)
-            amin_node = bc_node.find_descendant(names.ALTITUDEMINIMUM)
-            amax_node = bc_node.find_descendant(names.ALTITUDEMAXIMUM)
-            aunits_node = bc_node.find_descendant(names.ALTITUDEUNITS)
+            amin_node = node_index.find_descendant(bc_node, names.ALTITUDEMINIMUM)
+            amax_node = node_index.find_descendant(bc_node, names.ALTITUDEMAXIMUM)
+            aunits_node = node_index.find_descendant(bc_node, names.ALTITUDEUNITS)
             if wbc_node and ebc_node and nbc_node and sbc_node:
                 coordinate_list = [str(wbc_node.content),
                                    str(ebc_node.content),
@@ -850,7 +851,7 @@ def list_keywords(eml_node:Node=None):
 
     def get_sorted_keywords(eml_node):
         keywords = []
-        keyword_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.KEYWORDSET, names.KEYWORD])
+        keyword_nodes = node_index.find_all_nodes_by_path(eml_node, [names.DATASET, names.KEYWORDSET, names.KEYWORD])
         for keyword_node in keyword_nodes:
             keyword_set = keyword_node.parent
             thesaurus_node = keyword_set.find_child(names.KEYWORDTHESAURUS)
@@ -2,6 +2,7 @@
 Helper functions for loading and saving EML documents.
 """
 
+from collections import OrderedDict
 import json
 import os
 import pickle
@@ -11,7 +12,14 @@ from urllib.parse import urlencode, urlparse, quote, unquote
 from flask import flash, request, session
 from flask_login import current_user
 
+import webapp.home.utils.data_table_settings as data_table_settings
+import webapp.home.utils.document_meta as document_meta
+import webapp.home.utils.file_utils as file_utils
+import webapp.home.utils.fixups as fixups
 import webapp.home.utils.import_nodes as import_nodes
+import webapp.home.utils.model_cache as model_cache
+import webapp.home.utils.model_sidecar as model_sidecar
+import webapp.home.utils.node_index as node_index
 import webapp.home.utils.node_utils as node_utils
 import webapp.home.utils.qudt_annotations as qudt_annotations
 
@@ -87,6 +95,14 @@ def from_json(filename):
     return eml_node
 
 
+def load_model_file(json_pathname):
+    """
+    Load the model from the JSON file at json_pathname, via the document's binary sidecar if it's current.
+    See model_sidecar.py.
+    """
+    return model_sidecar.load_model(json_pathname, from_json)
+
+
 def save_package_id(eml_node):
     # There are various ways of opening a new package, and we want to ensure that no matter what path we took,
     #   the package ID is updated in the current user's user_data.
@@ -201,7 +217,10 @@ def load_eml(filename:str=None,
                                     owner_login=owner_login,
                                     log_the_details=log_the_details)
         if os.path.isfile(ext_filename):
-            eml_node = from_json(ext_filename)
+            # The cache hands back a private copy of the model, so it's safe for the caller to modify it.
+            eml_node = model_cache.get_model(ext_filename, load_model_file)
+            if log_the_details:
+                model_cache.log_cache_stats()
         else:
             log_error(f"load_eml: Could not find {ext_filename}")
             active_login = user_data.get_active_document_owner_login()
@@ -408,184 +427,173 @@ def enforce_public_read_access(eml_node:Node=None):
         public_permission_node.content = 'read'
 
 
-def clean_model(eml_node):
+class CleanModelFixup(fixups.Fixup):
     """
-    Perform various cleanups on the model. This is called when a model is saved. Its purpose is to deal with
+    Perform various cleanups on the model. This is applied when a model is saved. Its purpose is to deal with
     cases where an existing model has glitches due to earlier bugs or because we've changed how we're doing things
     or because the model was created outside of ezEML.
     """
-    if not eml_node:
-        return
-    try:
-        # There are some documents that have a spurious filename attribute, which gets propagated if the
-        #  document is copied via Save As. Clean it up.
-        eml_node.remove_attribute('filename')
-    except:
-        pass
-    enforce_public_read_access(eml_node)
-    # Some documents have, due to earlier bugs, empty publisher, pubPlace, or pubDate nodes
-    publisher_nodes = []
-    eml_node.find_all_descendants(names.PUBLISHER, publisher_nodes)
-    for publisher_node in publisher_nodes:
-        if len(publisher_node.children) == 0:
-            node_utils.remove_child(publisher_node)
-    pubplace_nodes = []
-    eml_node.find_all_descendants(names.PUBPLACE, pubplace_nodes)
-    for pubplace_node in pubplace_nodes:
-        if not pubplace_node.content:
-            node_utils.remove_child(pubplace_node)
-    pubdate_nodes = []
-    eml_node.find_all_descendants(names.PUBDATE, pubdate_nodes)
-    for pubdate_node in pubdate_nodes:
-        if not pubdate_node.content:
-            node_utils.remove_child(pubdate_node)
-    # Some documents have, due to earlier bugs, keywordSets that contain no keywords
-    keyword_sets = []
-    eml_node.find_all_descendants(names.KEYWORDSET, keyword_sets)
-    for keyword_set in keyword_sets:
-        keywords = keyword_set.find_all_children(names.KEYWORD)
-        if len(keywords) == 0:
-            node_utils.remove_child(keyword_set)
-    # Some documents have, due to earlier bugs, taxonomicCoverage nodes that contain no taxonomicClassification nodes
-    taxonomic_coverage_nodes = []
-    eml_node.find_all_descendants(names.TAXONOMICCOVERAGE, taxonomic_coverage_nodes)
-    for taxonomic_coverage_node in taxonomic_coverage_nodes:
-        taxonomic_classification_nodes = taxonomic_coverage_node.find_all_children(names.TAXONOMICCLASSIFICATION)
-        if len(taxonomic_classification_nodes) == 0:
-            node_utils.remove_child(taxonomic_coverage_node)
-    # Some documents lack the 'unit' attribute for the names.SIZE node
-    size_nodes = []
-    eml_node.find_all_descendants(names.SIZE, size_nodes)
-    for size_node in size_nodes:
-        size_node.add_attribute('unit', 'byte')
-    # Some documents have codes for categorical attributes that are ints, not strings
-    code_nodes = []
-    eml_node.find_all_descendants(names.CODE, code_nodes)
-    for code_node in code_nodes:
-        code = code_node.content
-        if isinstance(code, int):
-            code_node.content = str(code)
-    # Some documents have taxonIds that are ints, not strings
-    taxonid_nodes = []
-    eml_node.find_all_descendants(names.TAXONID, taxonid_nodes)
-    for taxonid_node in taxonid_nodes:
-        taxonid = taxonid_node.content
-        if isinstance(taxonid, int):
-            taxonid_node.content = str(taxonid)
-    # Some documents have an empty <funding> node. Remove it.
-    funding_nodes = []
-    to_remove = []
-    eml_node.find_all_descendants(names.FUNDING, funding_nodes)
-    for funding_node in funding_nodes:
-        if not funding_node.content and len(funding_node.children) == 0:
-            to_remove.append(funding_node)
-    for node in to_remove:
-        node_utils.remove_child(node)
-    # Some documents have a <distribution> node that contains only an empty <online> node. Remove it.
-    distribution_nodes = []
-    to_remove = []
-    eml_node.find_all_descendants(names.DISTRIBUTION, distribution_nodes)
-    for distribution_node in distribution_nodes:
-        online_nodes = distribution_node.find_all_children(names.ONLINE)
-        if len(online_nodes) == 1 and not online_nodes[0].content and len(online_nodes[0].children) == 0:
-            to_remove.append(distribution_node)
-    for node in to_remove:
-        node_utils.remove_child(node)
-
-    # Make sure all url elements for dataTable and otherEntity have the function="download" attribute
-    data_table_nodes = []
-    eml_node.find_all_descendants(names.DATATABLE, data_table_nodes)
-    for data_table_node in data_table_nodes:
-        url_nodes = []
-        data_table_node.find_all_descendants(names.URL, url_nodes)
-        for url_node in url_nodes:
-            url_node.add_attribute('function', 'download')
-    other_entity_nodes = []
-    eml_node.find_all_descendants(names.OTHERENTITY, other_entity_nodes)
-    for other_entity_node in other_entity_nodes:
-        url_nodes = []
-        other_entity_node.find_all_descendants(names.URL, url_nodes)
-        for url_node in url_nodes:
-            url_node.add_attribute('function', 'download')
-
-    # The EML standard permits multiple instrumentation nodes, but the ezEML UI does not.
-    # If there are multiple instrumentation nodes, we will compromise by putting the
-    # instrumentation content in a single node, separated by newlines. The other
-    # instrumentation nodes will be deleted.
-    method_step_nodes = []
-    eml_node.find_all_descendants(names.METHODSTEP, method_step_nodes)
-    for method_step_node in method_step_nodes:
-        instrumentation = ''
-        instrumentation_nodes = method_step_node.find_all_children(names.INSTRUMENTATION)
-        index = 0
-        for instrumentation_node in instrumentation_nodes:
-            if not null_string(instrumentation_node.content):
-                instrumentation += f"{instrumentation_node.content}\n"
-            if index > 0:
-                node_utils.remove_child(instrumentation_node)
-            index += 1
-        if instrumentation:
-            instrumentation_node = method_step_node.find_child(names.INSTRUMENTATION)
-            if instrumentation_node:
-                if instrumentation.endswith('\n'):
-                    instrumentation = instrumentation[:-1]
-                instrumentation_node.content = instrumentation
-
-    # ezEML and EAL both had a bug that caused the attributeDefinition value to be copied into the definition node that
-    #  is a child of the textDomain node. They should instead put "text" in that definition node.
-    text_domain_nodes = []
-    eml_node.find_all_descendants(names.TEXTDOMAIN, text_domain_nodes)
-    for text_domain_node in text_domain_nodes:
-        definition_node = text_domain_node.find_child(names.DEFINITION)
-        if definition_node:
-            definition_node.content = 'text'
-
-    # If a project node no longer has any children, remove it.
-    project_nodes = []
-    eml_node.find_all_descendants(names.PROJECT, project_nodes)
-    for project_node in project_nodes:
-        if not project_node.children:
-            project_node.parent.remove_child(project_node)
-
-    # If a bounds node has empty minimum/maximum elmeents, delete them. This sometimes happens with packages
-    #  created outside of ezEML.
-    bounds_nodes = []
-    eml_node.find_all_descendants(names.BOUNDS, bounds_nodes)
-    for bounds_node in bounds_nodes:
-        minimum_node = bounds_node.find_descendant(names.MINIMUM)
-        if minimum_node and not minimum_node.content:
-            minimum_node.parent.remove_child(minimum_node)
-        maximum_node = bounds_node.find_descendant(names.MAXIMUM)
-        if maximum_node and not maximum_node.content:
-            maximum_node.parent.remove_child(maximum_node)
-
-    # Fixup formatName fields to use mime types instead of file extensions.
-    # If we make a change, flash a message to the user.
-    other_entity_nodes = []
-    changed = False
-    eml_node.find_all_descendants(names.OTHERENTITY, other_entity_nodes)
-    for other_entity_node in other_entity_nodes:
-        format_name_node = other_entity_node.find_descendant(names.FORMATNAME)
-        if format_name_node:
-            object_name_node = other_entity_node.find_descendant(names.OBJECTNAME)
-            if object_name_node:
-                object_name = object_name_node.content
-                if object_name:
-                    old_content = format_name_node.content
-                    new_content = load_data.format_name_from_data_file(object_name)
-                    if new_content:
-                        format_name_node.content = new_content
-                    if old_content != format_name_node.content:
-                        changed = True
-    if changed:
-        flash("In one or more Other Entities, the Data Format field has been modified to use mime types.")
-
-    # Collect keywords for a given thesaurus into a single keywordSet node.
-    import_nodes.consolidate_keyword_sets(eml_node)
-
-    fixup_namespaces(eml_node)
-
-    fixup_distribution_urls(eml_node)
+    name = 'clean_model'
+    node_names = fixups.ALL_NODES
+
+    def __init__(self):
+        self.nodes = {name: [] for name in (
+            names.PUBLISHER,
+            names.PUBPLACE,
+            names.PUBDATE,
+            names.KEYWORDSET,
+            names.KEYWORD,
+            names.TAXONOMICCOVERAGE,
+            names.FUNDING,
+            names.DISTRIBUTION,
+            names.METHODSTEP,
+            names.PROJECT,
+            names.BOUNDS,
+            names.OTHERENTITY
+        )}
+        self.distribution_url_nodes = []
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        # Nodes generated in various ways have lacked the namespaces of the nodes around them. See fixup_namespaces().
+        if node.parent and not node.nsmap:
+            node.nsmap = node.parent.nsmap
+
+        name = node.name
+        collected = self.nodes.get(name)
+        if collected is not None:
+            collected.append(node)
+        elif name == names.SIZE:
+            # Some documents lack the 'unit' attribute for the names.SIZE node
+            node.add_attribute('unit', 'byte')
+        elif name in (names.CODE, names.TAXONID):
+            # Some documents have codes for categorical attributes, or taxonIds, that are ints, not strings
+            if isinstance(node.content, int):
+                node.content = str(node.content)
+        elif name == names.URL:
+            # Make sure all url elements for dataTable and otherEntity have the function="download" attribute
+            if fixups.find_ancestor(node, names.DATATABLE) or fixups.find_ancestor(node, names.OTHERENTITY):
+                node.add_attribute('function', 'download')
+            if fixups.has_lineage(node, DATA_TABLE_URL_PATH) or fixups.has_lineage(node, OTHER_ENTITY_URL_PATH):
+                self.distribution_url_nodes.append(node)
+        elif name == names.TEXTDOMAIN:
+            # ezEML and EAL both had a bug that caused the attributeDefinition value to be copied into the definition
+            #  node that is a child of the textDomain node. They should instead put "text" in that definition node.
+            definition_node = node.find_child(names.DEFINITION)
+            if definition_node:
+                definition_node.content = 'text'
+
+    def live_nodes(self, name, run:fixups.FixupRun):
+        return [node for node in self.nodes[name] if run.is_live(node)]
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
+        try:
+            # There are some documents that have a spurious filename attribute, which gets propagated if the
+            #  document is copied via Save As. Clean it up.
+            eml_node.remove_attribute('filename')
+        except:
+            pass
+        enforce_public_read_access(eml_node)
+        # Some documents have, due to earlier bugs, empty publisher, pubPlace, or pubDate nodes
+        for publisher_node in self.live_nodes(names.PUBLISHER, run):
+            if len(publisher_node.children) == 0:
+                run.remove(publisher_node)
+        for pubplace_node in self.live_nodes(names.PUBPLACE, run):
+            if not pubplace_node.content:
+                run.remove(pubplace_node)
+        for pubdate_node in self.live_nodes(names.PUBDATE, run):
+            if not pubdate_node.content:
+                run.remove(pubdate_node)
+        # Some documents have, due to earlier bugs, keywordSets that contain no keywords
+        for keyword_set in self.live_nodes(names.KEYWORDSET, run):
+            keywords = keyword_set.find_all_children(names.KEYWORD)
+            if len(keywords) == 0:
+                run.remove(keyword_set)
+        # Some documents have, due to earlier bugs, taxonomicCoverage nodes that contain no taxonomicClassification
+        #  nodes
+        for taxonomic_coverage_node in self.live_nodes(names.TAXONOMICCOVERAGE, run):
+            taxonomic_classification_nodes = taxonomic_coverage_node.find_all_children(names.TAXONOMICCLASSIFICATION)
+            if len(taxonomic_classification_nodes) == 0:
+                run.remove(taxonomic_coverage_node)
+        # Some documents have an empty <funding> node. Remove it.
+        for funding_node in self.live_nodes(names.FUNDING, run):
+            if not funding_node.content and len(funding_node.children) == 0:
+                run.remove(funding_node)
+        # Some documents have a <distribution> node that contains only an empty <online> node. Remove it.
+        for distribution_node in self.live_nodes(names.DISTRIBUTION, run):
+            online_nodes = distribution_node.find_all_children(names.ONLINE)
+            if len(online_nodes) == 1 and not online_nodes[0].content and len(online_nodes[0].children) == 0:
+                run.remove(distribution_node)
+
+        # The EML standard permits multiple instrumentation nodes, but the ezEML UI does not.
+        # If there are multiple instrumentation nodes, we will compromise by putting the
+        # instrumentation content in a single node, separated by newlines. The other
+        # instrumentation nodes will be deleted.
+        for method_step_node in self.live_nodes(names.METHODSTEP, run):
+            instrumentation = ''
+            instrumentation_nodes = method_step_node.find_all_children(names.INSTRUMENTATION)
+            index = 0
+            for instrumentation_node in instrumentation_nodes:
+                if not null_string(instrumentation_node.content):
+                    instrumentation += f"{instrumentation_node.content}\n"
+                if index > 0:
+                    run.remove(instrumentation_node)
+                index += 1
+            if instrumentation:
+                instrumentation_node = method_step_node.find_child(names.INSTRUMENTATION)
+                if instrumentation_node:
+                    if instrumentation.endswith('\n'):
+                        instrumentation = instrumentation[:-1]
+                    instrumentation_node.content = instrumentation
+
+        # If a project node no longer has any children, remove it.
+        for project_node in self.live_nodes(names.PROJECT, run):
+            if not project_node.children:
+                run.remove(project_node)
+
+        # If a bounds node has empty minimum/maximum elmeents, delete them. This sometimes happens with packages
+        #  created outside of ezEML.
+        for bounds_node in self.live_nodes(names.BOUNDS, run):
+            minimum_node = bounds_node.find_descendant(names.MINIMUM)
+            if minimum_node and not minimum_node.content:
+                run.remove(minimum_node)
+            maximum_node = bounds_node.find_descendant(names.MAXIMUM)
+            if maximum_node and not maximum_node.content:
+                run.remove(maximum_node)
+
+        # Fixup formatName fields to use mime types instead of file extensions.
+        # If we make a change, flash a message to the user.
+        changed = False
+        for other_entity_node in self.live_nodes(names.OTHERENTITY, run):
+            format_name_node = other_entity_node.find_descendant(names.FORMATNAME)
+            if format_name_node:
+                object_name_node = other_entity_node.find_descendant(names.OBJECTNAME)
+                if object_name_node:
+                    object_name = object_name_node.content
+                    if object_name:
+                        old_content = format_name_node.content
+                        new_content = load_data.format_name_from_data_file(object_name)
+                        if new_content:
+                            format_name_node.content = new_content
+                        if old_content != format_name_node.content:
+                            changed = True
+        if changed:
+            flash("In one or more Other Entities, the Data Format field has been modified to use mime types.")
+
+        # Collect keywords for a given thesaurus into a single keywordSet node.
+        import_nodes.consolidate_keyword_sets(eml_node,
+                                             keyword_set_nodes=self.live_nodes(names.KEYWORDSET, run),
+                                             keyword_nodes=self.live_nodes(names.KEYWORD, run))
+
+        # The namespaces were fixed up by visit(), so there's no need to call fixup_namespaces() here.
+
+        fixup_distribution_urls(eml_node, url_nodes=[node for node in self.distribution_url_nodes if run.is_live(node)])
+
+
+def clean_model(eml_node):
+    """
+    Perform various cleanups on the model. See CleanModelFixup.
+    """
+    fixups.run_fixups(eml_node, [CleanModelFixup()])
 
 
 # # Some documents have both a <funding> node and an <award> node. Remove the <funding> node.
@@ -653,58 +661,86 @@ def fixup_eml_namespaces_on_import(eml_node):
     return eml_node, nsmap_changed
 
 
-def fixup_categorical_variables(eml_node):
+class DatasetSequenceFixup(fixups.Fixup):
+    """ See enforce_dataset_sequence(). It looks only at the dataset node's children, so it needs no nodes. """
+    name = 'enforce_dataset_sequence'
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
+        enforce_dataset_sequence(eml_node)
+
+
+class CategoricalVariablesFixup(fixups.Fixup):
     """
     There was a bug that caused some Categorical variables to have None as variable type.
     Existing ezEML documents may still contain such variables. Here we fix them.
     """
-    # Importing here to sidestep circular import problem.
-    from webapp.views.data_tables.dt import change_measurement_scale
-    data_table_nodes = []
-    file_name = ''
-    eml_node.find_all_descendants(names.DATATABLE, data_table_nodes)
-    for data_table_node in data_table_nodes:
-        attributes_to_fix = []
-        non_numeric_domain_nodes = []
-        data_table_node.find_all_descendants(names.NONNUMERICDOMAIN, non_numeric_domain_nodes)
-        for non_numeric_domain_node in non_numeric_domain_nodes:
-            if not non_numeric_domain_node.children:
-                # Have an error case. Walk back up the tree to find the containing attribute node.
-                nominal_node = non_numeric_domain_node.parent
-                if nominal_node:
-                    measurement_scale_node = nominal_node.parent
-                    if measurement_scale_node:
-                        attribute_node = measurement_scale_node.parent
-                        if attribute_node:
-                            attributes_to_fix.append(attribute_node)
-        if attributes_to_fix:
-            physical_node = data_table_node.find_child(names.PHYSICAL)
-            if physical_node:
-                object_name_node = physical_node.find_child(names.OBJECTNAME)
-                if object_name_node:
-                    file_name = object_name_node.content
-            for attribute_node in attributes_to_fix:
-                attribute_name_node = attribute_node.find_child(names.ATTRIBUTENAME)
-                if attribute_name_node:
-                    attribute_name = attribute_name_node.content
-                    if file_name and attribute_name:
-                        log_info(f'fixup_categorical_variables: fixing "{attribute_name}" in {file_name}')
-                    change_measurement_scale(attribute_node, None, VariableType.CATEGORICAL.name)
+    name = 'fixup_categorical_variables'
+    node_names = (names.NONNUMERICDOMAIN,)
+
+    def __init__(self):
+        self.non_numeric_domain_nodes = OrderedDict()  # data table node id -> (data table node, nonNumericDomain nodes)
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        data_table_node = fixups.find_ancestor(node, names.DATATABLE)
+        if data_table_node:
+            _, nodes = self.non_numeric_domain_nodes.setdefault(data_table_node.id, (data_table_node, []))
+            nodes.append(node)
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
+        # Importing here to sidestep circular import problem.
+        from webapp.views.data_tables.dt import change_measurement_scale
+        file_name = ''
+        for data_table_node, non_numeric_domain_nodes in self.non_numeric_domain_nodes.values():
+            attributes_to_fix = []
+            for non_numeric_domain_node in non_numeric_domain_nodes:
+                if not non_numeric_domain_node.children and run.is_live(non_numeric_domain_node):
+                    # Have an error case. Walk back up the tree to find the containing attribute node.
+                    nominal_node = non_numeric_domain_node.parent
+                    if nominal_node:
+                        measurement_scale_node = nominal_node.parent
+                        if measurement_scale_node:
+                            attribute_node = measurement_scale_node.parent
+                            if attribute_node:
+                                attributes_to_fix.append(attribute_node)
+            if attributes_to_fix:
+                physical_node = data_table_node.find_child(names.PHYSICAL)
+                if physical_node:
+                    object_name_node = physical_node.find_child(names.OBJECTNAME)
+                    if object_name_node:
+                        file_name = object_name_node.content
+                for attribute_node in attributes_to_fix:
+                    attribute_name_node = attribute_node.find_child(names.ATTRIBUTENAME)
+                    if attribute_name_node:
+                        attribute_name = attribute_name_node.content
+                        if file_name and attribute_name:
+                            log_info(f'fixup_categorical_variables: fixing "{attribute_name}" in {file_name}')
+                        change_measurement_scale(attribute_node, None, VariableType.CATEGORICAL.name)
 
 
-def fixup_numerical_variables(eml_node):
+def fixup_categorical_variables(eml_node):
+    """ See CategoricalVariablesFixup. """
+    fixups.run_fixups(eml_node, [CategoricalVariablesFixup()])
+
+
+class NumericalVariablesFixup(fixups.Fixup):
     """
     There was a bug that caused some Numerical variables to be missing the numericDomain element.
     Existing ezEML documents may still contain such variables. Here we fix them.
     """
-    data_table_nodes = []
-    eml_node.find_all_descendants(names.DATATABLE, data_table_nodes)
-    for data_table_node in data_table_nodes:
+    name = 'fixup_numerical_variables'
+    node_names = (names.RATIO,)
+
+    def __init__(self):
+        self.ratio_nodes = []
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        if fixups.find_ancestor(node, names.DATATABLE):
+            self.ratio_nodes.append(node)
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
         # Look for ratio elements that have no numericDomain child.
-        ratio_nodes = []
-        data_table_node.find_all_descendants(names.RATIO, ratio_nodes)
-        for ratio_node in ratio_nodes:
-            if not ratio_node.find_child(names.NUMERICDOMAIN):
+        for ratio_node in self.ratio_nodes:
+            if not ratio_node.find_child(names.NUMERICDOMAIN) and run.is_live(ratio_node):
                 # Create a numericDomain element and add it to the ratio element.
                 numeric_domain_node = Node(names.NUMERICDOMAIN)
                 ratio_node.add_child(numeric_domain_node)
@@ -714,17 +750,28 @@ def fixup_numerical_variables(eml_node):
                 number_type_node.content = 'real'
 
 
-def fixup_field_delimiters(eml_node):
+def fixup_numerical_variables(eml_node):
+    """ See NumericalVariablesFixup. """
+    fixups.run_fixups(eml_node, [NumericalVariablesFixup()])
+
+
+class FieldDelimitersFixup(fixups.Fixup):
     """
     There was a bug that caused the field delimiter to be saved as '\t' for tab-delimited data tables.
     This was then interpreted as an actual tab char in the XML. We need to escape it as '\\t' so we see
     the field delimiter as '\t' in the XML. dex, for example, expects to see '\t' in the XML.
     """
-    field_delimiter_nodes = []
-    eml_node.find_all_descendants(names.FIELDDELIMITER, field_delimiter_nodes)
-    for field_delimiter_node in field_delimiter_nodes:
-        if field_delimiter_node.content and field_delimiter_node.content == '\t':
-            field_delimiter_node.content = '\\t'
+    name = 'fixup_field_delimiters'
+    node_names = (names.FIELDDELIMITER,)
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        if node.content and node.content == '\t':
+            node.content = '\\t'
+
+
+def fixup_field_delimiters(eml_node):
+    """ See FieldDelimitersFixup. """
+    fixups.run_fixups(eml_node, [FieldDelimitersFixup()])
 
 
 def fixup_namespaces(eml_node):
@@ -750,11 +797,17 @@ def fixup_namespaces(eml_node):
     return fix_node(eml_node)
 
 
-def fixup_distribution_urls(eml_node):
+DATA_TABLE_URL_PATH = [names.DATASET, names.DATATABLE, names.PHYSICAL, names.DISTRIBUTION, names.ONLINE, names.URL]
+OTHER_ENTITY_URL_PATH = [names.DATASET, names.OTHERENTITY, names.PHYSICAL, names.DISTRIBUTION, names.ONLINE, names.URL]
+
+
+def fixup_distribution_urls(eml_node, url_nodes=None):
     """
     If the user has changed the document name via "Save As..." after creating the document, the distribution URLs need to
     be updated to reflect the new document name. We do this by scanning all documents because we want to fix up existing
     documents that have this problem. I.e., we don't rely on correcting the document names at the point that Save As is done.
+
+    If the caller has already collected the distribution url nodes, it passes them in url_nodes.
     """
     from webapp.home.views import encode_distribution_url
 
@@ -776,8 +829,9 @@ def fixup_distribution_urls(eml_node):
         else:
             return None, None, None
 
-    url_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE, names.PHYSICAL, names.DISTRIBUTION, names.ONLINE, names.URL])
-    url_nodes = url_nodes + eml_node.find_all_nodes_by_path([names.DATASET, names.OTHERENTITY, names.PHYSICAL, names.DISTRIBUTION, names.ONLINE, names.URL])
+    if url_nodes is None:
+        url_nodes = eml_node.find_all_nodes_by_path(DATA_TABLE_URL_PATH)
+        url_nodes = url_nodes + eml_node.find_all_nodes_by_path(OTHER_ENTITY_URL_PATH)
 
     # Get the current server. We only want to fix up URLs that point to the current server.
     current_netloc = urlparse(request.base_url).netloc
@@ -797,37 +851,75 @@ def fixup_distribution_urls(eml_node):
                     encode_distribution_url(url_node)
 
 
-def save_both_formats(filename:str=None, eml_node:Node=None, owner_login:str=None):
+def save_fixups():
     """
-    Save the Metapype model as both JSON and XML, after doing some cleanup.
+    Return the fixups applied by save_both_formats(), in the order in which clean_model(), enforce_dataset_sequence(),
+    etc., were formerly called.
     """
     import webapp.home.utils.create_nodes as create_nodes
 
+    return [
+        CleanModelFixup(),
+        DatasetSequenceFixup(),
+        CustomUnitsFixup(),
+        CategoricalVariablesFixup(),
+        NumericalVariablesFixup(),
+        FieldDelimitersFixup(),
+        create_nodes.EmlEditorMetadataFixup(),
+        qudt_annotations.AttributeIdsFixup(),
+        qudt_annotations.QudtAnnotationsFixup()
+    ]
+
+
+def save_both_formats(filename:str=None, eml_node:Node=None, owner_login:str=None):
+    """
+    Save the Metapype model, after doing some cleanup. The JSON is written now. The XML is brought up to date when it's
+    next needed -- see get_xml_pathname().
+    """
     if not owner_login:
         owner_login = user_data.get_active_document_owner_login()
-    clean_model(eml_node)
-    enforce_dataset_sequence(eml_node)
-    fix_up_custom_units(eml_node)
-    fixup_categorical_variables(eml_node)
-    fixup_numerical_variables(eml_node)
-    fixup_field_delimiters(eml_node)
-    create_nodes.add_eml_editor_metadata(eml_node)
-
-    qudt_annotations.add_attribute_ids(eml_node)
-    qudt_annotations.add_qudt_annotations(eml_node)
+    # The fixups are applied in a single walk of the tree. See webapp/home/utils/fixups.py.
+    timings = fixups.run_fixups(eml_node, save_fixups())
+    if getattr(Config, 'LOG_SAVE_FIXUP_TIMINGS', False):
+        fixups.log_fixup_timings(timings, filename)
 
     if not owner_login:
         owner_login = user_data.get_active_document_owner_login()
+    # Only the JSON is written here. The XML is generated on demand by get_xml_pathname(), since it's needed only
+    #  for downloads, exports, validation, and submission to the repository.
     save_eml(filename=filename, eml_node=eml_node, format='json', owner_login=owner_login)
-    save_eml(filename=filename, eml_node=eml_node, format='xml', owner_login=owner_login)
 
     get_check_metadata_status(eml_node, filename) # To keep badge up-to-date in UI
 
 
+def serialize_eml(eml_node:Node=None, format:str='json'):
+    """
+    Serialize the Metapype model as either JSON or XML.
+    """
+    if format == 'json':
+        return metapype_io.to_json(eml_node)
+    elif format == 'xml':
+        xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        xml_str = create_full_xml(eml_node)
+        return xml_declaration + xml_str
+    return None
+
+
 def save_eml(filename:str=None, eml_node:Node=None, format:str='json', owner_login:str=None):
     """
     Save the Metapype model as either JSON or XML.
     """
+    save_eml_formats(filename=filename, eml_node=eml_node, formats=(format,), owner_login=owner_login)
+
+
+def save_eml_formats(filename:str=None, eml_node:Node=None, formats:tuple=('json',), owner_login:str=None):
+    """
+    Save the Metapype model in each of the given formats.
+
+    The model is serialized before anything is written. The files are then written atomically (temp file, fsync,
+    rename) while holding the document's write lock, so a worker that is killed mid-save can't leave a truncated
+    document behind, and concurrent saves of the same document by different workers can't interleave.
+    """
 
     if filename:
         if eml_node is not None:
@@ -835,27 +927,84 @@ def save_eml(filename:str=None, eml_node:Node=None, format:str='json', owner_log
             if Config.MEM_LOG_METAPYPE_STORE_ACTIONS and url_of_interest():
                     log_info(f'*** save_eml ***: node store checksum={calculate_node_store_checksum()}    {filename}')
 
-            output_str = None
+            outputs = []
+            for format in formats:
+                output_str = serialize_eml(eml_node, format)
+                if output_str:
+                    outputs.append((format, output_str))
 
-            if format == 'json':
-                output_str = metapype_io.to_json(eml_node)
-            elif format == 'xml':
-                xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
-                xml_str = create_full_xml(eml_node)
-                output_str = xml_declaration + xml_str
+            # The model may have been modified since the data tables' settings were hashed.
+            data_table_settings.forget(eml_node)
 
-            if output_str:
+            if outputs:
                 user_folder = user_data.get_user_folder_name(owner_login=owner_login) or '.'
-                filename = f'{user_folder}/{filename}.{format}'
-                with open(filename, "w") as fh:
-                    fh.write(output_str)
-                    fh.flush()
+                pathname = f'{user_folder}/{filename}'
+                json_pathname = f'{pathname}.json'
+                with file_utils.document_write_lock(json_pathname):
+                    for format, output_str in outputs:
+                        format_pathname = f'{pathname}.{format}'
+                        if format == 'json':
+                            model_cache.invalidate(format_pathname)
+                        file_utils.atomic_write(format_pathname, output_str)
+                    if 'json' in formats:
+                        json_identity = model_cache.file_identity(json_pathname)
+                        # We have the JSON text in hand, so record its fingerprint now. That saves Check Metadata,
+                        #  etc., from having to read and hash the file to find out whether the document has changed.
+                        json_text = next(output_str for format, output_str in outputs if format == 'json')
+                        fingerprint = document_meta.content_fingerprint(json_text)
+                        meta_fields = document_meta.fingerprint_fields(fingerprint, json_identity)
+                        if 'xml' in formats:
+                            # The XML was generated from the same model as the JSON, so it's current.
+                            meta_fields['xml_source'] = list(json_identity)
+                        document_meta.update_meta(json_pathname, **meta_fields)
+                        if model_sidecar.sidecar_enabled():
+                            model_sidecar.write_sidecar(json_pathname, eml_node, fingerprint, json_identity)
+                        # The model we just saved is exactly what the next load_eml() would parse, so cache it.
+                        model_cache.put_model(json_pathname, json_identity, eml_node)
         else:
             raise ValueError(f"No EML node was supplied for saving EML.")
     else:
         raise ValueError(f"No filename value was supplied for saving EML.")
 
 
+def get_xml_pathname(filename:str=None, folder_name:str=None, owner_login:str=None):
+    """
+    Return the pathname of the document's XML file, first regenerating the XML from the JSON if it's stale.
+
+    The XML is not written when the document is saved. Instead, every consumer of the XML file (downloads, exports,
+    validation, Check Metadata, submission to the repository, etc.) gets its pathname from here. The document's
+    metadata record (see document_meta.py) records the identity (mtime_ns, size, inode) of the JSON file from which
+    the XML was last generated. If the JSON has changed since then, or the XML file is missing, the XML is regenerated.
+
+    The folder_name and owner_login parameters have the same meaning as in load_eml().
+    """
+    json_pathname = get_pathname(filename, folder_name=folder_name, file_extension='json', owner_login=owner_login)
+    xml_pathname = f'{os.path.splitext(json_pathname)[0]}.xml'
+
+    # Retry if the JSON changes while we're generating the XML, i.e., if another worker saves the document.
+    for _ in range(3):
+        json_identity = model_cache.file_identity(json_pathname)
+        if json_identity is None:
+            break
+        if os.path.isfile(xml_pathname) and \
+                document_meta.read_meta(json_pathname).get('xml_source') == list(json_identity):
+            break
+        # Use a private node store, so the nodes we create don't displace those of a model the request is using.
+        with Node.store_scope({}, clear_on_exit=True):
+            eml_node = model_cache.get_model(json_pathname, load_model_file)
+            output_str = serialize_eml(eml_node, 'xml') if eml_node else None
+        if not output_str:
+            log_error(f"get_xml_pathname: Could not generate XML for {json_pathname}")
+            break
+        with file_utils.document_write_lock(json_pathname):
+            if model_cache.file_identity(json_pathname) != json_identity:
+                continue
+            file_utils.atomic_write(xml_pathname, output_str)
+            document_meta.update_meta(json_pathname, xml_source=list(json_identity))
+        break
+    return xml_pathname
+
+
 def create_eml(filename=None):
     """
     Create a minimal Metapype model consisting of access rules and an empty dataset, and save it.
@@ -970,7 +1119,7 @@ def was_imported_from_xml(eml_node):
     """
     Return True if the model was imported from an XML file, False otherwise.
     """
-    imported_from_xml_node = eml_node.find_descendant('importedFromXML')
+    imported_from_xml_node = node_index.find_descendant(eml_node, 'importedFromXML')
     if imported_from_xml_node:
         return True
     else:
@@ -1011,7 +1160,7 @@ def taxonomy_inconsistent_with_ezeml(eml_node, package_name):
         return False
 
 
-def fix_up_custom_units(eml_node:Node=None, new_custom_unit=None, new_description=None):
+class CustomUnitsFixup(fixups.Fixup):
     """
     Fix up the handling of custom units in the additionalMetadata node.
 
@@ -1022,89 +1171,106 @@ def fix_up_custom_units(eml_node:Node=None, new_custom_unit=None, new_descriptio
     What should result is a single additionalMetadata node with all the custom units in it.
     There may be other additionalMetadata nodes that do not contain custom units, and they will be left alone.
     """
-    def collect_custom_units_from_attributes(eml_node):
-        custom_unit_nodes = []
-        eml_node.find_all_descendants(names.CUSTOMUNIT, custom_unit_nodes)
-        custom_units = set()
-        for custom_unit_node in custom_unit_nodes:
-            custom_units.add(custom_unit_node.content)
-        return list(custom_units)
-
-    def collect_custom_units_from_additional_metadata(eml_node):
-        unit_list_nodes = []
-        unit_nodes = []
-        eml_node.find_all_descendants(names.UNITLIST, unit_list_nodes)
+    name = 'fix_up_custom_units'
+    node_names = (names.CUSTOMUNIT, names.UNITLIST, names.ADDITIONALMETADATA)
+
+    def __init__(self, new_custom_unit=None, new_description=None):
+        self.new_custom_unit = new_custom_unit
+        self.new_description = new_description
+        self.nodes = {name: [] for name in self.node_names}
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        self.nodes[node.name].append(node)
+
+    def live_nodes(self, name, run:fixups.FixupRun):
+        return [node for node in self.nodes[name] if run.is_live(node)]
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
+        new_custom_unit = self.new_custom_unit
+        new_description = self.new_description
+
+        def collect_custom_units_from_attributes():
+            custom_units = set()
+            for custom_unit_node in self.live_nodes(names.CUSTOMUNIT, run):
+                custom_units.add(custom_unit_node.content)
+            return list(custom_units)
+
+        def collect_custom_units_from_additional_metadata(unit_list_nodes):
+            unit_nodes = []
+            for unit_list_node in unit_list_nodes:
+                unit_nodes.extend(unit_list_node.children)
+            custom_units = {}
+            for unit_node in unit_nodes:
+                if unit_node.attribute_value('name'):
+                    custom_unit_name = unit_node.attribute_value('name')
+                    description_node = unit_node.find_child(names.DESCRIPTION)
+                    if description_node:
+                        description = description_node.content
+                    else:
+                        description = ''
+                    # We capture the attributes of the unit node so that we can restore them when we write the
+                    #  custom unit back out. Packages that have been fetched from the repository may contain
+                    #  additional attributes besides the id and name, and we don't want to lose them.
+                    custom_units[custom_unit_name] = (description, unit_node.attributes)
+            return custom_units
+
+        unit_list_nodes = self.live_nodes(names.UNITLIST, run)
+        custom_units_from_attributes = collect_custom_units_from_attributes()
+        custom_units_from_additional_metadata = collect_custom_units_from_additional_metadata(unit_list_nodes)
+
+        # Remove any custom units from the additionalMetadata node that are not in the attributes, i.e., that are no
+        #  longer needed.
+        current_keys = list(custom_units_from_additional_metadata.keys())
+        for key in current_keys:
+            if key not in custom_units_from_attributes:
+                del custom_units_from_additional_metadata[key]
+
+        # Add any custom units from the attributes that are not in the additionalMetadata node.
+        for custom_unit in custom_units_from_attributes:
+            if custom_unit not in custom_units_from_additional_metadata:
+                custom_units_from_additional_metadata[custom_unit] = ('', { 'id': custom_unit, 'name': custom_unit})
+
+        if new_custom_unit:
+            custom_units_from_additional_metadata[new_custom_unit] = (new_description, { 'id': custom_unit, 'name': custom_unit})
+
+        # Remove any additionalMetadata nodes that contain custom units. We're going to recreate one.
+        # First, remove unitList nodes.
         for unit_list_node in unit_list_nodes:
-            unit_nodes.extend(unit_list_node.children)
-        custom_units = {}
-        for unit_node in unit_nodes:
-            if unit_node.attribute_value('name'):
-                custom_unit_name = unit_node.attribute_value('name')
-                description_node = unit_node.find_child(names.DESCRIPTION)
-                if description_node:
-                    description = description_node.content
-                else:
-                    description = ''
-                # We capture the attributes of the unit node so that we can restore them when we write the
-                #  custom unit back out. Packages that have been fetched from the repository may contain
-                #  additional attributes besides the id and name, and we don't want to lose them.
-                custom_units[custom_unit_name] = (description, unit_node.attributes)
-        return custom_units
-
-    custom_units_from_attributes = collect_custom_units_from_attributes(eml_node)
-    custom_units_from_additional_metadata = collect_custom_units_from_additional_metadata(eml_node)
-
-    # Remove any custom units from the additionalMetadata node that are not in the attributes, i.e., that are no longer
-    #  needed.
-    current_keys = list(custom_units_from_additional_metadata.keys())
-    for key in current_keys:
-        if key not in custom_units_from_attributes:
-            del custom_units_from_additional_metadata[key]
-
-    # Add any custom units from the attributes that are not in the additionalMetadata node.
-    for custom_unit in custom_units_from_attributes:
-        if custom_unit not in custom_units_from_additional_metadata:
-            custom_units_from_additional_metadata[custom_unit] = ('', { 'id': custom_unit, 'name': custom_unit})
-
-    if new_custom_unit:
-        custom_units_from_additional_metadata[new_custom_unit] = (new_description, { 'id': custom_unit, 'name': custom_unit})
-
-    # Remove any additionalMetadata nodes that contain custom units. We're going to recreate one.
-    # First, remove unitList nodes.
-    unit_list_nodes = []
-    eml_node.find_all_descendants(names.UNITLIST, unit_list_nodes)
-    for unit_list_node in unit_list_nodes:
-        parent_node = unit_list_node.parent
-        parent_node.remove_child(unit_list_node)
-    # Now remove additionalMetadata nodes that contain only a metadata node.
-    # We do it this way on the off chance that an additionalMetadata node that contained a unitList node also contains
-    #  some other stuff. This is not expected, but it's legal EML.
-    additional_metadata_nodes = []
-    eml_node.find_all_descendants(names.ADDITIONALMETADATA, additional_metadata_nodes)
-    for additional_metadata_node in additional_metadata_nodes:
-        if len(additional_metadata_node.children) == 1 and \
-                additional_metadata_node.children[0].name == names.METADATA and \
-                len(additional_metadata_node.children[0].children) == 0:
-            parent_node = additional_metadata_node.parent
-            parent_node.remove_child(additional_metadata_node)
-
-    # If needed, create a new additionalMetadata node with the custom units.
-    if custom_units_from_additional_metadata:
-        additional_metadata_node = node_utils.new_child_node(names.ADDITIONALMETADATA, eml_node)
-        metadata_node = node_utils.new_child_node(names.METADATA, additional_metadata_node, force=True)
-        unitlist_node = node_utils.new_child_node(names.UNITLIST, metadata_node, force=True)
-        unitlist_node.prefix = 'stmml'
-        for custom_unit_name, custom_unit_details in custom_units_from_additional_metadata.items():
-            unit_node = node_utils.new_child_node(names.UNIT, unitlist_node, force=True)
-            unit_node.add_attribute('id', custom_unit_name)
-            unit_node.add_attribute('name', custom_unit_name)
-            custom_unit_description, custom_unit_attributes = custom_unit_details
-            for key, value in custom_unit_attributes.items():
-                if key not in ['id', 'name']:
-                    unit_node.add_attribute(key, value)
-            unit_node.prefix = 'stmml'
-            description_node = node_utils.new_child_node(names.DESCRIPTION, unit_node, custom_unit_description, force=True)
-            description_node.prefix = 'stmml'
+            run.remove(unit_list_node)
+        # Now remove additionalMetadata nodes that contain only a metadata node.
+        # We do it this way on the off chance that an additionalMetadata node that contained a unitList node also
+        #  contains some other stuff. This is not expected, but it's legal EML.
+        for additional_metadata_node in self.live_nodes(names.ADDITIONALMETADATA, run):
+            if len(additional_metadata_node.children) == 1 and \
+                    additional_metadata_node.children[0].name == names.METADATA and \
+                    len(additional_metadata_node.children[0].children) == 0:
+                run.remove(additional_metadata_node)
+
+        # If needed, create a new additionalMetadata node with the custom units.
+        if custom_units_from_additional_metadata:
+            additional_metadata_node = node_utils.new_child_node(names.ADDITIONALMETADATA, eml_node)
+            metadata_node = node_utils.new_child_node(names.METADATA, additional_metadata_node, force=True)
+            unitlist_node = node_utils.new_child_node(names.UNITLIST, metadata_node, force=True)
+            unitlist_node.prefix = 'stmml'
+            for custom_unit_name, custom_unit_details in custom_units_from_additional_metadata.items():
+                unit_node = node_utils.new_child_node(names.UNIT, unitlist_node, force=True)
+                unit_node.add_attribute('id', custom_unit_name)
+                unit_node.add_attribute('name', custom_unit_name)
+                custom_unit_description, custom_unit_attributes = custom_unit_details
+                for key, value in custom_unit_attributes.items():
+                    if key not in ['id', 'name']:
+                        unit_node.add_attribute(key, value)
+                unit_node.prefix = 'stmml'
+                description_node = node_utils.new_child_node(names.DESCRIPTION, unit_node, custom_unit_description, force=True)
+                description_node.prefix = 'stmml'
+
+
+def fix_up_custom_units(eml_node:Node=None, new_custom_unit=None, new_description=None):
+    """
+    Fix up the handling of custom units in the additionalMetadata node, optionally adding a new custom unit.
+    See CustomUnitsFixup.
+    """
+    fixups.run_fixups(eml_node, [CustomUnitsFixup(new_custom_unit, new_description)])
 
 
 def handle_custom_unit_additional_metadata(eml_node:Node=None,
@@ -0,0 +1,147 @@
+"""
+Process-local cache of parsed Metapype models, used by load_eml().
+
+Nearly every page hit loads the active document, and for large packages parsing the JSON file dominates the cost of
+the request. Each uWSGI worker therefore keeps a small LRU cache of parsed models, keyed by the pathname of the JSON
+file together with its identity on disk: (st_mtime_ns, st_size, st_ino). Any write to the file changes that identity,
+so a stale entry can never be returned. save_eml() also invalidates the entry explicitly.
+
+The cached models are kept in a private node store, never in a request's node store. A cache hit hands back a fresh
+copy of the cached model, created in the node store that is in effect for the current request (see init_node_store()
+in webapp/home/views.py), so the caller is free to mutate it. Node IDs are preserved in the copy, since they appear in
+the URLs used by the UI.
+
+The maximum number of entries per worker is given by Config.MODEL_CACHE_MAX_ENTRIES. Setting it to 0 disables the
+cache. Hit/miss/eviction counters are available via cache_stats(), for use in sizing the cache.
+"""
+
+from collections import OrderedDict
+import os
+import threading
+
+from metapype.model.node import Node
+
+from webapp.config import Config
+from webapp.home.home_utils import log_info
+
+
+DEFAULT_MAX_ENTRIES = 8
+
+_cache = OrderedDict()  # pathname -> (file identity, root node of cached model)
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+
+def _max_entries():
+    return getattr(Config, 'MODEL_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+
+def _key(pathname):
+    return os.path.abspath(pathname)
+
+
+def file_identity(pathname):
+    """ Return the identity of the file on disk, or None if it doesn't exist. """
+    try:
+        stat = os.stat(pathname)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def clone_model(node:Node, parent:Node=None, nsmaps:dict=None):
+    """
+    Return a deep copy of the subtree rooted at node, registered in the node store currently in effect.
+
+    Unlike Node.copy(), node IDs are preserved. Nodes that share an nsmap in the original share it in the copy, too,
+    as they do in models built by metapype_io.
+    """
+    if nsmaps is None:
+        nsmaps = {}
+    clone = Node(node.name, id=node.id, parent=parent, content=node.content)
+    clone.tail = node.tail
+    clone.prefix = node.prefix
+    clone.attributes = dict(node.attributes)
+    clone.extras = dict(node.extras)
+    nsmap = nsmaps.get(id(node.nsmap))
+    if nsmap is None:
+        nsmap = dict(node.nsmap)
+        nsmaps[id(node.nsmap)] = nsmap
+    clone.nsmap = nsmap
+    clone.children = [clone_model(child, clone, nsmaps) for child in node.children]
+    return clone
+
+
+def get_model(pathname:str, loader):
+    """
+    Return the model stored in the JSON file at pathname, using the cache if possible.
+
+    loader is called with the pathname on a cache miss and must return the root node of the parsed model, or None.
+    The returned model is always a copy that belongs to the caller.
+    """
+    max_entries = _max_entries()
+    identity = file_identity(pathname)
+    if not max_entries or identity is None:
+        return loader(pathname)
+
+    key = _key(pathname)
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] == identity:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            cached_node = entry[1]
+        else:
+            _stats['misses'] += 1
+            cached_node = None
+    if cached_node is not None:
+        return clone_model(cached_node)
+
+    eml_node = loader(pathname)
+    # Only cache the model if the file wasn't modified while we were parsing it. The loader may itself have saved
+    #  the file (e.g., to fix up non-string content), in which case we'll just pick it up on the next load.
+    if eml_node is not None and file_identity(pathname) == identity:
+        put_model(pathname, identity, eml_node)
+    return eml_node
+
+
+def put_model(pathname:str, identity:tuple, eml_node:Node):
+    """ Add a copy of the model to the cache, evicting the least recently used entries if necessary. """
+    max_entries = _max_entries()
+    if not max_entries:
+        return
+    with Node.store_scope({}, clear_on_exit=True):
+        cached_node = clone_model(eml_node)
+    key = _key(pathname)
+    with _lock:
+        _cache[key] = (identity, cached_node)
+        _cache.move_to_end(key)
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+            _stats['evictions'] += 1
+
+
+def invalidate(pathname:str):
+    """ Drop the cache entry for pathname, if any. Called whenever the file is written. """
+    with _lock:
+        if _cache.pop(_key(pathname), None) is not None:
+            _stats['invalidations'] += 1
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def cache_stats():
+    """ Return the cache counters for this worker process. """
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_cache)
+    stats['max_entries'] = _max_entries()
+    stats['pid'] = os.getpid()
+    return stats
+
+
+def log_cache_stats():
+    log_info(f"model cache: {cache_stats()}")
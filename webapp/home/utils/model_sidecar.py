@@ -0,0 +1,207 @@
+"""
+Binary sidecar for a document's model, used to speed up loading.
+
+Loading a document from its JSON file means reading the JSON text, decoding it, and having metapype_io rebuild every
+node (falling back to the legacy mp_io format if need be), and then scanning the model for non-string content. For
+large packages, this dominates the cost of a cache miss in load_eml(). So, alongside user-data/foo/bar.json, we keep
+user-data/foo/.bar.model, a compact encoding of the same model: nested tuples, pickled with protocol 5 and compressed
+with zlib.
+
+The sidecar is stamped with SIDECAR_FORMAT_VERSION and with the fingerprint (see document_meta.py) and file identity
+(mtime_ns, size, inode) of the JSON it was made from. The JSON file remains the document of record. The sidecar is used
+only if its format version is current and it matches the JSON, either by identity or, failing that, by fingerprint. Otherwise, we fall back to the JSON
+and write a fresh sidecar. So a missing, stale, or corrupt sidecar costs us nothing but the time to notice it.
+
+The sidecar is written by save_eml() while it holds the document's write lock. Set Config.USE_MODEL_SIDECAR to False
+to turn it off.
+
+To compare load times and memory usage for a given document:
+
+    python -m webapp.home.utils.model_sidecar user-data/foo/bar.json
+"""
+
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+import zlib
+
+from metapype.model import metapype_io
+from metapype.model.node import Node
+
+from webapp.config import Config
+from webapp.home.home_utils import log_error
+import webapp.home.utils.document_meta as document_meta
+import webapp.home.utils.file_utils as file_utils
+from webapp.home.utils.model_cache import file_identity
+
+
+SIDECAR_FILE_SUFFIX = '.model'
+# Bump this whenever the encoding changes. Sidecars with a different version are ignored and rewritten.
+SIDECAR_FORMAT_VERSION = 1
+COMPRESSION_LEVEL = 1
+
+
+def sidecar_enabled():
+    return getattr(Config, 'USE_MODEL_SIDECAR', False)
+
+
+def sidecar_pathname(json_pathname):
+    """ Return the pathname of the sidecar for the document whose JSON file is at json_pathname. """
+    dirname, basename = os.path.split(json_pathname)
+    return os.path.join(dirname, f'.{file_utils.document_root(basename)}{SIDECAR_FILE_SUFFIX}')
+
+
+def _encode(node:Node, nsmaps:dict):
+    # Nodes that share an nsmap in the model share it after decoding, so nsmaps are stored once and referred to by index.
+    nsmap_index = nsmaps.setdefault(id(node.nsmap), (len(nsmaps), node.nsmap))[0]
+    return (node.name, node.id, node.content, node.tail, node.prefix, node.attributes or None, node.extras or None,
+            nsmap_index, tuple(_encode(child, nsmaps) for child in node.children))
+
+
+def _decode(record, parent:Node, nsmaps:list):
+    name, node_id, content, tail, prefix, attributes, extras, nsmap_index, children = record
+    node = Node(name, id=node_id, parent=parent, content=content)
+    node.tail = tail
+    node.prefix = prefix
+    if attributes:
+        node.attributes = dict(attributes)
+    if extras:
+        node.extras = dict(extras)
+    node.nsmap = nsmaps[nsmap_index]
+    node.children = [_decode(child, node, nsmaps) for child in children]
+    return node
+
+
+def encode_model(eml_node:Node):
+    """ Return the compressed encoding of the model. """
+    nsmaps = {}
+    record = _encode(eml_node, nsmaps)
+    nsmap_list = [dict(nsmap) for _, nsmap in sorted(nsmaps.values(), key=lambda entry: entry[0])]
+    return zlib.compress(pickle.dumps((nsmap_list, record), protocol=5), COMPRESSION_LEVEL)
+
+
+def decode_model(blob:bytes):
+    """ Return the model encoded by encode_model(), registered in the node store currently in effect. """
+    nsmap_list, record = pickle.loads(zlib.decompress(blob))
+    return _decode(record, None, nsmap_list)
+
+
+def write_sidecar(json_pathname:str, eml_node:Node, fingerprint:str, json_identity:tuple):
+    """
+    Write the sidecar for the model that was saved as the JSON file with the given fingerprint and identity.
+    The caller holds the document's write lock.
+    """
+    try:
+        contents = pickle.dumps((SIDECAR_FORMAT_VERSION, fingerprint, tuple(json_identity), encode_model(eml_node)),
+                                protocol=5)
+        file_utils.atomic_write(sidecar_pathname(json_pathname), contents)
+    except Exception as e:
+        # The sidecar is only an optimization. Make sure it can't be mistaken for a current one, and carry on.
+        log_error(f'write_sidecar: {json_pathname}: {e}')
+        remove_sidecar(json_pathname)
+
+
+def read_sidecar(json_pathname:str):
+    """ Return the model from the sidecar if the sidecar is current for the JSON file, or None. """
+    try:
+        with open(sidecar_pathname(json_pathname), 'rb') as f:
+            format_version, fingerprint, json_identity, blob = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_error(f'read_sidecar: {json_pathname}: {e}')
+        return None
+    if format_version != SIDECAR_FORMAT_VERSION:
+        return None
+    if tuple(json_identity) != file_identity(json_pathname):
+        # The JSON file has been replaced or touched. If its content is unchanged (e.g., it was copied), the
+        #  sidecar is still good.
+        if document_meta.get_fingerprint(json_pathname) != fingerprint:
+            return None
+    try:
+        return decode_model(blob)
+    except Exception as e:
+        log_error(f'read_sidecar: {json_pathname}: {e}')
+        return None
+
+
+def remove_sidecar(json_pathname):
+    try:
+        os.remove(sidecar_pathname(json_pathname))
+    except FileNotFoundError:
+        pass
+
+
+def load_model(json_pathname:str, loader):
+    """
+    Return the model for the JSON file at json_pathname, from the sidecar if it's current. Otherwise, call loader
+    with json_pathname to load the model from the JSON, and bring the sidecar up to date.
+    """
+    if not sidecar_enabled():
+        return loader(json_pathname)
+    eml_node = read_sidecar(json_pathname)
+    if eml_node is not None:
+        return eml_node
+
+    identity = file_identity(json_pathname)
+    eml_node = loader(json_pathname)
+    if eml_node is not None and identity is not None:
+        fingerprint = document_meta.get_fingerprint(json_pathname)
+        with file_utils.document_write_lock(json_pathname):
+            # If the JSON changed while we were parsing it, we'd be stamping the wrong model with its fingerprint.
+            if fingerprint and file_identity(json_pathname) == identity:
+                write_sidecar(json_pathname, eml_node, fingerprint, identity)
+    return eml_node
+
+
+def benchmark(json_pathname:str, repeat:int=5):
+    """
+    Compare loading a model from its JSON with loading it from a sidecar. Returns a dict giving, for each, the best
+    time in seconds over repeat loads, the peak memory allocated while loading, and the size of the file.
+    """
+    def measure(load):
+        best = None
+        for _ in range(repeat):
+            with Node.store_scope({}, clear_on_exit=True):
+                start = time.perf_counter()
+                load()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        with Node.store_scope({}, clear_on_exit=True):
+            tracemalloc.start()
+            load()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return best, peak
+
+    with open(json_pathname, 'r') as f:
+        json_text = f.read()
+    with Node.store_scope({}, clear_on_exit=True):
+        contents = pickle.dumps((SIDECAR_FORMAT_VERSION, document_meta.content_fingerprint(json_text), (),
+                                 encode_model(metapype_io.from_json(json_text))), protocol=5)
+
+    def load_json():
+        with open(json_pathname, 'r') as f:
+            metapype_io.from_json(f.read())
+
+    def load_sidecar():
+        _, _, _, blob = pickle.loads(contents)
+        decode_model(blob)
+
+    json_time, json_peak = measure(load_json)
+    sidecar_time, sidecar_peak = measure(load_sidecar)
+    return {
+        'json': {'seconds': json_time, 'peak_bytes': json_peak, 'file_bytes': len(json_text.encode('utf-8'))},
+        'sidecar': {'seconds': sidecar_time, 'peak_bytes': sidecar_peak, 'file_bytes': len(contents)}
+    }
+
+
+if __name__ == '__main__':
+    for pathname in sys.argv[1:]:
+        results = benchmark(pathname)
+        print(pathname)
+        for kind, result in results.items():
+            print(f"  {kind:8} {result['seconds'] * 1000:9.1f} ms  peak {result['peak_bytes'] / 1e6:8.1f} MB  "
+                  f"file {result['file_bytes'] / 1e6:8.2f} MB")
@@ -0,0 +1,174 @@
+"""
+Index of a model's nodes by name and by id, for answering tree searches without walking the tree.
+
+Check Metadata's rules, summarize_for_badges(), and some of the lists.list_* functions search the model with
+find_descendant(), find_all_descendants(), and find_all_nodes_by_path(). Each of those walks the subtree it's called
+on, so for a large package the same tree gets walked many times over. A NodeIndex is built in a single walk and answers
+the same questions by lookup: it records each node's position in document order and the extent of its subtree, so the
+descendants of a node with a given name are a slice of the list of nodes with that name.
+
+The index is only good as long as the model isn't changed. So rather than being kept around, an index is put in effect
+for a block of code that only reads the model:
+
+    with node_index.indexed(eml_node):
+        ...
+
+The module-level find_descendant(), find_all_descendants(), and find_all_nodes_by_path() functions give the same
+results as the Node methods of the same names. They use the index in effect if it covers the node they're called on,
+and otherwise fall back to the Node methods. So code that calls them works the same whether or not an index is in
+effect.
+"""
+
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metapype.model.node import Node
+
+
+class NodeIndex:
+    """ Index of the subtree rooted at root, in document (preorder) order. """
+
+    def __init__(self, root:Node):
+        self.root = root
+        self._nodes = []        # Nodes in document order
+        self._ends = []         # For each node, the position of the last node in its subtree
+        self._positions = {}    # id(node) -> position
+        self._by_name = {}      # Node name -> positions of the nodes with that name, ascending
+        self._by_id = {}        # Node id -> node
+        nodes = self._nodes
+        ends = self._ends
+        positions = self._positions
+        by_name = self._by_name
+        by_id = self._by_id
+        stack = [(root, False)]
+        while stack:
+            node, finished = stack.pop()
+            if finished:
+                ends[positions[id(node)]] = len(nodes) - 1
+                continue
+            position = len(nodes)
+            nodes.append(node)
+            ends.append(position)
+            positions[id(node)] = position
+            by_name.setdefault(node.name, []).append(position)
+            by_id[node.id] = node
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def covers(self, node:Node):
+        """ Return True iff node is in the indexed subtree. """
+        position = self._positions.get(id(node))
+        return position is not None and self._nodes[position] is node
+
+    def get(self, node_id:str):
+        """ Return the node with the given id, or None. """
+        return self._by_id.get(node_id)
+
+    def _descendant_positions(self, name:str, within:Node=None):
+        positions = self._by_name.get(name)
+        if not positions:
+            return []
+        if within is None or within is self.root:
+            start, end = 1, len(self._nodes) - 1
+        else:
+            position = self._positions[id(within)]
+            start, end = position + 1, self._ends[position]
+        return positions[bisect_left(positions, start):bisect_right(positions, end)]
+
+    def find_all(self, name:str, within:Node=None):
+        """ Return the descendants of within (by default, the root) with the given name, in document order. """
+        nodes = self._nodes
+        return [nodes[position] for position in self._descendant_positions(name, within)]
+
+    def find_first(self, name:str, within:Node=None):
+        """ Return the first descendant of within (by default, the root) with the given name, or None. """
+        positions = self._descendant_positions(name, within)
+        return self._nodes[positions[0]] if positions else None
+
+    def find_all_by_path(self, path:list, within:Node=None):
+        """ Return the nodes that Node.find_all_nodes_by_path(path) returns when called on within (by default, the root). """
+        if not path:
+            return []
+        if within is None:
+            within = self.root
+        found = []
+        for node in self.find_all(path[-1], within):
+            ancestor = node
+            for name in reversed(path):
+                if ancestor is None or ancestor.name != name:
+                    break
+                ancestor = ancestor.parent
+            else:
+                if ancestor is within:
+                    found.append(node)
+        return found
+
+    @staticmethod
+    def lineage(node:Node):
+        """ Return the names of the node's ancestors, from the root down, followed by the node's own name. """
+        names = []
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        names.reverse()
+        return names
+
+
+_current_index = ContextVar('node_index', default=None)
+
+
+@contextmanager
+def indexed(root:Node):
+    """
+    Put an index of the model rooted at root in effect for the duration of the with block, which must not change the
+    model. If an index of the same model is already in effect, it's reused.
+    """
+    index = _current_index.get()
+    if index is not None and index.root is root:
+        yield index
+        return
+    token = _current_index.set(NodeIndex(root) if root is not None else None)
+    try:
+        yield _current_index.get()
+    finally:
+        _current_index.reset(token)
+
+
+def index_for(node:Node):
+    """ Return the index in effect if it covers node, else None. """
+    index = _current_index.get()
+    if index is not None and node is not None and index.covers(node):
+        return index
+    return None
+
+
+def find_descendant(node:Node, name:str):
+    """ Same as node.find_descendant(name). """
+    index = index_for(node)
+    if index is not None:
+        return index.find_first(name, node)
+    return node.find_descendant(name)
+
+
+def find_all_descendants(node:Node, name:str, descendants:list=None):
+    """ Same as node.find_all_descendants(name, descendants), but also returns the list. """
+    if descendants is None:
+        descendants = []
+    index = index_for(node)
+    if index is not None:
+        descendants.extend(index.find_all(name, node))
+    else:
+        node.find_all_descendants(name, descendants)
+    return descendants
+
+
+def find_all_nodes_by_path(node:Node, path:list):
+    """ Same as node.find_all_nodes_by_path(path). """
+    index = index_for(node)
+    if index is not None:
+        return index.find_all_by_path(path, node)
+    return node.find_all_nodes_by_path(path)
@@ -19,34 +19,47 @@ import re
 import uuid
 
 from webapp.auth import user_data
+import webapp.home.utils.fixups as fixups
 from webapp.home.utils.node_utils import get_unit_text
 from metapype.eml import names
 from metapype.model.node import Node
 from webapp.home.home_utils import log_info
 
 
-def add_attribute_ids(eml_node):
+class AttributeIdsFixup(fixups.Fixup):
     """
     Add a UUID id attribute for each attribute node that doesn't already have an id.
-    Caller is responsible for saving the updated model. Returns True iff the model has been modified.
     """
-    attribute_ids = set()
-    modified = False
-    attribute_nodes = []
-    eml_node.find_all_descendants(names.ATTRIBUTE, attribute_nodes)
-    for attribute_node in attribute_nodes:
-        attribute_id = attribute_node.attribute_value('id')
+    name = 'add_attribute_ids'
+    node_names = (names.ATTRIBUTE,)
+
+    def __init__(self):
+        self.attribute_ids = set()
+        self.modified = False
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        attribute_id = node.attribute_value('id')
         if not attribute_id:
-            attribute_node.add_attribute('id', str(uuid.uuid4()))
-            modified = True
-        elif attribute_id in attribute_ids:
+            attribute_id = str(uuid.uuid4())
+            node.add_attribute('id', attribute_id)
+            self.modified = True
+        elif attribute_id in self.attribute_ids:
             # There was a bug such that cloning an attribute copied the id, thereby creating
             #  a duplicate ID, which is an EML error. Detect and fix such cases.
             attribute_id = str(uuid.uuid4())
-            attribute_node.attributes['id'] = attribute_id
-            modified = True
-        attribute_ids.add(attribute_id)
-    return modified
+            node.attributes['id'] = attribute_id
+            self.modified = True
+        self.attribute_ids.add(attribute_id)
+
+
+def add_attribute_ids(eml_node):
+    """
+    Add a UUID id attribute for each attribute node that doesn't already have an id.
+    Caller is responsible for saving the updated model. Returns True iff the model has been modified.
+    """
+    fixup = AttributeIdsFixup()
+    fixups.run_fixups(eml_node, [fixup])
+    return fixup.modified
 
 
 def convert_special_characters(in_string):
@@ -68,96 +81,121 @@ def convert_special_characters(in_string):
     return out_string
 
 
-def add_qudt_annotations(eml_node, automatically_add=True, overwrite_existing=False):
+def _has_existing_unit_annotation(attribute_node):
     """
-    Add QUDT unit annotations where available.
-
-    Caller is responsible for saving the updated model. Returns True iff the model has been modified.
+    Check if an annotation with 'hasUnit' exists.
+    Note that the attribute may have multiple annotations, not just QUDT ones.
     """
-    def has_existing_unit_annotation(attribute_node):
-        """
-        Check if an annotation with 'hasUnit' exists.
-        Note that the attribute may have multiple annotations, not just QUDT ones.
-        """
-        annotaton_nodes = attribute_node.find_all_children(names.ANNOTATION)
-        for annotation_node in annotaton_nodes:
-            property_uri_node = annotation_node.find_child(names.PROPERTYURI)
-            if property_uri_node and '//qudt.org/schema/qudt/hasUnit' in (property_uri_node.content or ""):
-                return True
+    annotaton_nodes = attribute_node.find_all_children(names.ANNOTATION)
+    for annotation_node in annotaton_nodes:
+        property_uri_node = annotation_node.find_child(names.PROPERTYURI)
+        if property_uri_node and '//qudt.org/schema/qudt/hasUnit' in (property_uri_node.content or ""):
+            return True
+    return False
+
+
+def _node_matches(annotation_node, qudt_label, qudt_uri):
+    property_uri_node = annotation_node.find_child(names.PROPERTYURI)
+    value_uri_node = annotation_node.find_child(names.VALUEURI)
+    if not property_uri_node or not value_uri_node:
+        return False
+    if property_uri_node.attribute_value('label') != 'has unit':
         return False
+    if property_uri_node.content != 'http://qudt.org/schema/qudt/hasUnit':
+        return False
+    if value_uri_node.attribute_value('label') != qudt_label:
+        log_info(f"node_matches: label mismatch: {value_uri_node.attribute_value('label')} {qudt_label}")
+        # We used to demand the labels to match but then realized the units working group
+        #  may change labels at some point
+        # return False
+    if value_uri_node.content != qudt_uri:
+        return False
+    return True
 
-    def node_matches(annotation_node, qudt_label, qudt_uri):
+
+def _remove_existing_unit_annotation(attribute_node, qudt_label, qudt_uri):
+    """Remove existing unit annotation if it is different from what we're about to add."""
+    annotation_node = attribute_node.find_child(names.ANNOTATION)
+    if annotation_node:
         property_uri_node = annotation_node.find_child(names.PROPERTYURI)
-        value_uri_node = annotation_node.find_child(names.VALUEURI)
-        if not property_uri_node or not value_uri_node:
-            return False
-        if property_uri_node.attribute_value('label') != 'has unit':
-            return False
-        if property_uri_node.content != 'http://qudt.org/schema/qudt/hasUnit':
-            return False
-        if value_uri_node.attribute_value('label') != qudt_label:
-            log_info(f"node_matches: label mismatch: {value_uri_node.attribute_value('label')} {qudt_label}")
-            # We used to demand the labels to match but then realized the units working group
-            #  may change labels at some point
-            # return False
-        if value_uri_node.content != qudt_uri:
-            return False
-        return True
-
-    def remove_existing_unit_annotation(attribute_node, qudt_label, qudt_uri):
-        """Remove existing unit annotation if it is different from what we're about to add."""
-        annotation_node = attribute_node.find_child(names.ANNOTATION)
-        if annotation_node:
-            property_uri_node = annotation_node.find_child(names.PROPERTYURI)
-            if property_uri_node and 'hasUnit' in (property_uri_node.content or ""):
-                # See if the existing node is different from what we're about to add.
-                if not node_matches(annotation_node, qudt_label, qudt_uri):
-                    from webapp.home.log_usage import annotations_actions, log_qudt_annotations_usage
-                    log_qudt_annotations_usage(
-                        annotations_actions['REMOVE_FROM_EML'],
-                        attribute_node)
-                    attribute_node.remove_child(annotation_node)
-
-    enable_automatic_qudt_annotations, replace_preexisting_qudt_annotations = user_data.get_qudt_annotations_settings()
-    qudt_info_df = pd.read_csv('webapp/static/unitsWithQUDTInfo.csv')
-    attribute_nodes = eml_node.find_all_nodes_by_path([names.DATASET, names.DATATABLE, names.ATTRIBUTELIST, names.ATTRIBUTE])
-    for attribute_node in attribute_nodes:
-        unit_text = get_unit_text(attribute_node)
-        if unit_text:
-            my_qudt_info_df = qudt_info_df[
-                qudt_info_df["unit"].str.strip().str.lower() == unit_text.lower()
-            ]
-            my_qudt_info_df = my_qudt_info_df[
-                (~my_qudt_info_df["qudtUri"].duplicated()) &
-                (my_qudt_info_df["qudtUri"].notna()) &
-                (my_qudt_info_df["unit"].notna()) &
-                (my_qudt_info_df["unit"] != "NA")
-            ]
-            if len(my_qudt_info_df) == 1:
-                if is_rejected_annotation(attribute_node.id):
-                    continue
-                if not enable_automatic_qudt_annotations and not is_accepted_annotation(attribute_node.id):
-                    continue
-                qudt_label = my_qudt_info_df.iloc[0]["qudtLabel"].strip()
-                qudt_uri = my_qudt_info_df.iloc[0]["qudtUri"]
-                if has_existing_unit_annotation(attribute_node) and replace_preexisting_qudt_annotations:
-                    remove_existing_unit_annotation(attribute_node, qudt_label, qudt_uri)
-                if not has_existing_unit_annotation(attribute_node):
-                    annotation_node = Node(names.ANNOTATION)
-                    attribute_node.add_child(annotation_node)
-                    property_uri_node = Node(names.PROPERTYURI)
-                    annotation_node.add_child(property_uri_node)
-                    property_uri_node.add_attribute('label', 'has unit')
-                    property_uri_node.content = 'http://qudt.org/schema/qudt/hasUnit'
-                    value_uri_node = Node(names.VALUEURI)
-                    annotation_node.add_child(value_uri_node)
-                    value_uri_node.add_attribute('label', qudt_label)
-                    value_uri_node.content = qudt_uri
-                    # Log it
-                    from webapp.home.log_usage import annotations_actions, log_qudt_annotations_usage
-                    log_qudt_annotations_usage(
-                        annotations_actions['ADD_TO_EML'],
-                        attribute_node)
+        if property_uri_node and 'hasUnit' in (property_uri_node.content or ""):
+            # See if the existing node is different from what we're about to add.
+            if not _node_matches(annotation_node, qudt_label, qudt_uri):
+                from webapp.home.log_usage import annotations_actions, log_qudt_annotations_usage
+                log_qudt_annotations_usage(
+                    annotations_actions['REMOVE_FROM_EML'],
+                    attribute_node)
+                attribute_node.remove_child(annotation_node)
+
+
+QUDT_ATTRIBUTE_PATH = [names.DATASET, names.DATATABLE, names.ATTRIBUTELIST, names.ATTRIBUTE]
+
+
+class QudtAnnotationsFixup(fixups.Fixup):
+    """
+    Add QUDT unit annotations where available.
+    """
+    name = 'add_qudt_annotations'
+    node_names = (names.ATTRIBUTE,)
+
+    def __init__(self):
+        self.attribute_nodes = []
+
+    def visit(self, node:Node, run:fixups.FixupRun):
+        if fixups.has_lineage(node, QUDT_ATTRIBUTE_PATH):
+            self.attribute_nodes.append(node)
+
+    def finish(self, eml_node:Node, run:fixups.FixupRun):
+        enable_automatic_qudt_annotations, replace_preexisting_qudt_annotations = user_data.get_qudt_annotations_settings()
+        qudt_info_df = pd.read_csv('webapp/static/unitsWithQUDTInfo.csv')
+        for attribute_node in self.attribute_nodes:
+            if not run.is_live(attribute_node):
+                continue
+            unit_text = get_unit_text(attribute_node)
+            if unit_text:
+                my_qudt_info_df = qudt_info_df[
+                    qudt_info_df["unit"].str.strip().str.lower() == unit_text.lower()
+                ]
+                my_qudt_info_df = my_qudt_info_df[
+                    (~my_qudt_info_df["qudtUri"].duplicated()) &
+                    (my_qudt_info_df["qudtUri"].notna()) &
+                    (my_qudt_info_df["unit"].notna()) &
+                    (my_qudt_info_df["unit"] != "NA")
+                ]
+                if len(my_qudt_info_df) == 1:
+                    if is_rejected_annotation(attribute_node.id):
+                        continue
+                    if not enable_automatic_qudt_annotations and not is_accepted_annotation(attribute_node.id):
+                        continue
+                    qudt_label = my_qudt_info_df.iloc[0]["qudtLabel"].strip()
+                    qudt_uri = my_qudt_info_df.iloc[0]["qudtUri"]
+                    if _has_existing_unit_annotation(attribute_node) and replace_preexisting_qudt_annotations:
+                        _remove_existing_unit_annotation(attribute_node, qudt_label, qudt_uri)
+                    if not _has_existing_unit_annotation(attribute_node):
+                        annotation_node = Node(names.ANNOTATION)
+                        attribute_node.add_child(annotation_node)
+                        property_uri_node = Node(names.PROPERTYURI)
+                        annotation_node.add_child(property_uri_node)
+                        property_uri_node.add_attribute('label', 'has unit')
+                        property_uri_node.content = 'http://qudt.org/schema/qudt/hasUnit'
+                        value_uri_node = Node(names.VALUEURI)
+                        annotation_node.add_child(value_uri_node)
+                        value_uri_node.add_attribute('label', qudt_label)
+                        value_uri_node.content = qudt_uri
+                        # Log it
+                        from webapp.home.log_usage import annotations_actions, log_qudt_annotations_usage
+                        log_qudt_annotations_usage(
+                            annotations_actions['ADD_TO_EML'],
+                            attribute_node)
+
+
+def add_qudt_annotations(eml_node, automatically_add=True, overwrite_existing=False):
+    """
+    Add QUDT unit annotations where available. See QudtAnnotationsFixup.
+
+    Caller is responsible for saving the updated model.
+    """
+    fixups.run_fixups(eml_node, [QudtAnnotationsFixup()])
 
 
 
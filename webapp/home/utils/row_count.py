@@ -0,0 +1,194 @@
+"""
+Counting the rows of data table files.
+
+Uploading a data table and checking its contents both need to know how many rows the table has. They used to find out
+by having pandas parse the first column of the whole file, which builds a DataFrame just to take its length, and then
+read the file again. count_rows() instead scans the file's bytes once, via mmap, a block at a time with numpy, and gets
+the count that pandas would: it respects the delimiter and the quote character, so line breaks inside quoted fields
+don't end a row, and it skips blank lines and lines that contain only whitespace, as pandas does by default.
+
+The scan assumes that quotes are used as pandas' C parser uses them: a field is quoted if it starts with the quote
+character, and quote characters within a quoted field are doubled. If the file doesn't follow that convention, e.g.,
+a quote character appears in the middle of an unquoted field, or if lines end with a lone CR, or if the file isn't
+local (i.e., it's given by an http URL), we fall back to pandas.
+
+The scan computes the file's MD5 hash along the way. Counts are cached in the evaluation store (see eval_store.py), so
+they're shared by all of the app's processes, keyed by the file's size and hash, along with the delimiter and quote
+character. The hash, in turn, is cached under the file's pathname, size, and modification time. So checking a table
+again, or refreshing the badges, doesn't read the file at all.
+"""
+
+import hashlib
+import mmap
+import os
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+import webapp.home.utils.eval_store as eval_store
+from webapp.home.utils.subtree_digest import combine_digests
+
+
+# Bytes scanned at a time. The scan makes a few temporary arrays the size of a block.
+BLOCK_SIZE = 4 << 20
+
+_LF = ord('\n')
+_CR = ord('\r')
+_SPACE = ord(' ')
+_TAB = ord('\t')
+
+
+def _local_pathname(path):
+    """ Return the pathname of a local file given as a pathname or file:// URL, or None if it's another kind of URL. """
+    parsed = urlparse(path)
+    if parsed.scheme == 'file':
+        return os.path.join(parsed.netloc, parsed.path) if parsed.netloc else parsed.path
+    if parsed.scheme and len(parsed.scheme) > 1:
+        return None
+    return path
+
+
+def _hash_key(pathname, stat):
+    return combine_digests('data file md5', os.path.realpath(pathname), stat.st_size, stat.st_mtime_ns)
+
+
+def _count_key(md5, size, delimiter, quote_char):
+    return combine_digests('data file rows', md5, size, delimiter, quote_char)
+
+
+def count_rows_with_pandas(path, delimiter=',', quote_char='"'):
+    """ Return the number of rows, as pandas reads them, by having pandas parse the first column. """
+    df = pd.read_csv(path, encoding='utf8', usecols=[0], sep=delimiter, quotechar=quote_char)
+    return df.shape[0]
+
+
+def scan_file(pathname, delimiter=',', quote_char='"'):
+    """
+    Scan a file and return its MD5 hash and the number of rows pandas would read from it, not counting the header row.
+    The count is None if the file doesn't follow the conventions we assume (see above), in which case it has to be
+    counted by pandas.
+
+    Line breaks, CRs, and quote characters are sparse, so the scan works with their positions rather than with arrays
+    the size of the block. A line counts as a row unless it's empty or contains only whitespace.
+    """
+    md5 = hashlib.md5()
+    size = os.path.getsize(pathname)
+    if size == 0:
+        return md5.hexdigest(), 0
+    countable = len(delimiter) == 1 and len(quote_char) == 1 and delimiter.isascii() and quote_char.isascii()
+    if countable:
+        delimiter_byte = ord(delimiter)
+        quote_byte = ord(quote_char)
+        # Whitespace, for the purpose of deciding whether a line is blank. A CR is part of a CRLF line break.
+        blank = bytes(c for c in b' \t\r' if c != delimiter_byte)
+        field_starts = np.array([delimiter_byte, quote_byte, _LF], dtype=np.uint8)
+
+    records = 0
+    in_quotes = False           # Whether the block starts within a quoted field
+    line_has_content = False    # Whether the line that's still open at the start of the block has anything in it
+    with open(pathname, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, size, BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, size)
+            data = mm[start:end]
+            md5.update(data)
+            if not countable:
+                continue
+            block = np.frombuffer(data, dtype=np.uint8)
+
+            # pandas treats a CR that isn't followed by an LF idiosyncratically, e.g., a delimiter that follows a blank
+            #  line ended by a lone CR is dropped. Such files are rare, so we leave them to pandas.
+            carriage_returns = np.flatnonzero(block == _CR)
+            if len(carriage_returns):
+                following = block[np.minimum(carriage_returns + 1, len(block) - 1)].copy()
+                if carriage_returns[-1] == len(block) - 1:
+                    following[-1] = mm[end] if end < size else 0
+                if (following != _LF).any():
+                    countable = False
+                    continue
+
+            line_breaks = np.flatnonzero(block == _LF)
+            quotes = np.flatnonzero(block == quote_byte)
+            if len(quotes):
+                # A quote opens a quoted field if an even number of quotes precede it. The field must start with it,
+                #  unless it follows a closing quote, in which case it's an escaped quote within the field.
+                opening = quotes[(np.arange(len(quotes)) + in_quotes) % 2 == 0]
+                preceding = block[np.maximum(opening - 1, 0)].copy()
+                if len(opening) and opening[0] == 0:
+                    preceding[0] = mm[start - 1] if start else _LF
+                if not np.isin(preceding, field_starts).all():
+                    countable = False
+                    continue
+                # A line break is within a quoted field if an odd number of quotes precede it.
+                quoted = (np.searchsorted(quotes, line_breaks) + in_quotes) % 2 == 1
+                line_breaks = line_breaks[~quoted]
+                in_quotes = (len(quotes) + in_quotes) % 2 == 1
+            elif in_quotes:
+                line_breaks = line_breaks[:0]
+
+            if len(line_breaks):
+                # Where a line ends with something other than whitespace, it has content. Otherwise, look at the line.
+                last = line_breaks - 1
+                crlf = block[np.maximum(last, 0)] == _CR
+                last[crlf] -= 1
+                line_starts = np.concatenate(([0], line_breaks[:-1] + 1))
+                ends_in_content = (last >= line_starts) & ~np.isin(block[np.maximum(last, 0)], list(blank))
+                has_content = ends_in_content.tolist()
+                for i in np.flatnonzero(~ends_in_content).tolist():
+                    has_content[i] = bool(data[line_starts[i]:line_breaks[i]].strip(blank))
+                has_content[0] = has_content[0] or line_has_content
+                records += sum(has_content)
+                line_has_content = bool(data[line_breaks[-1] + 1:].strip(blank))
+            else:
+                line_has_content = line_has_content or bool(data.strip(blank))
+
+    if not countable or in_quotes:
+        # An unterminated quoted field is an error that pandas reports.
+        return md5.hexdigest(), None
+    if line_has_content:
+        records += 1
+    # The first row is the header.
+    return md5.hexdigest(), max(records - 1, 0)
+
+
+def file_md5(pathname):
+    """ Return the MD5 hash of a local file. The hash is cached, as it is for count_rows(), so it's shared with it. """
+    stat = os.stat(pathname)
+    hash_key = _hash_key(pathname, stat)
+    md5 = eval_store.get(hash_key)
+    if md5 is None:
+        hasher = hashlib.md5()
+        with open(pathname, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                hasher.update(block)
+        md5 = hasher.hexdigest()
+        eval_store.put_many([(hash_key, md5)])
+    return md5
+
+
+def count_rows(path, delimiter=',', quote_char='"'):
+    """
+    Return the number of rows in a CSV file, given as a pathname or URL, not counting the header row -- i.e., the
+    number of rows in the DataFrame pandas would read from it.
+    """
+    if delimiter == '\\t':
+        delimiter = '\t'
+    if not quote_char:
+        quote_char = '"'
+    pathname = _local_pathname(path)
+    if pathname is None or not os.path.isfile(pathname):
+        return count_rows_with_pandas(path, delimiter=delimiter, quote_char=quote_char)
+
+    stat = os.stat(pathname)
+    hash_key = _hash_key(pathname, stat)
+    md5 = eval_store.get(hash_key)
+    if md5 is not None:
+        num_rows = eval_store.get(_count_key(md5, stat.st_size, delimiter, quote_char))
+        if num_rows is not None:
+            return num_rows
+
+    md5, num_rows = scan_file(pathname, delimiter=delimiter, quote_char=quote_char)
+    if num_rows is None:
+        num_rows = count_rows_with_pandas(pathname, delimiter=delimiter, quote_char=quote_char)
+    eval_store.put_many([(hash_key, md5), (_count_key(md5, stat.st_size, delimiter, quote_char), num_rows)])
+    return num_rows
@@ -0,0 +1,130 @@
+"""
+Per-process registry of compiled EML schemas, for validating XML documents against the EML XML Schema.
+
+emlvp's Validator compiles the schema -- i.e., reads and parses the whole set of EML XSD files -- each time it validates
+a document. parse_and_validate() used to make a new Validator for every call. Instead, we compile each EML version's
+schema once per process and keep it, and validate against the compiled schema.
+
+If Config.PRELOAD_SCHEMA_VALIDATORS is True, the schemas are compiled when the app is loaded (see webapp/__init__.py).
+Under uWSGI, without lazy-apps, that happens in the master process before it forks the workers, so the workers share
+the compiled schemas' pages copy-on-write rather than each compiling its own.
+
+Compile times and hit/miss counts are available via registry_stats().
+"""
+
+import threading
+import time
+
+from lxml import etree
+
+from emlvp import exceptions
+import emlvp.validator as validator
+from emlvp.validator import Validator
+
+from webapp.config import Config
+from webapp.home.home_utils import log_info
+
+
+# Namespace that identifies each EML version, and the root schema for the version, relative to emlvp's schema path.
+EML_SCHEMAS = [
+    ("https://eml.ecoinformatics.org/eml-2.2.0", "/EML2.2.0/xsd/eml.xsd"),
+    ("eml://ecoinformatics.org/eml-2.1.1", "/EML2.1.1/eml.xsd"),
+    ("eml://ecoinformatics.org/eml-2.1.0", "/EML2.1.0/eml.xsd")
+]
+
+_schemas = {}  # schema pathname -> compiled etree.XMLSchema
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'compile_seconds': {}}
+
+
+def schema_pathname_for(xml:str):
+    """ Return the pathname of the root schema for the EML version of the given XML document. """
+    schema_path = validator.schema_path()
+    for namespace, schema in EML_SCHEMAS:
+        if namespace in xml:
+            return schema_path + schema
+    raise ValueError("Cannot determine EML schema")
+
+
+def get_schema(schema_pathname:str):
+    """
+    Return the compiled schema whose root schema file is at schema_pathname, compiling it if need be.
+    Raises etree.XMLSchemaParseError if the schema can't be compiled. Failures aren't cached, so we'll try again the
+    next time.
+    """
+    schema = _schemas.get(schema_pathname)
+    if schema is not None:
+        _stats['hits'] += 1
+        return schema
+    with _lock:
+        schema = _schemas.get(schema_pathname)
+        if schema is not None:
+            _stats['hits'] += 1
+            return schema
+        _stats['misses'] += 1
+        start = time.perf_counter()
+        schema = etree.XMLSchema(file=schema_pathname)
+        elapsed = time.perf_counter() - start
+        _stats['compile_seconds'][schema_pathname] = elapsed
+        log_info(f'schema_validators: compiled {schema_pathname} in {elapsed * 1000:.1f} ms')
+        _schemas[schema_pathname] = schema
+        return schema
+
+
+class CachedValidator(Validator):
+    """
+    A Validator that validates against the registry's compiled schema rather than compiling the schema anew for each
+    document. It raises the same exceptions as Validator.validate().
+    """
+
+    def validate(self, xml: str):
+        try:
+            xml = xml.encode("utf-8")
+        except UnicodeEncodeError as e:
+            raise exceptions.UTF8Error(e)
+
+        try:
+            doc = etree.fromstring(xml)
+            get_schema(self.schema).assertValid(doc)
+        except etree.DocumentInvalid as e:
+            raise exceptions.ValidationError(e.error_log)
+        except etree.ParserError as e:
+            raise exceptions.ParserError(e)
+        except etree.XIncludeError as e:
+            raise exceptions.XIncludeError(e)
+        except etree.XMLSchemaParseError as e:
+            raise exceptions.XMLSchemaParseError(e)
+        except etree.XMLSyntaxError as e:
+            raise exceptions.XMLSyntaxError(e)
+
+
+def get_validator(schema_pathname:str):
+    """ Return a validator for the root schema at schema_pathname. Drop-in replacement for Validator(schema). """
+    return CachedValidator(schema_pathname)
+
+
+def preload_schema_validators():
+    """
+    Compile the schemas for all the EML versions we know about. A schema that can't be compiled isn't an error here:
+    some can't be compiled by lxml at all (e.g., the EML 2.1.1 schema refers to xml:lang without importing the xml
+    namespace), and they're left to be compiled when a document needs them, as they were before the registry.
+    """
+    schema_path = validator.schema_path()
+    for _, schema in EML_SCHEMAS:
+        try:
+            get_schema(schema_path + schema)
+        except Exception as e:
+            log_info(f'schema_validators: not preloading {schema_path + schema}: {e}')
+
+
+def preload_enabled():
+    return getattr(Config, 'PRELOAD_SCHEMA_VALIDATORS', False)
+
+
+def registry_stats():
+    """ Return the hit and miss counts and the compile time, in seconds, for each schema compiled in this process. """
+    return {
+        'hits': _stats['hits'],
+        'misses': _stats['misses'],
+        'compile_seconds': dict(_stats['compile_seconds'])
+    }
@@ -0,0 +1,56 @@
+"""
+Digests of subtrees of a model, for telling which parts of a document have changed.
+
+A document's fingerprint (see document_meta.py) tells us whether anything in the document has changed, but not what.
+subtree_digest() hashes a single subtree -- the names, ids, content, and attributes of its nodes, in document order --
+so callers that cache results computed from parts of a document (e.g., the Check Metadata evaluation, section by
+section) can tell which of those results are still good.
+
+Node ids are included because results often embed them, e.g., in links to the pages where problems can be fixed.
+Callers whose results don't depend on the ids can leave them out, so that copies of a subtree have the same digest.
+Tails, prefixes, and nsmaps are not included, since they don't affect the meaning of the content.
+"""
+
+import hashlib
+
+from metapype.model.node import Node
+
+
+DIGEST_SIZE = 16
+
+
+def _node_record(node:Node, depth:int, ids:bool=True):
+    # The depth, along with document order, is enough to recover the shape of the tree, so two different trees can't
+    #  produce the same sequence of records.
+    attributes = repr(sorted(node.attributes.items())) if node.attributes else ''
+    node_id = node.id if ids else ''
+    return f'{depth}\x1f{node.name}\x1f{node_id}\x1f{node.content!r}\x1f{attributes}\x1e'.encode('utf-8')
+
+
+def subtree_digest(node:Node, visit=None, ids:bool=True):
+    """
+    Return the digest of the subtree rooted at node, as a hex string. If visit is given, it's called with each node of
+    the subtree, in document order, so callers can collect whatever else they need in the same walk. If ids is False,
+    node ids are left out of the digest.
+    """
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    if node is None:
+        return hasher.hexdigest()
+    stack = [(node, 0)]
+    while stack:
+        node, depth = stack.pop()
+        hasher.update(_node_record(node, depth, ids))
+        if visit:
+            visit(node)
+        # Push the children in reverse so they're visited in document order.
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    return hasher.hexdigest()
+
+
+def combine_digests(*parts):
+    """ Return a digest of the given parts, which may be digests or other values with a stable repr(). """
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        hasher.update(part.encode('utf-8') if isinstance(part, str) else repr(part).encode('utf-8'))
+        hasher.update(b'\x1e')
+    return hasher.hexdigest()
@@ -0,0 +1,144 @@
+"""
+Durable queue of Check All Data Tables' checks for the background worker (see webapp/home/eval_worker.py).
+
+When Config.EVALUATION_WORKER is True, Check All Data Tables doesn't check the tables in the request. Instead, it
+enqueues a job for each table -- "check table T of document D with metadata settings H" -- and returns, and the Check
+Data Tables page polls for the progress (see TableCheckProgress in table_check_scheduler.py). The worker takes jobs off
+the queue, checks the tables, and saves the results, so a package with dozens of large tables no longer runs into
+uWSGI's harakiri timeout.
+
+The worker has no user session, so a job carries everything the check would otherwise get from the session: the
+user's folder, the document's uploads folder, and the URLs of the EML and CSV files. It also carries a snapshot of the
+table's node in the model, from metapype_io.to_json(), so the worker needn't load the document.
+
+The queue is a SQLite table in user-data/__db/table_check_queue.sqlite3, shared by all of the app's processes. There's
+at most one job per CSV file: enqueuing a job for a table that already has one with the same metadata hash leaves it as
+it is, whether or not a worker has claimed it, and otherwise replaces it. If a worker dies holding a job, the job is
+claimed again after CLAIM_TIMEOUT seconds, up to MAX_ATTEMPTS times. A job that has used up its attempts is removed
+when it's released, or replaced when it's enqueued again; the user asked for the check, so asking again should try
+again.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from webapp.config import Config
+from webapp.home.home_utils import log_error
+
+
+QUEUE_FILENAME = 'table_check_queue.sqlite3'
+# Seconds after which a claimed job that hasn't been completed is presumed abandoned. Checking a large table can take
+#  several minutes.
+CLAIM_TIMEOUT = 3600
+# Number of times a job is claimed before we give up on it
+MAX_ATTEMPTS = 2
+
+TableCheckJob = namedtuple('TableCheckJob', ['uploads_folder', 'csv_filename', 'user_folder', 'doc_name', 'owner',
+                                             'data_table_name', 'metadata_hash', 'eml_file_url', 'csv_file_url',
+                                             'data_table_json', 'attempts'])
+
+_COLUMNS = ', '.join(TableCheckJob._fields[:-1])
+
+_local = threading.local()
+
+
+def queue_pathname():
+    return os.path.join(Config.USER_DATA_DIR, '__db', QUEUE_FILENAME)
+
+
+def _connection():
+    # Connections can't be shared across a fork, so each process (and each thread) opens its own.
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'pid', None) == os.getpid():
+        return conn
+    pathname = queue_pathname()
+    os.makedirs(os.path.dirname(pathname), exist_ok=True)
+    conn = sqlite3.connect(pathname, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                 'uploads_folder TEXT NOT NULL, csv_filename TEXT NOT NULL, user_folder TEXT NOT NULL, '
+                 'doc_name TEXT NOT NULL, owner TEXT NOT NULL, data_table_name TEXT NOT NULL, '
+                 'metadata_hash TEXT NOT NULL, eml_file_url TEXT, csv_file_url TEXT, data_table_json TEXT NOT NULL, '
+                 'enqueued_at REAL NOT NULL, claimed_at REAL, attempts INTEGER NOT NULL DEFAULT 0, '
+                 'PRIMARY KEY (uploads_folder, csv_filename))')
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_enqueued_at ON jobs (enqueued_at)')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+def enqueue(job:TableCheckJob):
+    """ Ask for a table to be checked. Returns True if the job is queued, which it already may have been. """
+    try:
+        conn = _connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT metadata_hash, attempts, claimed_at FROM jobs '
+                               'WHERE uploads_folder = ? AND csv_filename = ?',
+                               (job.uploads_folder, job.csv_filename)).fetchone()
+            if row and row[0] == job.metadata_hash:
+                _, attempts, claimed_at = row
+                # Unless a worker died holding the job on its last attempt, in which case it will never be claimed.
+                if attempts < MAX_ATTEMPTS or (claimed_at or 0) >= time.time() - CLAIM_TIMEOUT:
+                    return True
+            conn.execute(f'INSERT OR REPLACE INTO jobs ({_COLUMNS}, enqueued_at, claimed_at, attempts) '
+                         f'VALUES ({", ".join("?" * (len(TableCheckJob._fields) - 1))}, ?, NULL, 0)',
+                         (*job[:-1], time.time()))
+        return True
+    except Exception as e:
+        log_error(f'table_check_queue.enqueue: {job.csv_filename}: {e}')
+        return False
+
+
+def claim():
+    """ Claim the oldest job that's waiting, or was abandoned by a worker. Returns the TableCheckJob, or None. """
+    now = time.time()
+    try:
+        conn = _connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(f'SELECT {_COLUMNS}, attempts FROM jobs '
+                               'WHERE attempts < ? AND (claimed_at IS NULL OR claimed_at < ?) '
+                               'ORDER BY enqueued_at LIMIT 1',
+                               (MAX_ATTEMPTS, now - CLAIM_TIMEOUT)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE jobs SET claimed_at = ?, attempts = attempts + 1 '
+                         'WHERE uploads_folder = ? AND csv_filename = ?', (now, row[0], row[1]))
+        return TableCheckJob(*row[:-1], row[-1] + 1)
+    except Exception as e:
+        log_error(f'table_check_queue.claim: {e}')
+        return None
+
+
+def complete(job:TableCheckJob):
+    """ Remove the job, unless it's been replaced by a job for other metadata settings. """
+    try:
+        with _connection() as conn:
+            conn.execute('DELETE FROM jobs WHERE uploads_folder = ? AND csv_filename = ? AND metadata_hash = ?',
+                         (job.uploads_folder, job.csv_filename, job.metadata_hash))
+    except Exception as e:
+        log_error(f'table_check_queue.complete: {job.csv_filename}: {e}')
+
+
+def release(job:TableCheckJob):
+    """
+    Put a claimed job back on the queue, e.g., after a failure, unless it's used up its attempts, in which case it's
+    removed. Returns True if the job was given up on.
+    """
+    given_up = job.attempts >= MAX_ATTEMPTS
+    try:
+        with _connection() as conn:
+            if given_up:
+                conn.execute('DELETE FROM jobs WHERE uploads_folder = ? AND csv_filename = ? AND metadata_hash = ?',
+                             (job.uploads_folder, job.csv_filename, job.metadata_hash))
+            else:
+                conn.execute('UPDATE jobs SET claimed_at = NULL '
+                             'WHERE uploads_folder = ? AND csv_filename = ? AND metadata_hash = ?',
+                             (job.uploads_folder, job.csv_filename, job.metadata_hash))
+    except Exception as e:
+        log_error(f'table_check_queue.release: {job.csv_filename}: {e}')
+    return given_up
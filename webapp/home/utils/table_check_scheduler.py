@@ -0,0 +1,184 @@
+"""
+Scheduling of Check Data Tables' checks of whole tables, for Check All Data Tables.
+
+Check All Data Tables used to check a package's tables one after another, in the request, so a package with dozens of
+tables could take minutes and hit uWSGI's harakiri timeout. run_table_checks() instead runs the checks in a pool of
+worker processes and yields each table's result as soon as its check completes, so the caller can save it and report
+progress (see TableCheckProgress) while the other checks run. The request still waits for all of the checks, though,
+so that only shortens the wait. When Config.EVALUATION_WORKER is True, the checks are instead handed to the background
+worker (see table_check_queue.py and webapp/home/eval_worker.py), and the request returns at once.
+
+The progress is kept in .<document name>.progress in the user's folder, alongside the document's .lock, .meta, and
+.model files, where it isn't taken for a document. If the request checking the tables is killed, e.g., by harakiri,
+the file is left behind, so progress that hasn't been updated for PROGRESS_STALE_SECONDS is ignored, and the garbage
+collector (webapp/gc.py) removes it.
+
+The checks are limited per user and globally, whether they're run by the pool or by the worker. A check holds a slot for
+its user and a slot for the app as a whole while it runs. The slots are flock()s on files in
+user-data/__db/table_check_slots, so they're respected by all of the app's processes, and they're released if a process
+dies. Config.CHECK_DATA_TABLES_PROCESSES_PER_USER is the number of slots per user, which is also the size of the pool,
+and Config.CHECK_DATA_TABLES_MAX_PROCESSES is the number of slots for the app as a whole.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, ExitStack
+import fcntl
+import json
+import multiprocessing
+import os
+import time
+
+from webapp.config import Config
+from webapp.home.utils.file_utils import atomic_write, document_root, document_write_lock, sanitize_filename
+
+
+SLOTS_DIRNAME = 'table_check_slots'
+DEFAULT_MAX_PROCESSES = 4
+# How often a check that's waiting for a slot tries again, in seconds
+SLOT_POLL_SECONDS = 0.2
+PROGRESS_FILE_SUFFIX = '.progress'
+# Seconds after which progress that hasn't been updated is presumed abandoned
+PROGRESS_STALE_SECONDS = 3600
+
+
+def progress_pathname(json_pathname:str):
+    """ Return the pathname of the progress file for the document whose JSON file is at json_pathname. """
+    dirname, basename = os.path.split(json_pathname)
+    return os.path.join(dirname, f'.{document_root(basename)}{PROGRESS_FILE_SUFFIX}')
+
+
+def processes_per_user():
+    return getattr(Config, 'CHECK_DATA_TABLES_PROCESSES_PER_USER', 1) or 1
+
+
+def max_processes():
+    return getattr(Config, 'CHECK_DATA_TABLES_MAX_PROCESSES', DEFAULT_MAX_PROCESSES) or 1
+
+
+def slots_dirname():
+    return os.path.join(Config.USER_DATA_DIR, '__db', SLOTS_DIRNAME)
+
+
+@contextmanager
+def slot(prefix:str, num_slots:int):
+    """ Hold one of num_slots slots with the given prefix, waiting until one is free. """
+    dirname = slots_dirname()
+    os.makedirs(dirname, exist_ok=True)
+    pathnames = [os.path.join(dirname, f'{prefix}-{i}.lock') for i in range(num_slots)]
+    while True:
+        for pathname in pathnames:
+            lock_file = open(pathname, 'a')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+            return
+        time.sleep(SLOT_POLL_SECONDS)
+
+
+@contextmanager
+def held_slots(owner:str):
+    """ Hold a slot for owner (the user's folder name) and a slot for the app, for the duration of a check. """
+    # The user's slot is taken first, so a user's waiting checks don't tie up the app's slots.
+    with ExitStack() as stack:
+        stack.enter_context(slot(f'user-{sanitize_filename(owner)}', processes_per_user()))
+        stack.enter_context(slot('app', max_processes()))
+        yield
+
+
+def _run_job(function, owner:str, args):
+    """ Run a check in a pool process, holding a slot for its owner and a slot for the app. """
+    with held_slots(owner):
+        return function(*args)
+
+
+def run_table_checks(function, jobs, owner:str):
+    """
+    Run function(*args) for each args in jobs in a pool of processes, on behalf of owner (the user's folder name), and
+    yield (index of the job, result) for each in the order in which they complete. If a check raises an exception,
+    it's raised here when the check's result would be yielded.
+
+    function must be a module-level function, so it can be sent to the pool's processes. The processes are forked, so
+    they start with everything the app has loaded.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = None
+    with ProcessPoolExecutor(max_workers=min(processes_per_user(), len(jobs)), mp_context=context) as pool:
+        futures = {pool.submit(_run_job, function, owner, args): i for i, args in enumerate(jobs)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+class TableCheckProgress:
+    """
+    The progress of Check All Data Tables for a user's document, kept in a file in the user's folder so that it can be
+    polled by other requests while the checks are running (see the check_data_tables_progress endpoint).
+
+    The progress records the number of tables to be checked, the names of the tables whose checks are done or have
+    failed, and the messages the checks flashed, as (category, message) pairs. When the tables are checked by the
+    background worker, the messages are flashed by the request that finds the checks done. Updates are made while
+    holding the document's lock, since the worker processes may update the progress concurrently.
+    """
+
+    def __init__(self, user_folder:str, document_name:str):
+        self.json_pathname = os.path.join(user_folder, f'{document_name}.json')
+        self.pathname = progress_pathname(self.json_pathname)
+
+    def start(self, data_table_names):
+        with document_write_lock(self.json_pathname):
+            self._save({'total': len(data_table_names), 'checked': [], 'failed': [], 'messages': []})
+
+    def table_checked(self, data_table_name:str, messages=()):
+        self._update('checked', data_table_name, messages)
+
+    def table_failed(self, data_table_name:str):
+        self._update('failed', data_table_name, ())
+
+    def finish(self):
+        try:
+            os.remove(self.pathname)
+        except FileNotFoundError:
+            pass
+
+    def _update(self, key:str, data_table_name:str, messages):
+        with document_write_lock(self.json_pathname):
+            progress = self._read(self.pathname)
+            if progress is None:
+                # The check has been abandoned.
+                return
+            progress[key].append(data_table_name)
+            progress['messages'].extend([list(message) for message in messages])
+            self._save(progress)
+
+    def _save(self, progress:dict):
+        atomic_write(self.pathname, json.dumps(progress))
+
+    @staticmethod
+    def _read(pathname:str):
+        try:
+            if time.time() - os.path.getmtime(pathname) > PROGRESS_STALE_SECONDS:
+                return None
+            with open(pathname, 'r') as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return progress if isinstance(progress, dict) else None
+
+    @staticmethod
+    def load(user_folder:str, document_name:str):
+        """
+        Return the progress of Check All Data Tables for a document, as a dict, or None if there's no check. done is
+        True if all of the tables have been checked or have failed.
+        """
+        progress = TableCheckProgress._read(progress_pathname(os.path.join(user_folder, f'{document_name}.json')))
+        if progress is not None:
+            progress['done'] = len(progress['checked']) + len(progress['failed']) >= progress['total']
+        return progress
@@ -36,6 +36,10 @@ from flask import Flask, current_app
 from markupsafe import Markup
 
 from webapp.home.utils.file_utils import sanitize_filename
+import webapp.home.utils.document_meta as document_meta
+import webapp.home.utils.model_sidecar as model_sidecar
+import webapp.home.utils.schema_validators as schema_validators
+from webapp.home.utils.table_check_scheduler import TableCheckProgress
 from webapp.home.utils.security import validate_download_url, validate_user_data_path, validate_filename
 
 import webapp.home.utils.node_utils
@@ -88,12 +92,13 @@ from webapp.home.log_usage import (
 )
 from webapp.home.manage_packages import get_data_packages, get_data_usage
 
-from webapp.home.home_utils import RELEASE_NUMBER, get_check_metadata_status, url_without_query_string
+from webapp.home.home_utils import RELEASE_NUMBER, get_check_metadata_status, check_metadata_status_color, \
+    url_without_query_string
 from webapp.home.utils.hidden_buttons import is_hidden_button, handle_hidden_buttons, non_saving_hidden_buttons_decorator
 
 from webapp.home.utils.node_utils import remove_child, new_child_node
 from webapp.home.utils.hidden_buttons import is_hidden_button, handle_hidden_buttons, check_val_for_hidden_buttons
-from webapp.home.utils.load_and_save import get_pathname, load_eml, load_template, save_old_to_new, \
+from webapp.home.utils.load_and_save import get_pathname, get_xml_pathname, load_eml, load_template, save_old_to_new, \
     strip_elements_added_by_pasta, save_eml, fixup_distribution_urls, \
     package_contains_elements_unhandled_by_ezeml, save_both_formats, create_eml, add_imported_from_xml_metadata, \
     get_imported_from_xml_metadata, clear_taxonomy_imported_from_xml_flag
@@ -115,7 +120,7 @@ from webapp.home.utils.template_management import (
 
 import webapp.home.check_data_table_contents as check_data_table_contents
 from webapp.home.check_data_table_contents import format_date_time_formats_list
-from webapp.home.check_metadata import check_eml, is_valid_uuid
+from webapp.home.check_metadata import check_eml, is_valid_uuid, memoized_metadata_status
 from webapp.home.forms import init_form_md5
 from webapp.home.standard_units import init_standard_units
 from webapp.views.collaborations.collaborations import (
@@ -143,8 +148,6 @@ from webapp.home.texttype_node_processing import (
     model_has_complex_texttypes
 )
 import emlvp.unicode_inspector as ui
-import emlvp.validator as validator
-from emlvp.validator import Validator
 from emlvp.exceptions import ValidationError, ParseError, ParserError, XIncludeError, XMLSchemaParseError, \
     XMLSyntaxError
 from emlvp.parser import Parser
@@ -486,6 +489,45 @@ def log_login_usage(login_type:str=None):
     return response
 
 
+# Endpoint for AJAX calls to refresh the Check Metadata badge
+@home_bp.route('/check_metadata_badge', methods=['GET'])
+@login_required
+def check_metadata_badge():
+    """
+    Return the status of the Check Metadata badge for the active document. When the evaluation worker is enabled, a
+    page whose badge shows the last known status polls this endpoint until the worker has evaluated the document's
+    current content. See get_check_metadata_status().
+    """
+    status = session.get('check_metadata_status', 'white')
+    pending = False
+    current_document = user_data.get_active_document()
+    if current_document:
+        errors, warnings, pending = memoized_metadata_status(current_document)
+        if errors is not None:
+            status = check_metadata_status_color(errors, warnings)
+            session['check_metadata_status'] = status
+        session['check_metadata_pending'] = pending
+    return jsonify({"status": status, "pending": pending})
+
+
+# Endpoint for AJAX calls to show the progress of Check All Data Tables
+@home_bp.route('/check_data_tables_progress', methods=['GET'])
+@login_required
+def check_data_tables_progress():
+    """
+    Return the progress of Check All Data Tables for the active document: the number of tables being checked and the
+    names of the ones whose checks are done. The Check Data Tables page polls this while the tables are being checked.
+    See check_data_table_contents.check_all_tables().
+    """
+    progress = None
+    current_document = user_data.get_active_document()
+    if current_document:
+        progress = TableCheckProgress.load(user_data.get_user_folder_name(), current_document)
+    if not progress or progress['done']:
+        return jsonify({"running": False})
+    return jsonify({"running": True, "total": progress['total'], "checked": progress['checked']})
+
+
 # Endpoint for a REST Service to get a list of a data table's columns and their variable types.
 @home_bp.route('/get_data_table_columns/', methods=['GET','POST'])
 def get_data_table_columns():
@@ -596,14 +638,16 @@ def data_table_errors(data_table_name:str=None):
     csv_filepath = check_data_table_contents.get_csv_filepath(current_document, csv_filename)
     data_table_size = check_data_table_contents.get_data_table_size(data_table_node)
 
-    metadata_hash = check_data_table_contents.hash_data_table_metadata_settings(eml_node, data_table_name)
+    metadata_hash = check_data_table_contents.hash_data_table_metadata_settings(eml_node, data_table_name,
+                                                                                data_table_node)
 
     errors = check_data_table_contents.get_data_file_eval(current_document, csv_filename, metadata_hash)
     if not errors:
         try:
             errors = check_data_table_contents.check_data_table(eml_file_url,
                                                                 csv_file_url,
-                                                                data_table_name)
+                                                                data_table_name,
+                                                                data_table_node=data_table_node)
             # start = datetime.now()
             # errors =  profile_and_save(#"check_data_table",
             #                            check_data_table_contents.check_data_table(eml_file_url, csv_file_url,
@@ -1081,10 +1125,19 @@ def rename_package():
                 move(from_metadata, to_metadata)
             except FileNotFoundError:
                 pass
-            from_eval_pkl = os.path.join(user_folder, f"{from_package}_eval.pkl")
-            to_eval_pkl = os.path.join(user_folder, f"{to_package}_eval.pkl")
+            # The metadata record says which JSON the XML was generated from. The move preserves the JSON's identity,
+            #  so the record stays valid for the renamed package.
+            from_meta = document_meta.meta_pathname(os.path.join(user_folder, f"{from_package}.json"))
+            to_meta = document_meta.meta_pathname(os.path.join(user_folder, f"{to_package}.json"))
+            try:
+                move(from_meta, to_meta)
+            except FileNotFoundError:
+                pass
+            # Likewise, the model sidecar is stamped with the JSON's identity and hash, so it moves with the JSON.
+            from_sidecar = model_sidecar.sidecar_pathname(os.path.join(user_folder, f"{from_package}.json"))
+            to_sidecar = model_sidecar.sidecar_pathname(os.path.join(user_folder, f"{to_package}.json"))
             try:
-                move(from_eval_pkl, to_eval_pkl)
+                move(from_sidecar, to_sidecar)
             except FileNotFoundError:
                 pass
 
@@ -1397,20 +1450,27 @@ def check_data_tables():
     log_usage(actions['CHECK_DATA_TABLES'])
     set_current_page('check_data_tables')
 
+    # If the background worker has finished checking the tables, this flashes its messages.
+    checking = check_data_table_contents.collect_table_check_results(current_document)
+
     # Process POST
     if request.method == 'POST':
-        if BTN_CHECK_ALL_TABLES in request.form:
+        if BTN_CHECK_ALL_TABLES in request.form and not checking:
             check_data_table_contents.check_all_tables(current_document, eml_node)
+            checking = check_data_table_contents.collect_table_check_results(current_document)
 
     content, btn_disabled = check_data_table_contents.create_check_data_tables_status_page_content(
         current_document, eml_node)
     tooltip = 'Nothing to check' if btn_disabled else ''
+    if checking:
+        btn_disabled = 'disabled'
+        tooltip = 'The tables are being checked'
 
     check_data_table_contents.set_check_data_tables_badge_status(current_document, eml_node)
 
     help = get_helps(['check_data_tables'])
     return render_template('check_data_tables.html', help=help, content=content,
-                           btn_disabled=btn_disabled, tooltip=tooltip)
+                           btn_disabled=btn_disabled, tooltip=tooltip, checking=checking)
 
 
 @home_bp.route('/explore_data_tables', methods=['GET', 'POST'])
@@ -1451,6 +1511,8 @@ def check_metadata(filename:str = None):
     eml_node = load_eml(filename=current_document, skip_metadata_check=True, do_not_lock=True)
 
     content, parse_errs, unicode_errs = check_eml(eml_node, current_document)
+    # The evaluation is memoized now, so this just brings the badge up to date.
+    get_check_metadata_status(eml_node, current_document)
 
     log_usage(actions['CHECK_METADATA'])
 
@@ -2835,10 +2897,11 @@ def zip_package(current_document=None, eml_node=None, include_data=True):
     manifest_files.append(('JSON', f'{current_document}.json', pathname))
 
     package_id = eml_node.attribute_value("packageId")
+    xml_pathname = get_xml_pathname(current_document, folder_name=user_folder)
     if package_id and package_id != current_document:
         # copy the EML file using the package_id as name
         arcname = f"{package_id.replace('/', '_')}.xml"
-        copyfile(f'{user_folder}/{current_document}.xml', f'{user_folder}/{arcname}')
+        copyfile(xml_pathname, f'{user_folder}/{arcname}')
     else:
         arcname = f'{current_document}.xml'
     # pathname = f'{user_folder}/{current_document}.xml'
@@ -3102,7 +3165,7 @@ def share_submit_package(filename=None, success=None):
     help = get_helps(['share_submit_package_to_edi', 'share_submit_package_colleague'])
     return render_template('share_submit_package.html',
                            title='Share/Submit Your Data Package',
-                           check_metadata_status=get_check_metadata_status(eml_node, current_document),
+                           check_metadata_status=get_check_metadata_status(eml_node, current_document, wait=True),
                            form=form, help=help, success=success)
 
 
@@ -3830,7 +3893,8 @@ def preview_data_portal_2():
     current_document = current_user.get_filename()
 
     if request.method == 'GET':
-        pathname = get_pathname(current_document, file_extension='xml')
+        user_folder = user_data.get_user_folder_name(current_user_directory_only=False)
+        pathname = get_xml_pathname(current_document, folder_name=user_folder)
         log_info(f'preview_data_portal_2... pathname={pathname}')
         with open(pathname, 'rb') as f:
             xml = f.read()
@@ -4069,7 +4133,7 @@ def get_eml_file_2(user):
             edi_user_folder = user_data.get_user_folder_name()
             user_folder = os.path.join(Config.USER_DATA_DIR, user)
             basename = os.path.splitext(os.path.basename(filename))[0]
-            xml_file_pathname = os.path.join(user_folder, basename) + '.xml'
+            xml_file_pathname = get_xml_pathname(basename, folder_name=user_folder)
             json_file_pathname = os.path.join(user_folder, basename) + '.json'
             zip_file_workpath = os.path.join(edi_user_folder, 'zip_temp')
             try:
@@ -4104,10 +4168,11 @@ def get_eml_file_2(user):
             # Get the data file
             return download_eml_file(eml_file, user)
 
-    # Get the list of eml files for the user
+    # Get the list of eml files for the user. The XML files are generated on demand, so we go by the JSON files.
     user_data_dir = Config.USER_DATA_DIR
-    xml_files = glob.glob(f'{user_data_dir}/{user}/*.xml')
-    xml_files = sorted([os.path.basename(x) for x in xml_files], key=str.casefold)
+    json_files = glob.glob(f'{user_data_dir}/{user}/*.json')
+    xml_files = sorted([os.path.splitext(os.path.basename(x))[0] + '.xml' for x in json_files
+                        if os.path.basename(x) != user_data.USER_PROPERTIES_FILENAME], key=str.casefold)
     form.eml_file.choices = xml_files
     return render_template('get_eml_file_2.html', form=form)
 
@@ -4289,11 +4354,13 @@ def close():
     return render_template('index.html')
 
 
-def remove_from_uploads(filename):
+def remove_from_uploads(filename, eml_node):
     package_name = user_data.get_active_document()
     uploads_dir = user_data.get_user_uploads_folder_name()
     uploaded_file = os.path.join(uploads_dir, package_name, filename)
 
+    # Drop the file's entry from the uploads folder's index of Check Data Tables results, too.
+    check_data_table_contents.reset_data_file_eval_status(eml_node, package_name, filename)
     filelist = glob.glob(f'{uploaded_file}*')  # We want to get the eval file, if any, as well
     for f in filelist:
         log_info(f'Removing file {f}')
@@ -4344,7 +4411,7 @@ def select_post(filename=None, form=None, form_dict=None,
                         object_name = object_name_node.content
                         if object_name:
                             user_data.discard_data_table_upload_filename(object_name)
-                            remove_from_uploads(object_name)
+                            remove_from_uploads(object_name, eml_node)
                 remove_child(node)
                 # node_id = project_node_id  # for relatedProject case
                 save_both_formats(filename=filename, eml_node=eml_node)
@@ -4631,7 +4698,7 @@ def validate_eml():
             current_document = user_data.get_active_document()
             if current_document:
                 filename = f'{current_document}.xml'
-                pathname = f'{user_folder}/{filename}'
+                pathname = get_xml_pathname(current_document, folder_name=user_folder)
                 if os.path.exists(pathname):
                     return redirect(url_for(PAGE_VALIDATE_EML_2, filename=filename, active='True'))
                 else:
@@ -4673,18 +4740,9 @@ def parse_and_validate(pathname=None, parse_only=False):
     with open(validate_user_data_path(pathname), 'r') as f:
         xml = f.read()
 
-    schema_path = validator.schema_path()
-
-    if "https://eml.ecoinformatics.org/eml-2.2.0" in xml:
-        schema = schema_path + "/EML2.2.0/xsd/eml.xsd"
-    elif "eml://ecoinformatics.org/eml-2.1.1" in xml:
-        schema = schema_path + "/EML2.1.1/eml.xsd"
-    elif "eml://ecoinformatics.org/eml-2.1.0" in xml:
-        schema = schema_path + "/EML2.1.0/eml.xsd"
-    else:
-        raise ValueError("Cannot determine EML schema")
-
-    v = Validator(schema)
+    # The compiled schema for each EML version is kept for the life of the process. See schema_validators.py.
+    schema = schema_validators.schema_pathname_for(xml)
+    v = schema_validators.get_validator(schema)
     validation_errs = []
     if not parse_only:
         try:
@@ -4769,7 +4827,7 @@ def validate_eml_2(filename, active=False):
         current_document = user_data.get_active_document()
         if current_document:
             filename = f'{current_document}.xml'
-            pathname = f'{user_folder}/{filename}'
+            pathname = get_xml_pathname(current_document, folder_name=user_folder)
 
     validation_errs, parse_errs, unicodes = parse_and_validate(pathname)
 
@@ -4950,7 +5008,7 @@ def submit_package(filename=None, success=None):
     help = get_helps(['submit_package', 'submit_package_success'])
     return render_template('submit_package.html',
                            title='Send to EDI',
-                           check_metadata_status=get_check_metadata_status(eml_node, current_document),
+                           check_metadata_status=get_check_metadata_status(eml_node, current_document, wait=True),
                            form=form, help=help, success=success)
 
 
@@ -5059,13 +5117,13 @@ def send_to_other(filename=None, mailto=None):
                                mailto=mailto,
                                mailto_html=mailto_html,
                                mailto_raw=mailto_raw,
-                               check_metadata_status=get_check_metadata_status(eml_node, current_document),
+                               check_metadata_status=get_check_metadata_status(eml_node, current_document, wait=True),
                                form=form, help=help)
     else:
         help = get_helps(['send_to_colleague'])
         return render_template('send_to_other.html',
                                title='Send to Other',
-                               check_metadata_status=get_check_metadata_status(eml_node, current_document),
+                               check_metadata_status=get_check_metadata_status(eml_node, current_document, wait=True),
                                form=form, help=help)
 
 
@@ -201,7 +201,7 @@ def enable_edi_curation(filename=None):
     help = get_helps(['enable_edi_curation', 'enable_edi_curation_notes'])
     eml_node = load_eml(filename=filename)
     return render_template('enable_edi_curation.html', filename=filename, enable_disabled=enable_disabled,
-                           check_metadata_status=get_check_metadata_status(eml_node, filename),
+                           check_metadata_status=get_check_metadata_status(eml_node, filename, wait=True),
                            check_data_table_status=session['check_data_tables_status'],
                            help=help, form=form)
 
@@ -13,7 +13,7 @@ from flask_login import current_user
 from webapp.auth.edi_token import decode_edi_token
 import webapp.auth.user_data as user_data
 from webapp.config import Config
-from webapp.home.utils.load_and_save import load_eml, save_both_formats
+from webapp.home.utils.load_and_save import get_xml_pathname, load_eml, save_both_formats
 
 from webapp.home.home_utils import log_error, log_info
 import webapp.home.exceptions as exceptions
@@ -175,7 +175,7 @@ def evaluate_upload_data_package(pasta_environment: PastaEnvironment, upload: bo
         package_id = eml_node.attribute_value("packageId")
         user_folder = user_data.get_user_folder_name(current_user_directory_only=False)
 
-        pathname = Path(user_folder) / f'{current_document}.xml'
+        pathname = Path(get_xml_pathname(current_document, folder_name=user_folder))
         if pathname.exists():
             xml_data = pathname.read_bytes()
 
@@ -571,8 +571,9 @@ def load_data(filename=None):
                 views.insert_upload_urls(document, eml_node)
                 log_usage(actions['LOAD_DATA_TABLE'], filename)
 
-                check_data_table_contents.set_check_data_tables_badge_status(document, eml_node)
+                # Save first, so the table's metadata settings are hashed as modified.
                 save_both_formats(filename=document, eml_node=eml_node)
+                check_data_table_contents.set_check_data_tables_badge_status(document, eml_node)
 
                 return redirect(url_for(PAGE_DATA_TABLE, filename=document, dt_node_id=dt_node.id, delimiter=delimiter, quote_char=quote_char))
 
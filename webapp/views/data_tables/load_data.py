@@ -28,6 +28,7 @@ import webapp.home.metapype_client
 import webapp.home.utils.create_nodes
 import webapp.home.utils.load_and_save
 import webapp.home.utils.node_utils
+import webapp.home.utils.row_count as row_count
 from metapype.eml import names
 from metapype.model.node import Node
 
@@ -47,7 +48,7 @@ from flask import Blueprint
 
 from webapp.home.utils.node_utils import new_child_node, add_child, remove_child
 import webapp.home.views as views
-from webapp.home.home_utils import log_error, log_info, log_available_memory
+from webapp.home.home_utils import log_error, log_info
 
 from webapp.pages import PAGE_REUPLOAD_WITH_COL_NAMES_CHANGED, PAGE_DATA_TABLE_SELECT, PAGE_DATA_TABLE
 
@@ -366,11 +367,13 @@ def check_column_name_uniqueness(csv_file_path, delimiter):
 
 
 def get_num_rows(csv_filepath, delimiter: str = ',', quote_char: str = '"'):
-    """Return the number of rows in a CSV file. For efficiency, we use only the first column."""
-    df = pd.read_csv(csv_filepath, encoding='utf8', usecols=[0], sep=delimiter, quotechar=quote_char)
-    log_info(f"Number of rows in {csv_filepath}: {df.shape[0]}")
-    log_available_memory()
-    return df.shape[0]
+    """
+    Return the number of rows in a CSV file, not counting the header. The count is cached, so a file is counted only
+    once. See webapp/home/utils/row_count.py.
+    """
+    num_rows = row_count.count_rows(csv_filepath, delimiter=delimiter, quote_char=quote_char)
+    log_info(f"Number of rows in {csv_filepath}: {num_rows}")
+    return num_rows
 
 
 def get_column_type_and_codes(existing_dt_node, data_frame_raw, col):
@@ -1061,9 +1064,10 @@ def handle_reupload(dt_node_id=None, saved_filename=None, document=None,
     views.insert_upload_urls(document, eml_node)
 
     check_data_table_contents.reset_data_file_eval_status(eml_node, document, data_file)
-    check_data_table_contents.set_check_data_tables_badge_status(document, eml_node)
 
+    # Save first, so the table's metadata settings are hashed as modified.
     webapp.home.utils.load_and_save.save_both_formats(filename=document, eml_node=eml_node)
+    check_data_table_contents.set_check_data_tables_badge_status(document, eml_node)
     return redirect(url_for(PAGE_DATA_TABLE, filename=document, dt_node_id=dt_node.id, delimiter=delimiter,
                             quote_char=quote_char))
 